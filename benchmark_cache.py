@@ -0,0 +1,128 @@
+# benchmark_cache.py
+# Este script debe estar en la carpeta raíz del proyecto (junto a manage.py)
+#
+# Compara los backends de caché de TIENDA_CACHE (settings.py):
+#   'local'  -> LocMemCache (memoria de cada proceso)
+#   'db'     -> DatabaseCache (tabla en la base de datos)
+#   'sqlite' -> sistema_tienda.cache_sqlite.SQLiteCache (archivo SQLite WAL compartido)
+# 1. Operaciones por segundo en un proceso: get, get_many, set, incr, add+delete.
+# 2. Varios procesos incrementando la misma clave a la vez (como los workers de
+#    gunicorn subiendo la versión de tienda/referencia.py): ¿cuántas sumas se ven?
+#   python benchmark_cache.py
+#   python benchmark_cache.py --operaciones 5000 --procesos 8
+#
+# Trabaja sobre una base de datos de PRUEBA temporal (no toca los datos reales).
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import django
+
+print("Iniciando configuración de Django...")
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
+django.setup()
+print("Configuración de Django cargada.")
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+
+CARPETA = tempfile.mkdtemp()
+BACKENDS = {
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+    'db': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'benchmark_cache'},
+    'sqlite': {'BACKEND': 'sistema_tienda.cache_sqlite.SQLiteCache', 'LOCATION': os.path.join(CARPETA, 'cache.sqlite3')},
+}
+for _config in BACKENDS.values():
+    _config['OPTIONS'] = {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10}
+
+# Un valor parecido a lo que guarda tienda/referencia.py: lista de (pk, nombre)
+VALOR = [(pk, f'Producto {pk}') for pk in range(50)]
+
+
+def por_segundo(funcion, operaciones):
+    inicio = time.perf_counter()
+    for i in range(operaciones):
+        funcion(i)
+    return operaciones / (time.perf_counter() - inicio)
+
+
+def medir_un_proceso(cache, operaciones):
+    cache.clear()
+    claves = [f'clave:{i}' for i in range(1000)]
+    cache.set_many({clave: VALOR for clave in claves})
+    cache.set('contador', 0)
+    return {
+        'get': por_segundo(lambda i: cache.get(claves[i % 1000]), operaciones),
+        'get_many(20)': por_segundo(lambda i: cache.get_many(claves[i % 980:i % 980 + 20]), operaciones // 10) * 20,
+        'set': por_segundo(lambda i: cache.set(claves[i % 1000], VALOR), operaciones),
+        'incr': por_segundo(lambda i: cache.incr('contador'), operaciones),
+        'add+delete': por_segundo(lambda i: (cache.add('candado', 1, 5), cache.delete('candado')), operaciones // 2) * 2,
+    }
+
+
+def _incrementar(alias, veces):
+    cache = caches[alias]
+    for _ in range(veces):
+        cache.incr('contador_compartido')
+    connections.close_all()
+
+
+def medir_procesos(alias, procesos, veces):
+    """Cada proceso hace 'veces' incr() sobre la misma clave. Devuelve (valor visto, esperado, incr/s)."""
+    cache = caches[alias]
+    cache.set('contador_compartido', 0)
+    connections.close_all()  # Los hijos abren su propia conexión
+    contexto = multiprocessing.get_context('fork')
+    hijos = [contexto.Process(target=_incrementar, args=(alias, veces)) for _ in range(procesos)]
+    inicio = time.perf_counter()
+    for hijo in hijos:
+        hijo.start()
+    for hijo in hijos:
+        hijo.join()
+    duracion = time.perf_counter() - inicio
+    return cache.get('contador_compartido'), procesos * veces, procesos * veces / duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de backends de caché')
+    parser.add_argument('--operaciones', type=int, default=2000)
+    parser.add_argument('--procesos', type=int, default=4)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    nombre_original = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        # Archivo en vez de memoria: los procesos hijos deben ver la misma tabla de caché
+        connection.settings_dict['TEST']['NAME'] = os.path.join(CARPETA, 'benchmark_cache_db.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        with override_settings(CACHES={'default': BACKENDS['local'], **BACKENDS}):
+            call_command('createcachetable', verbosity=0)
+
+            resultados = {alias: medir_un_proceso(caches[alias], args.operaciones) for alias in BACKENDS}
+            operaciones = list(next(iter(resultados.values())))
+            print(f"\n{'Operaciones/s':<14}" + ''.join(f"{alias:>12}" for alias in BACKENDS))
+            print('-' * (14 + 12 * len(BACKENDS)))
+            for operacion in operaciones:
+                print(f"{operacion:<14}" + ''.join(f"{resultados[alias][operacion]:>12,.0f}" for alias in BACKENDS))
+
+            print(f"\n{args.procesos} procesos x {args.operaciones} incr() sobre la misma clave:")
+            print(f"{'Backend':<8} {'Valor visto':>12} {'Esperado':>10} {'Perdidas':>10} {'incr/s':>10}")
+            print('-' * 54)
+            for alias in BACKENDS:
+                visto, esperado, velocidad = medir_procesos(alias, args.procesos, args.operaciones)
+                print(f"{alias:<8} {visto:>12} {esperado:>10} {esperado - visto:>10} {velocidad:>10,.0f}")
+            print("('local' no comparte: cada worker suma en su propia memoria. 'db' lee y escribe "
+                  "en dos pasos y pierde sumas. 'sqlite' suma en un solo UPDATE.)")
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
+    print("--- Benchmark finalizado ---")
@@ -0,0 +1,121 @@
+# benchmark_login.py
+# Este script debe estar en la carpeta raíz del proyecto (junto a manage.py)
+#
+# Mide el rendimiento del login cuando muchos cajeros entran al mismo tiempo
+# (cambio de turno) y cuántos hashes de contraseña cuesta cada login.
+#   python benchmark_login.py
+#   python benchmark_login.py --usuarios 40 --concurrencia 1 4 8 --iteraciones 1000000 600000
+#
+# Trabaja sobre una base de datos de PRUEBA temporal (no toca los datos reales).
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+import django
+from concurrent.futures import ThreadPoolExecutor
+
+print("Iniciando configuración de Django...")
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
+django.setup()
+print("Configuración de Django cargada.")
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from tienda.models import PerfilUsuario
+from sistema_tienda.hashers import PBKDF2TiendaHasher
+
+PASSWORD = 'TurnoMatutino2026!'
+
+
+# ============ CONTADOR DE HASHES ============
+# Cuenta cuántas veces se verifica una contraseña durante el benchmark
+_contador = {'verificaciones': 0}
+_candado = threading.Lock()
+_verify_original = PBKDF2TiendaHasher.verify
+
+
+def _verify_contado(self, password, encoded):
+    with _candado:
+        _contador['verificaciones'] += 1
+    return _verify_original(self, password, encoded)
+
+
+PBKDF2TiendaHasher.verify = _verify_contado
+
+
+def crear_usuarios(cantidad):
+    hash_ = make_password(PASSWORD)
+    usuarios = User.objects.bulk_create([User(username=f'cajero_bench_{i:03d}', password=hash_) for i in range(cantidad)])
+    PerfilUsuario.objects.bulk_create([
+        PerfilUsuario(user=u, rol='vendedor') for u in User.objects.filter(username__startswith='cajero_bench_')
+    ])
+    return [u.username for u in usuarios]
+
+
+def un_login(username):
+    client = Client()
+    inicio = time.perf_counter()
+    respuesta = client.post('/login/', {'username': username, 'password': PASSWORD})
+    duracion = time.perf_counter() - inicio
+    connections.close_all()
+    return duracion, respuesta.status_code == 302
+
+
+def medir(usernames, concurrencia):
+    _contador['verificaciones'] = 0
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(un_login, usernames))
+    total = time.perf_counter() - inicio
+
+    latencias = sorted(r[0] for r in resultados)
+    exitosos = sum(1 for r in resultados if r[1])
+    p95 = latencias[max(0, int(len(latencias) * 0.95) - 1)]
+    return {
+        'logins_s': len(usernames) / total,
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p95_ms': p95 * 1000,
+        'hashes_por_login': _contador['verificaciones'] / len(usernames),
+        'errores': len(usernames) - exitosos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de logins concurrentes')
+    parser.add_argument('--usuarios', type=int, default=24)
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--iteraciones', type=int, nargs='+', default=[settings.TIENDA_PBKDF2_ITERACIONES])
+    args = parser.parse_args()
+
+    setup_test_environment()
+    nombre_original = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        # Archivo temporal en vez de memoria: varios hilos escriben last_login a la vez
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark_login.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f"\n{'Iteraciones':>11} {'Concurrencia':>12} {'Logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'Hashes/login':>13} {'Errores':>8}")
+        print('-' * 76)
+        for iteraciones in args.iteraciones:
+            with override_settings(TIENDA_PBKDF2_ITERACIONES=iteraciones):
+                User.objects.filter(username__startswith='cajero_bench_').delete()
+                usernames = crear_usuarios(args.usuarios)
+                for concurrencia in args.concurrencia:
+                    r = medir(usernames, concurrencia)
+                    print(f"{iteraciones:>11} {concurrencia:>12} {r['logins_s']:>9.1f} {r['p50_ms']:>8.0f} "
+                          f"{r['p95_ms']:>8.0f} {r['hashes_por_login']:>13.2f} {r['errores']:>8}")
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
+    print("--- Benchmark finalizado ---")
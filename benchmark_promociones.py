@@ -0,0 +1,111 @@
+# benchmark_promociones.py
+# Este script debe estar en la carpeta raíz del proyecto (junto a manage.py)
+#
+# Mide cuánto cuesta calcular las promociones de un ticket con muchas líneas:
+#   - 'por línea': buscar en la base las promociones de cada producto (una consulta por línea).
+#   - 'compiladas': tienda/promociones.evaluar() con las tablas en memoria (cero consultas).
+#   python benchmark_promociones.py
+#
+# Trabaja sobre una base de datos de PRUEBA temporal (no toca los datos reales).
+
+import os
+import random
+import time
+import django
+from decimal import Decimal
+
+print("Iniciando configuración de Django...")
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
+django.setup()
+print("Configuración de Django cargada.")
+
+from django.db import connection, reset_queries
+from django.db.models import Q
+from django.utils import timezone
+from django.test.utils import setup_test_environment, teardown_test_environment, CaptureQueriesContext
+from tienda import promociones, referencia
+from tienda.models import Categoria, Producto, Promocion
+
+PRODUCTOS = 500
+CATEGORIAS = 20
+LINEAS = (10, 100, 1000)
+REPETICIONES = 20
+
+
+def crear_datos():
+    categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Categoría {i}') for i in range(CATEGORIAS)])
+    productos = Producto.objects.bulk_create([
+        Producto(nombre=f'Producto {i}', descripcion='-', precio_venta=Decimal('10.00') + i % 50,
+                 stock=10**6, categoria=categorias[i % CATEGORIAS])
+        for i in range(PRODUCTOS)
+    ])
+    reglas = []
+    for i, producto in enumerate(productos[::5]):
+        if i % 3 == 0:
+            reglas.append(Promocion(nombre=f'{producto.nombre} 3x2', tipo='lleva_paga', lleva=3, paga=2, producto=producto))
+        else:
+            reglas.append(Promocion(nombre=f'{producto.nombre} -$1', tipo='monto', valor=Decimal('1.00'), producto=producto))
+    for categoria in categorias[::2]:
+        reglas.append(Promocion(nombre=f'{categoria.nombre} -10%', tipo='porcentaje', valor=Decimal('10'), categoria=categoria))
+    Promocion.objects.bulk_create(reglas)
+    referencia.invalidar('promociones')  # bulk_create no dispara señales
+    return [(p.pk, p.categoria_id, p.precio_venta) for p in productos], len(reglas)
+
+
+def ticket(productos, lineas):
+    return [(pk, categoria_id, precio, random.randint(1, 4)) for pk, categoria_id, precio in random.choices(productos, k=lineas)]
+
+
+def por_linea(lineas):
+    """Lo que se haría sin compilar: consultar las promociones vigentes de cada línea."""
+    ahora = timezone.now()
+    resultado = []
+    for producto_id, categoria_id, precio, cantidad in lineas:
+        mejor = Decimal('0.00')
+        for regla in Promocion.objects.filter(
+            Q(producto_id=producto_id) | Q(categoria_id=categoria_id), activa=True, inicio__lte=ahora,
+        ).filter(Q(fin=None) | Q(fin__gt=ahora)):
+            if regla.tipo == 'lleva_paga':
+                continue  # Necesitaría el resto del ticket; solo se mide el costo de la búsqueda
+            mejor = max(mejor, promociones._descuento(regla, precio, cantidad))
+        resultado.append(mejor)
+    return resultado
+
+
+def medir(funcion, lineas):
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        funcion(lineas)
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        funcion(lineas)
+    return (time.perf_counter() - inicio) / REPETICIONES, len(ctx.captured_queries)
+
+
+def main():
+    setup_test_environment()
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        productos, reglas = crear_datos()
+        random.seed(42)
+        with CaptureQueriesContext(connection) as ctx:
+            promociones.evaluar(ticket(productos, 1))
+        print(f"\n{reglas} reglas; compilarlas costó {len(ctx.captured_queries)} consulta(s) (una vez por versión).")
+
+        print(f"\n{'Líneas':>7} {'Modo':<12} {'Consultas':>10} {'ms/ticket':>10} {'µs/línea':>10}")
+        print('-' * 53)
+        for n in LINEAS:
+            lineas = ticket(productos, n)
+            for modo, funcion in (('por línea', por_linea), ('compiladas', promociones.evaluar)):
+                duracion, consultas = medir(funcion, lineas)
+                print(f"{n:>7} {modo:<12} {consultas:>10} {duracion * 1000:>10.2f} {duracion / n * 10**6:>10.1f}")
+            print('-' * 53)
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
+    print("--- Benchmark finalizado ---")
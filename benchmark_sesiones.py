@@ -0,0 +1,101 @@
+# benchmark_sesiones.py
+# Este script debe estar en la carpeta raíz del proyecto (junto a manage.py)
+#
+# Compara cuántas consultas SQL cuesta el flujo de un cajero
+# (login -> dashboard -> nueva venta) con cada modo de sesión:
+#   python benchmark_sesiones.py
+#
+# Trabaja sobre una base de datos de PRUEBA temporal (no toca los datos reales).
+
+import os
+import time
+import django
+from decimal import Decimal
+
+print("Iniciando configuración de Django...")
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
+django.setup()
+print("Configuración de Django cargada.")
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings, CaptureQueriesContext
+from django.contrib.auth.models import User
+from tienda.models import PerfilUsuario, Producto, Cliente
+
+MODOS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+ALMACENES_MENSAJES = {
+    'db': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'cache': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+}
+
+REPETICIONES = 20
+
+
+def crear_datos():
+    usuario = User.objects.create_user(username='cajero_bench', password='cajero123')
+    PerfilUsuario.objects.create(user=usuario, rol='vendedor')
+    producto = Producto.objects.create(nombre='Producto Bench', descripcion='-', precio_venta=Decimal('10.00'), stock=10**6)
+    cliente = Cliente.objects.create(nombre='Cliente', apellido='Bench', email='bench@ejemplo.com', telefono='0', direccion='-')
+    return producto, cliente
+
+
+def flujo_cajero(producto, cliente):
+    """login -> dashboard -> formulario de venta -> registrar venta. Devuelve consultas por paso."""
+    client = Client()
+    pasos = [
+        ('login', lambda: client.post('/login/', {'username': 'cajero_bench', 'password': 'cajero123'})),
+        ('dashboard', lambda: client.get('/')),
+        ('venta_form', lambda: client.get('/ventas/crear/')),
+        ('venta_post', lambda: client.post('/ventas/crear/', {'cliente': cliente.pk, 'producto': producto.pk, 'cantidad': 1})),
+        ('dashboard_2', lambda: client.get('/')),
+    ]
+    resultado = []
+    for nombre, paso in pasos:
+        with CaptureQueriesContext(connection) as ctx:
+            paso()
+        sesion = sum(1 for q in ctx.captured_queries if 'django_session' in q['sql'])
+        resultado.append((nombre, len(ctx.captured_queries), sesion))
+    return resultado
+
+
+def main():
+    setup_test_environment()
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        producto, cliente = crear_datos()
+        print(f"\n{'Modo':<8} {'Paso':<12} {'Consultas':>10} {'en django_session':>18}")
+        print('-' * 52)
+        totales = {}
+        for modo, engine in MODOS.items():
+            with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=ALMACENES_MENSAJES[modo]):
+                inicio = time.perf_counter()
+                for _ in range(REPETICIONES):
+                    pasos = flujo_cajero(producto, cliente)
+                duracion = (time.perf_counter() - inicio) / REPETICIONES
+            for nombre, consultas, sesion in pasos:
+                print(f"{modo:<8} {nombre:<12} {consultas:>10} {sesion:>18}")
+            totales[modo] = (sum(p[1] for p in pasos), sum(p[2] for p in pasos), duracion)
+            print('-' * 52)
+
+        print(f"\n{'Modo':<8} {'Consultas/flujo':>16} {'en django_session':>18} {'ms/flujo':>10}")
+        for modo, (consultas, sesion, duracion) in totales.items():
+            print(f"{modo:<8} {consultas:>16} {sesion:>18} {duracion * 1000:>10.1f}")
+        base = totales['db'][0]
+        for modo in ('cache', 'cookie'):
+            print(f"-> '{modo}' ahorra {base - totales[modo][0]} consulta(s) por flujo frente a 'db'.")
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
+    print("--- Benchmark finalizado ---")
@@ -0,0 +1,306 @@
+# carga_cajeros.py
+# Este script debe estar en la carpeta raíz del proyecto (junto a manage.py)
+#
+# Prueba de carga: N cajeros simultáneos contra un servidor ya levantado.
+# Cada cajero inicia sesión y repite un turno realista con pausas entre pasos:
+#   dashboard -> lista de productos -> formulario de venta -> registrar venta
+#   (-> reporte de ventas, si el usuario es gerente)
+# Al final muestra peticiones por segundo, latencias (p50/p90/p99) por paso y
+# cuántas ventas fallaron y por qué (conflicto de stock, error de la app, HTTP...).
+#
+# Uso (con el servidor corriendo, ej. 'python manage.py runserver'):
+#   python crear_usuarios_con_roles.py && python cargar_datos_ejemplo.py
+#   python carga_cajeros.py                                 (10 cajeros, 60 s)
+#   python carga_cajeros.py --cajeros 40 --duracion 120 --pausa 0.5
+#   python carga_cajeros.py --crear-usuarios 20             (crea cajero_carga_000..019 y los usa)
+#   python carga_cajeros.py --usuarios vendedor12:vendedor123:vendedor gerente12:gerente123:gerente
+#
+# Solo usa la biblioteca estándar para hablar con el servidor. '--crear-usuarios'
+# sí carga Django para crear los usuarios en la base que usa el servidor.
+# OJO: registra ventas de verdad (y descuenta stock) en esa base.
+
+import argparse
+import http.client
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+# Usuarios de crear_usuarios_con_roles.py
+USUARIOS = ['vendedor12:vendedor123:vendedor', 'gerente12:gerente123:gerente']
+PASSWORD_CARGA = 'carga123'
+
+RE_CSRF = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+RE_SELECT = r'<select[^>]*name="{}"[^>]*>(.*?)</select>'
+RE_OPCION = re.compile(r'<option value="(\d+)"')
+
+# Mensajes de venta_crear (tienda/views.py y VentaForm) que explican por qué no se registró la venta
+FALLAS_VENTA = (
+    ('No hay suficiente stock', 'sin_stock'),  # Validación del formulario (foto en caché del producto)
+    ('Stock insuficiente', 'conflicto_stock'),  # Revalidación con la fila bloqueada: otra caja ganó
+    ('Elige una sucursal', 'sin_sucursal'),
+    ('Ocurrió un error inesperado', 'error_app'),
+)
+
+
+# ============ UN CAJERO (UNA CONEXIÓN Y SUS COOKIES) ============
+class Cajero:
+
+    def __init__(self, base, username, password, rol, timeout):
+        partes = urlsplit(base)
+        self.host, self.puerto = partes.hostname, partes.port or 80
+        self.username, self.password, self.rol = username, password, rol
+        self.timeout = timeout
+        self.cookies = {}
+        self.conexion = None
+
+    def pedir(self, metodo, ruta, datos=None):
+        """
+        (status, Location, cuerpo). Reusa la conexión (keep-alive) y la reabre si se cayó.
+        Un POST solo se reintenta si no llegó a enviarse: si el servidor cortó después,
+        la venta pudo haberse registrado y repetirla la contaría dos veces.
+        """
+        encabezados = {'Host': f'{self.host}:{self.puerto}'}
+        if self.cookies:
+            encabezados['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        cuerpo = None
+        if datos is not None:
+            cuerpo = urlencode(datos)
+            encabezados['Content-Type'] = 'application/x-www-form-urlencoded'
+        for intento in range(2):
+            if self.conexion is None:
+                self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+            enviada = False
+            try:
+                self.conexion.request(metodo, ruta, body=cuerpo, headers=encabezados)
+                enviada = True
+                respuesta = self.conexion.getresponse()
+                contenido = respuesta.read().decode('utf-8', 'replace')
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # El servidor cerró la conexión keep-alive: se reintenta una vez con una nueva
+                self.cerrar()
+                if intento or (enviada and metodo != 'GET'):
+                    raise
+        for valor in respuesta.headers.get_all('Set-Cookie') or ():
+            for nombre, morsel in SimpleCookie(valor).items():
+                self.cookies[nombre] = morsel.value
+        return respuesta.status, respuesta.headers.get('Location', ''), contenido
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+            self.conexion = None
+
+
+# ============ PASOS DEL TURNO ============
+def _clasificar_get(status, location):
+    if status == 200:
+        return 'ok'
+    if status == 302:
+        return 'sesion_perdida' if '/login/' in location else 'denegado'
+    return f'http_{status}'
+
+
+def _opciones(html, campo):
+    bloque = re.search(RE_SELECT.format(campo), html, re.S)
+    return RE_OPCION.findall(bloque.group(1)) if bloque else []
+
+
+def iniciar_sesion(cajero):
+    status, _, html = cajero.pedir('GET', '/login/')
+    token = RE_CSRF.search(html)
+    if status != 200 or token is None:
+        return f'http_{status}'
+    status, location, _ = cajero.pedir('POST', '/login/', {
+        'csrfmiddlewaretoken': token.group(1), 'username': cajero.username, 'password': cajero.password,
+    })
+    return 'ok' if status == 302 and '/login/' not in location else 'login_fallido'
+
+
+def registrar_venta(cajero, html):
+    """POST de venta_crear con un producto y cliente al azar del formulario ya cargado."""
+    token = RE_CSRF.search(html)
+    productos, clientes = _opciones(html, 'producto'), _opciones(html, 'cliente')
+    if token is None or not productos or not clientes:
+        return 'sin_datos'
+    status, location, html = cajero.pedir('POST', '/ventas/crear/', {
+        'csrfmiddlewaretoken': token.group(1),
+        'cliente': random.choice(clientes), 'producto': random.choice(productos), 'cantidad': random.randint(1, 3),
+    })
+    if status == 302:
+        return 'sesion_perdida' if '/login/' in location else 'ok'
+    if status != 200:
+        return f'http_{status}'
+    for mensaje, resultado in FALLAS_VENTA:
+        if mensaje in html:
+            return resultado
+    return 'formulario_invalido'
+
+
+def turno(cajero):
+    """Pasos de una vuelta del turno: [(nombre, función que devuelve el resultado)]."""
+    pasos = [
+        ('dashboard', lambda: _clasificar_get(*cajero.pedir('GET', '/')[:2])),
+        ('productos', lambda: _clasificar_get(*cajero.pedir('GET', '/productos/')[:2])),
+    ]
+    formulario = {}
+
+    def abrir_venta():
+        status, location, formulario['html'] = cajero.pedir('GET', '/ventas/crear/')
+        return _clasificar_get(status, location)
+
+    pasos += [
+        ('venta_form', abrir_venta),
+        ('venta_post', lambda: registrar_venta(cajero, formulario.get('html', ''))),
+    ]
+    if cajero.rol in ('gerente', 'administrador'):
+        pasos.append(('reporte', lambda: _clasificar_get(*cajero.pedir('GET', '/ventas/reporte/')[:2])))
+    return pasos
+
+
+# ============ RESULTADOS ============
+class Resultados:
+
+    def __init__(self):
+        self.latencias = defaultdict(list)  # paso -> [segundos]
+        self.conteo = defaultdict(Counter)  # paso -> {resultado: n}
+        self._candado = threading.Lock()
+
+    def anotar(self, paso, segundos, resultado):
+        with self._candado:
+            self.latencias[paso].append(segundos)
+            self.conteo[paso][resultado] += 1
+
+
+def percentil(ordenadas, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, max(0, round(p / 100 * len(ordenadas)) - 1))]
+
+
+def medir(resultados, paso, funcion):
+    inicio = time.perf_counter()
+    try:
+        resultado = funcion()
+    except (OSError, http.client.HTTPException) as e:
+        resultado = f'conexion_{type(e).__name__}'
+    resultados.anotar(paso, time.perf_counter() - inicio, resultado)
+    return resultado
+
+
+def trabajar(cajero, resultados, parar, pausa, retraso):
+    """Hilo de un cajero: inicia sesión y repite el turno hasta que se acabe el tiempo."""
+    if parar.wait(retraso):
+        return
+    try:
+        while not parar.is_set() and medir(resultados, 'login', lambda: iniciar_sesion(cajero)) != 'ok':
+            parar.wait(1)
+        while not parar.is_set():
+            for paso, funcion in turno(cajero):
+                if parar.is_set():
+                    break
+                if medir(resultados, paso, funcion) == 'sesion_perdida':
+                    if medir(resultados, 'login', lambda: iniciar_sesion(cajero)) != 'ok':
+                        parar.wait(1)
+                    break
+                if pausa:
+                    parar.wait(random.expovariate(1 / pausa))  # Tiempo "pensando" del cajero
+    finally:
+        cajero.cerrar()
+
+
+def imprimir(resultados, segundos):
+    total = sum(len(l) for l in resultados.latencias.values())
+    ventas = resultados.conteo['venta_post']
+    print(f"\nDuración: {segundos:.1f} s   Peticiones: {total}   Throughput: {total / segundos:.1f} pet/s   "
+          f"Ventas registradas: {ventas['ok']} ({ventas['ok'] / segundos:.1f}/s)")
+
+    print(f"\n{'Paso':<12} {'Total':>7} {'OK %':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    print('-' * 64)
+    for paso in ('login', 'dashboard', 'productos', 'venta_form', 'venta_post', 'reporte'):
+        latencias = sorted(resultados.latencias.get(paso, ()))
+        if not latencias:
+            continue
+        ok = resultados.conteo[paso]['ok'] / len(latencias) * 100
+        p50, p90, p99 = (percentil(latencias, p) * 1000 for p in (50, 90, 99))
+        print(f"{paso:<12} {len(latencias):>7} {ok:>7.1f} {p50:>8.0f} {p90:>8.0f} {p99:>8.0f} {latencias[-1] * 1000:>8.0f}")
+
+    fallas = [(paso, resultado, n) for paso, conteo in resultados.conteo.items() for resultado, n in conteo.items() if resultado != 'ok']
+    if fallas:
+        print(f"\n{'Paso':<12} {'Resultado':<28} {'Veces':>7} {'Tasa':>7}")
+        print('-' * 57)
+        for paso, resultado, n in sorted(fallas, key=lambda f: -f[2]):
+            tasa = n / sum(resultados.conteo[paso].values()) * 100
+            print(f"{paso:<12} {resultado:<28} {n:>7} {tasa:>6.1f}%")
+    else:
+        print('\nSin errores.')
+
+
+# ============ USUARIOS DE CARGA ============
+def crear_usuarios(cantidad):
+    """Crea cajero_carga_NNN (3 vendedores por cada gerente) como crear_usuarios_con_roles.py."""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
+    django.setup()
+    from django.contrib.auth.models import User
+    from tienda.models import PerfilUsuario
+
+    usuarios = []
+    for i in range(cantidad):
+        username, rol = f'cajero_carga_{i:03d}', 'gerente' if i % 4 == 3 else 'vendedor'
+        if not User.objects.filter(username=username).exists():
+            usuario = User.objects.create_user(username=username, password=PASSWORD_CARGA)
+            PerfilUsuario.objects.create(user=usuario, rol=rol)
+        usuarios.append(f'{username}:{PASSWORD_CARGA}:{rol}')
+    print(f"{cantidad} usuario(s) de carga listos (contraseña '{PASSWORD_CARGA}').")
+    return usuarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de cajeros concurrentes')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor ya levantado')
+    parser.add_argument('--cajeros', type=int, default=10, help='Cajeros simultáneos (hilos)')
+    parser.add_argument('--duracion', type=float, default=60, help='Segundos de carga')
+    parser.add_argument('--pausa', type=float, default=1.0, help='Segundos promedio entre pasos (0 = sin pausa)')
+    parser.add_argument('--rampa', type=float, default=5, help='Segundos para ir sumando cajeros')
+    parser.add_argument('--timeout', type=float, default=30, help='Segundos máximos por petición')
+    usuarios = parser.add_mutually_exclusive_group()
+    usuarios.add_argument('--usuarios', nargs='+', default=USUARIOS, metavar='USUARIO:PASSWORD[:ROL]')
+    usuarios.add_argument('--crear-usuarios', type=int, metavar='N', help='Crea N usuarios de carga y los usa')
+    args = parser.parse_args()
+
+    cuentas = crear_usuarios(args.crear_usuarios) if args.crear_usuarios else args.usuarios
+    cuentas = [(cuenta.split(':') + ['vendedor'])[:3] for cuenta in cuentas]  # Sin rol: vendedor
+    # Con menos cuentas que cajeros, varias sesiones comparten usuario (cada una con sus cookies)
+    cajeros = [Cajero(args.url, *cuentas[i % len(cuentas)], timeout=args.timeout) for i in range(args.cajeros)]
+
+    print(f"{args.cajeros} cajero(s) contra {args.url} durante {args.duracion:.0f} s "
+          f"(pausa promedio {args.pausa} s, rampa {args.rampa} s)...")
+    resultados = Resultados()
+    parar = threading.Event()
+    hilos = [
+        threading.Thread(target=trabajar, args=(cajero, resultados, parar, args.pausa, args.rampa * i / args.cajeros), daemon=True)
+        for i, cajero in enumerate(cajeros)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    try:
+        parar.wait(args.duracion)
+    except KeyboardInterrupt:
+        print('Deteniendo...')
+    parar.set()
+    for hilo in hilos:
+        hilo.join(args.timeout)
+    imprimir(resultados, time.perf_counter() - inicio)
+
+
+if __name__ == '__main__':
+    main()
+    print("--- Prueba de carga finalizada ---")
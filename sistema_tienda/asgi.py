@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Las actualizaciones en vivo del dashboard (tienda/en_vivo.py) necesitan ASGI
+para mantener abiertas muchas conexiones sin un hilo por conexión, ej.:
+    uvicorn sistema_tienda.asgi:application --workers 4
+Bajo WSGI siguen funcionando, pero como un sondeo cada 30 segundos.
 """
 
 import os
@@ -14,3 +19,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
 
 application = get_asgi_application()
+
+# Mapa de códigos de barras y opciones del punto de venta listos antes de la primera venta
+from tienda.referencia import precalentar  # noqa: E402
+precalentar()
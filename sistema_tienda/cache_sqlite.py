@@ -0,0 +1,211 @@
+# sistema_tienda/cache_sqlite.py
+# Caché compartida entre los workers de un mismo servidor, sin Redis ni Memcached:
+# un archivo SQLite en modo WAL (lectores y un escritor a la vez, sin bloquearse).
+#
+#   CACHES = {'default': {
+#       'BACKEND': 'sistema_tienda.cache_sqlite.SQLiteCache',
+#       'LOCATION': BASE_DIR / 'cache_tienda.sqlite3',
+#       'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10},
+#   }}
+#
+# - Cada hilo de cada proceso abre su propia conexión (y la reabre tras un fork).
+# - Los enteros se guardan como INTEGER: incr()/decr() son un solo UPDATE atómico,
+#   así dos workers que incrementan la misma clave nunca pierden una suma.
+#   add() también es atómico (INSERT ... ON CONFLICT), sirve como candado.
+# - Claves con versión y prefijo: las de Django (KEY_PREFIX, VERSION, make_key).
+# - TTL: cada fila guarda cuándo expira; las vencidas no se devuelven y se borran
+#   al recortar.
+# - Tope de tamaño: cada cierto número de escrituras se cuenta la tabla y, si pasa
+#   de MAX_ENTRIES, se borran las vencidas y luego 1/CULL_FREQUENCY de las menos
+#   usadas (LRU). La hora de último uso se actualiza como mucho una vez por segundo
+#   por clave, para que las lecturas no se vuelvan escrituras.
+#
+# Comparación con locmem y la caché en base de datos: python benchmark_cache.py
+
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    clave TEXT PRIMARY KEY,
+    valor BLOB NOT NULL,
+    expira REAL,
+    acceso REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_acceso ON cache (acceso);
+CREATE INDEX IF NOT EXISTS cache_expira ON cache (expira) WHERE expira IS NOT NULL;
+"""
+
+ESPERA_BLOQUEO = 5  # Segundos que una conexión espera a que otro proceso termine de escribir
+REFRESCO_ACCESO = 1.0  # Segundos mínimos entre actualizaciones de 'acceso' de una clave
+LOTE_PARAMETROS = 500  # Claves por consulta en get_many/delete_many
+VIVA = '(expira IS NULL OR expira > ?)'
+UPSERT = (
+    'INSERT INTO cache (clave, valor, expira, acceso) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor, expira = excluded.expira, acceso = excluded.acceso'
+)
+ENTERO_MIN, ENTERO_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _empacar(valor):
+    # Solo los int puros (no bool) van como INTEGER, para que incr() funcione en SQL
+    if type(valor) is int and ENTERO_MIN <= valor <= ENTERO_MAX:
+        return valor
+    return pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+
+
+def _desempacar(valor):
+    return valor if isinstance(valor, int) else pickle.loads(valor)
+
+
+class SQLiteCache(BaseCache):
+    """Backend de caché de Django sobre un archivo SQLite compartido por los procesos."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.ruta = str(location)
+        self._local = threading.local()
+        self._escrituras = itertools.count(1)
+        self._revisar_cada = max(1, min(100, self._max_entries // 100))
+
+    # ============ CONEXIÓN ============
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid():
+            # isolation_level=None: cada sentencia se confirma sola (las de varias usan BEGIN)
+            conexion = sqlite3.connect(self.ruta, timeout=ESPERA_BLOQUEO, isolation_level=None, check_same_thread=False)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')  # En WAL no arriesga la integridad, solo lo último escrito si se va la luz
+            conexion.executescript(ESQUEMA)
+            self._local.conexion, self._local.pid = conexion, os.getpid()
+        return conexion
+
+    def _escribio(self, conexion):
+        if next(self._escrituras) % self._revisar_cada == 0:
+            self._recortar(conexion)
+
+    def _recortar(self, conexion):
+        """Borra las vencidas y, si aún se pasa del tope, las menos usadas."""
+        ahora = time.time()
+        conexion.execute('DELETE FROM cache WHERE expira <= ?', (ahora,))
+        total = conexion.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            conexion.execute('DELETE FROM cache')
+            return
+        sobran = max(total - self._max_entries, total // self._cull_frequency)
+        conexion.execute('DELETE FROM cache WHERE clave IN (SELECT clave FROM cache ORDER BY acceso LIMIT ?)', (sobran,))
+
+    # ============ LECTURA ============
+    def get(self, key, default=None, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        ahora = time.time()
+        fila = conexion.execute(f'SELECT valor, acceso FROM cache WHERE clave = ? AND {VIVA}', (clave, ahora)).fetchone()
+        if fila is None:
+            return default
+        if fila[1] < ahora - REFRESCO_ACCESO:
+            conexion.execute('UPDATE cache SET acceso = ? WHERE clave = ?', (ahora, clave))
+        return _desempacar(fila[0])
+
+    def get_many(self, keys, version=None):
+        claves = {self.make_and_validate_key(key, version=version): key for key in keys}
+        conexion = self._conexion()
+        ahora = time.time()
+        resultado, viejas = {}, []
+        lista = list(claves)
+        for i in range(0, len(lista), LOTE_PARAMETROS):
+            lote = lista[i:i + LOTE_PARAMETROS]
+            filas = conexion.execute(
+                f'SELECT clave, valor, acceso FROM cache WHERE clave IN ({",".join("?" * len(lote))}) AND {VIVA}',
+                (*lote, ahora),
+            )
+            for clave, valor, acceso in filas:
+                resultado[claves[clave]] = _desempacar(valor)
+                if acceso < ahora - REFRESCO_ACCESO:
+                    viejas.append((ahora, clave))
+        if viejas:
+            conexion.executemany('UPDATE cache SET acceso = ? WHERE clave = ?', viejas)
+        return resultado
+
+    def has_key(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        return self._conexion().execute(f'SELECT 1 FROM cache WHERE clave = ? AND {VIVA}', (clave, time.time())).fetchone() is not None
+
+    # ============ ESCRITURA ============
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        conexion.execute(UPSERT, (clave, _empacar(value), self.get_backend_timeout(timeout), time.time()))
+        self._escribio(conexion)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Solo si la clave no existe (o venció). Atómico entre procesos."""
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        ahora = time.time()
+        cursor = conexion.execute(
+            f'{UPSERT} WHERE cache.expira IS NOT NULL AND cache.expira <= ?',
+            (clave, _empacar(value), self.get_backend_timeout(timeout), ahora, ahora),
+        )
+        if cursor.rowcount:
+            self._escribio(conexion)
+        return cursor.rowcount > 0
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expira, ahora = self.get_backend_timeout(timeout), time.time()
+        filas = [(self.make_and_validate_key(key, version=version), _empacar(value), expira, ahora) for key, value in data.items()]
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            conexion.executemany(UPSERT, filas)
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        conexion.execute('COMMIT')
+        self._escribio(conexion)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        cursor = self._conexion().execute(
+            f'UPDATE cache SET expira = ? WHERE clave = ? AND {VIVA}',
+            (self.get_backend_timeout(timeout), clave, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        """Suma en un solo UPDATE (atómico entre procesos). decr() usa este mismo método."""
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        ahora = time.time()
+        fila = conexion.execute(
+            f"UPDATE cache SET valor = valor + ?, acceso = ? WHERE clave = ? AND {VIVA} AND typeof(valor) = 'integer' RETURNING valor",
+            (delta, ahora, clave, ahora),
+        ).fetchone()
+        if fila is not None:
+            return fila[0]
+        if self.has_key(key, version=version):
+            raise TypeError(f"El valor de '{key}' no es un entero.")
+        raise ValueError(f"Key '{key}' not found")
+
+    def delete(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        return self._conexion().execute('DELETE FROM cache WHERE clave = ?', (clave,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        lista = [self.make_and_validate_key(key, version=version) for key in keys]
+        conexion = self._conexion()
+        for i in range(0, len(lista), LOTE_PARAMETROS):
+            lote = lista[i:i + LOTE_PARAMETROS]
+            conexion.execute(f'DELETE FROM cache WHERE clave IN ({",".join("?" * len(lote))})', lote)
+
+    def clear(self):
+        self._conexion().execute('DELETE FROM cache')
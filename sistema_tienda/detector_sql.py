@@ -0,0 +1,132 @@
+# sistema_tienda/detector_sql.py
+# Detector de consultas N+1 y registro de consultas lentas.
+#
+# 1. N+1: en las peticiones muestreadas (TIENDA_DETECTOR_MUESTREO, de 0 a 1) se
+#    cuenta cuántas veces se ejecuta cada "forma" de SQL. Django ya manda el SQL con
+#    marcadores (%s), así que dos consultas que solo cambian de parámetros tienen el
+#    mismo texto. Si una forma se repite TIENDA_DETECTOR_REPETICIONES veces o más
+#    (por ejemplo 'venta.cliente.nombre_completo' dentro de un {% for %} sin
+#    select_related) se avisa en el logger 'tienda.sql.n_mas_1' con la línea de la
+#    vista y del template que la disparó.
+# 2. Lentas: toda consulta que tarde TIENDA_CONSULTA_LENTA_MS o más se escribe en el
+#    logger 'tienda.sql.lentas' (archivo consultas_lentas.log), en todas las peticiones.
+#
+# Costo: por consulta, dos lecturas del reloj y (si la petición está muestreada) un
+# incremento en un diccionario. La pila de llamadas solo se inspecciona cuando una
+# forma llega al umbral o una consulta es lenta.
+
+import logging
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger_n_mas_1 = logging.getLogger('tienda.sql.n_mas_1')
+logger_lentas = logging.getLogger('tienda.sql.lentas')
+
+# 'IN (%s, %s, %s)' y 'IN (%s)' son la misma forma
+PATRON_IN = re.compile(r'IN \((?:%s, )*%s\)')
+
+RAIZ_PROYECTO = str(settings.BASE_DIR)
+ESTE_ARCHIVO = __file__.rsplit('.', 1)[0]
+
+
+def forma_sql(sql):
+    """Huella de una consulta: igual para las que solo cambian de parámetros."""
+    return PATRON_IN.sub('IN (...)', sql) if 'IN (' in sql else sql
+
+
+def origen():
+    """
+    Dónde se originó la consulta actual: la línea más interna del código del
+    proyecto (vista, modelo, etc.) y, si se estaba renderizando un template, el
+    template y su línea.
+    """
+    codigo, template = None, None
+    marco = sys._getframe(1)
+    while marco is not None and (codigo is None or template is None):
+        archivo = marco.f_code.co_filename
+        if template is None and marco.f_code.co_name == 'render_annotated' and archivo.endswith(('template/base.py', 'template\\base.py')):
+            nodo = marco.f_locals.get('self')
+            origin = getattr(nodo, 'origin', None)
+            token = getattr(nodo, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        elif (codigo is None and archivo.startswith(RAIZ_PROYECTO) and not archivo.startswith(ESTE_ARCHIVO)
+              and 'site-packages' not in archivo):
+            codigo = f'{archivo[len(RAIZ_PROYECTO) + 1:]}:{marco.f_lineno} ({marco.f_code.co_name})'
+        marco = marco.f_back
+    return {'codigo': codigo or '?', 'template': template}
+
+
+# ============ REGISTRO DE UNA PETICIÓN ============
+class _Registro:
+    """Se instala con connection.execute_wrapper() durante una petición."""
+
+    def __init__(self, muestreada, repeticiones, umbral_lenta):
+        self.muestreada = muestreada
+        self.repeticiones = repeticiones
+        self.umbral_lenta = umbral_lenta
+        self.conteo = {}
+        self.origenes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            if self.umbral_lenta and duracion >= self.umbral_lenta:
+                lugar = origen()
+                logger_lentas.warning(
+                    '%.0f ms en %s%s: %s | params=%r',
+                    duracion * 1000, lugar['codigo'],
+                    f" [template {lugar['template']}]" if lugar['template'] else '',
+                    sql, params,
+                )
+            if self.muestreada:
+                forma = forma_sql(sql)
+                veces = self.conteo[forma] = self.conteo.get(forma, 0) + 1
+                if veces == self.repeticiones:
+                    self.origenes[forma] = origen()
+
+    def reportar(self, request):
+        for forma, lugar in self.origenes.items():
+            logger_n_mas_1.warning(
+                'Posible N+1 en %s %s: %d consultas con la misma forma, desde %s%s '
+                '(¿falta select_related/prefetch_related?): %s',
+                request.method, request.path, self.conteo[forma], lugar['codigo'],
+                f" [template {lugar['template']}]" if lugar['template'] else '',
+                forma[:500],
+            )
+
+
+# ============ MIDDLEWARE ============
+class DetectorConsultasMiddleware:
+    """Cuenta las formas de SQL de las peticiones muestreadas y registra las consultas lentas."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'TIENDA_DETECTOR_MUESTREO', 0)
+        self.repeticiones = getattr(settings, 'TIENDA_DETECTOR_REPETICIONES', 5)
+        self.umbral_lenta = getattr(settings, 'TIENDA_CONSULTA_LENTA_MS', 0) / 1000
+        if self.muestreo <= 0 and self.umbral_lenta <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        muestreada = self.muestreo >= 1 or random.random() < self.muestreo
+        if not muestreada and self.umbral_lenta <= 0:
+            return self.get_response(request)
+
+        registro = _Registro(muestreada, self.repeticiones, self.umbral_lenta)
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(registro))
+            respuesta = self.get_response(request)
+        registro.reportar(request)
+        return respuesta
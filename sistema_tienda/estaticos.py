@@ -0,0 +1,153 @@
+# sistema_tienda/estaticos.py
+# Archivos estáticos servidos desde el propio servidor (sin CDNs):
+#
+# 1. 'ComprimidoManifestStaticFilesStorage': en 'collectstatic' agrega el hash del
+#    contenido al nombre (styles.3f2a9c1b7e4d.css) y genera las variantes .gz y .br.
+# 2. 'EstaticosMiddleware': sirve esos archivos eligiendo la variante comprimida que
+#    acepte el navegador, con caché de un año para los nombres con hash.
+#
+# Brotli es opcional (pip install brotli); sin él solo se generan los .gz.
+
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.ttf', '.json', '.txt', '.html', '.xml')
+
+# Nombre generado por ManifestStaticFilesStorage: archivo.<12 hex>.ext
+PATRON_HASH = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+UN_ANIO = 60 * 60 * 24 * 365
+
+# Variantes precomprimidas en orden de preferencia (a igual 'q')
+VARIANTES = (('.br', 'br'), ('.gz', 'gzip'))
+
+
+def codificaciones_aceptadas(cabecera):
+    """
+    Interpreta Accept-Encoding y devuelve {codificación: q}.
+    'gzip;q=0' significa que NO se acepta; un 'q' mal escrito cuenta como 0.
+    """
+    aceptadas = {}
+    for parte in cabecera.split(','):
+        token, *parametros = [pedazo.strip() for pedazo in parte.split(';')]
+        if not token:
+            continue
+        q = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition('=')
+            if nombre.strip().lower() == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        aceptadas[token.lower()] = q
+    return aceptadas
+
+
+def elegir_codificacion(cabecera, disponibles):
+    """De 'disponibles' (en orden de preferencia) devuelve la de mayor 'q' aceptada, o None."""
+    aceptadas = codificaciones_aceptadas(cabecera)
+    comodin = aceptadas.get('*', 0.0)
+    mejor, mejor_q = None, 0.0
+    for codificacion in disponibles:
+        q = aceptadas.get(codificacion, comodin)
+        if q > mejor_q:
+            mejor, mejor_q = codificacion, q
+    return mejor
+
+
+# ============ ALMACENAMIENTO PARA COLLECTSTATIC ============
+class ComprimidoManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además deja listas las versiones .gz y .br."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for nombre in set(self.hashed_files.values()):
+            if nombre.endswith(EXTENSIONES_COMPRIMIBLES):
+                for variante in self._comprimir(nombre):
+                    yield nombre, variante, True
+
+    def _comprimir(self, nombre):
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+
+        variantes = [('.gz', lambda datos: gzip.compress(datos, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append(('.br', lambda datos: brotli.compress(datos, quality=11)))
+
+        for extension, comprimir in variantes:
+            comprimido = comprimir(contenido)
+            # Solo vale la pena si ahorra al menos un 5%
+            if len(comprimido) < len(contenido) * 0.95:
+                with open(ruta + extension, 'wb') as archivo:
+                    archivo.write(comprimido)
+                yield nombre + extension
+
+
+# ============ MIDDLEWARE QUE SIRVE LOS ESTÁTICOS ============
+class EstaticosMiddleware:
+    """
+    Sirve los archivos de STATIC_ROOT (después de 'collectstatic') antes de pasar
+    por sesiones, autenticación, etc.:
+    - Usa el .br o .gz precomprimido si el navegador lo acepta.
+    - Los nombres con hash se marcan como inmutables por un año, así que
+      las visitas repetidas no vuelven a descargar nada.
+    Si el archivo no existe en STATIC_ROOT la petición sigue su camino normal.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = settings.STATIC_URL
+        self.raiz = str(settings.STATIC_ROOT) if getattr(settings, 'STATIC_ROOT', None) else None
+
+    def __call__(self, request):
+        if self.raiz and request.path.startswith(self.prefijo) and request.method in ('GET', 'HEAD'):
+            respuesta = self.servir(request, request.path[len(self.prefijo):])
+            if respuesta is not None:
+                return respuesta
+        return self.get_response(request)
+
+    def servir(self, request, nombre):
+        try:
+            ruta = safe_join(self.raiz, nombre)
+        except (ValueError, SuspiciousFileOperation):
+            return None  # '../' fuera de STATIC_ROOT: que lo resuelva (con 404) el resto de la cadena
+        if not os.path.isfile(ruta):
+            return None
+
+        content_type, _ = mimetypes.guess_type(ruta)
+        extensiones = {
+            nombre_encoding: extension for extension, nombre_encoding in VARIANTES
+            if os.path.isfile(ruta + extension)
+        }
+        encoding = elegir_codificacion(request.headers.get('Accept-Encoding', ''), list(extensiones))
+        ruta_final = ruta + extensiones[encoding] if encoding else ruta
+
+        respuesta = FileResponse(open(ruta_final, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            respuesta['Content-Encoding'] = encoding
+        respuesta['Vary'] = 'Accept-Encoding'
+
+        if PATRON_HASH.search(nombre):
+            respuesta['Cache-Control'] = f'public, max-age={UN_ANIO}, immutable'
+        else:
+            respuesta['Cache-Control'] = 'public, max-age=60'
+        return respuesta
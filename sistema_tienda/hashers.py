@@ -0,0 +1,22 @@
+# sistema_tienda/hashers.py
+# Hasher de contraseñas con costo configurable desde settings.
+#
+# Al iniciar sesión Django compara el hash guardado con la política actual
+# (algoritmo preferido y número de iteraciones) y, si no coincide, vuelve a
+# calcular y guardar el hash de forma transparente. Así un cambio de política
+# se aplica poco a poco, sin pedir a nadie que cambie su contraseña.
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2TiendaHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 con iteraciones tomadas de TIENDA_PBKDF2_ITERACIONES.
+    Usa el mismo nombre de algoritmo ('pbkdf2_sha256') que el hasher de Django,
+    así los hashes existentes se siguen verificando sin cambios.
+    """
+
+    @property
+    def iterations(self):
+        return settings.TIENDA_PBKDF2_ITERACIONES
@@ -0,0 +1,187 @@
+# sistema_tienda/perfilador.py
+# Perfilado bajo demanda de una petición (solo superusuarios).
+#
+# Para perfilar una página lenta basta con agregar '?perfilar=1' a la URL o
+# enviar el encabezado 'X-Perfilar: 1'. La petición se ejecuta bajo cProfile y
+# se guarda en TIENDA_PERFILES_DIR:
+#   <nombre>.pstats  -> abrir con 'python -m pstats' o snakeviz
+#   <nombre>.json    -> resumen: tiempo total, SQL (línea de tiempo), templates y
+#                       las funciones más costosas
+# Solo se conservan los TIENDA_PERFILES_MAX perfiles más recientes.
+# La respuesta incluye 'X-Perfil' (nombre del perfil) y 'Server-Timing', que se
+# ve en la pestaña "Red" de las herramientas del navegador.
+#
+# Sin el parámetro ni el encabezado el middleware solo hace dos búsquedas en
+# diccionarios/cadenas: no toca la sesión, ni el usuario, ni la base de datos.
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from django.utils._os import safe_join
+
+PARAMETRO = 'perfilar='
+ENCABEZADO = 'HTTP_X_PERFILAR'
+PATRON_NOMBRE = re.compile(r'^[\w.-]+$')
+
+# cProfile no admite dos perfiles activos a la vez en el mismo proceso con fiabilidad
+_candado = threading.Lock()
+
+# Identifica Template.render dentro de las estadísticas de cProfile
+_CLAVE_TEMPLATE = (Template.render.__code__.co_filename, Template.render.__code__.co_firstlineno, 'render')
+
+
+def directorio():
+    return str(getattr(settings, 'TIENDA_PERFILES_DIR', settings.BASE_DIR / 'perfiles'))
+
+
+# ============ MIDDLEWARE ============
+class PerfiladorMiddleware:
+    """
+    Ejecuta la petición bajo cProfile si la pide un superusuario con
+    '?perfilar=1' o 'X-Perfilar: 1'. Va después de AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Camino normal: sin perfilado, sin costo
+        if ENCABEZADO not in request.META and PARAMETRO not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        if not request.user.is_superuser or not _candado.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.perfilar(request)
+        finally:
+            _candado.release()
+
+    def perfilar(self, request):
+        consultas = []
+        inicio = time.perf_counter()
+
+        def _registrar_sql(execute, sql, params, many, context):
+            comienzo = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                consultas.append({
+                    'inicio_ms': round((comienzo - inicio) * 1000, 2),
+                    'duracion_ms': round((time.perf_counter() - comienzo) * 1000, 2),
+                    'alias': context['connection'].alias,
+                    'sql': sql[:1000],
+                })
+
+        perfil = cProfile.Profile()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(_registrar_sql))
+            perfil.enable()
+            try:
+                respuesta = self.get_response(request)
+            finally:
+                perfil.disable()
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        nombre, resumen = guardar(perfil, request, respuesta, total_ms, consultas)
+        respuesta['X-Perfil'] = nombre
+        respuesta['Server-Timing'] = (
+            f"total;dur={total_ms:.1f}, sql;dur={resumen['sql_ms']:.1f};desc=\"{resumen['sql_consultas']} consultas\", "
+            f"templates;dur={resumen['templates_ms']:.1f}"
+        )
+        return respuesta
+
+
+# ============ ALMACENAMIENTO ============
+def guardar(perfil, request, respuesta, total_ms, consultas):
+    """Escribe el .pstats y el resumen .json; luego aplica el límite de retención."""
+    carpeta = directorio()
+    os.makedirs(carpeta, exist_ok=True)
+
+    ruta_url = re.sub(r'[^\w-]+', '_', request.path).strip('_') or 'inicio'
+    nombre = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{ruta_url[:60]}"
+
+    estadisticas = pstats.Stats(perfil)
+    estadisticas.dump_stats(os.path.join(carpeta, nombre + '.pstats'))
+
+    # Template.render es recursivo ({% include %}, {% extends %}); cProfile ya
+    # cuenta una sola vez el tiempo acumulado de las llamadas anidadas.
+    templates = estadisticas.stats.get(_CLAVE_TEMPLATE)
+    texto = io.StringIO()
+    pstats.Stats(perfil, stream=texto).sort_stats('cumulative').print_stats(30)
+
+    resumen = {
+        'nombre': nombre,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'metodo': request.method,
+        'ruta': request.get_full_path(),
+        'usuario': request.user.get_username(),
+        'status': respuesta.status_code,
+        'total_ms': round(total_ms, 2),
+        'sql_consultas': len(consultas),
+        'sql_ms': round(sum(c['duracion_ms'] for c in consultas), 2),
+        'templates_ms': round(templates[3] * 1000, 2) if templates else 0.0,
+        'sql': consultas,
+        'funciones': texto.getvalue(),
+    }
+    with open(os.path.join(carpeta, nombre + '.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(resumen, archivo, ensure_ascii=False, indent=1)
+
+    podar(carpeta)
+    return nombre, resumen
+
+
+def podar(carpeta=None):
+    """Borra los perfiles más antiguos para no pasar de TIENDA_PERFILES_MAX."""
+    carpeta = carpeta or directorio()
+    maximo = getattr(settings, 'TIENDA_PERFILES_MAX', 50)
+    nombres = sorted(
+        (archivo[:-len('.json')] for archivo in os.listdir(carpeta) if archivo.endswith('.json')),
+        reverse=True,
+    )
+    for nombre in nombres[maximo:]:
+        for extension in ('.json', '.pstats'):
+            try:
+                os.remove(os.path.join(carpeta, nombre + extension))
+            except FileNotFoundError:
+                pass
+
+
+def listar():
+    """Resúmenes de los perfiles guardados, del más reciente al más antiguo (sin 'sql' ni 'funciones')."""
+    carpeta = directorio()
+    if not os.path.isdir(carpeta):
+        return []
+    perfiles = []
+    for archivo in sorted(os.listdir(carpeta), reverse=True):
+        if archivo.endswith('.json'):
+            try:
+                with open(os.path.join(carpeta, archivo), encoding='utf-8') as f:
+                    resumen = json.load(f)
+            except (OSError, ValueError):
+                continue
+            resumen.pop('sql', None)
+            resumen.pop('funciones', None)
+            perfiles.append(resumen)
+    return perfiles
+
+
+def ruta(nombre, extension):
+    """Ruta segura del archivo de un perfil, o None si el nombre no es válido o no existe."""
+    if not PATRON_NOMBRE.match(nombre) or extension not in ('.json', '.pstats'):
+        return None
+    try:
+        ruta_archivo = safe_join(directorio(), nombre + extension)
+    except ValueError:
+        return None
+    return ruta_archivo if os.path.isfile(ruta_archivo) else None
@@ -0,0 +1,29 @@
+# sistema_tienda/procesos.py
+# Arranque de los procesos hijos de un ProcessPoolExecutor
+# (comandos 'worker --procesos' y 'crear_usuarios_masivo').
+#
+# Este módulo NO debe importar modelos: con el método 'spawn' (Windows, macOS y el
+# default de Python 3.14 en Linux) el hijo lo importa para encontrar el initializer
+# antes de que Django esté configurado.
+
+import os
+
+
+def iniciar_proceso():
+    """
+    Initializer del pool; sirve igual con 'fork' que con 'spawn'.
+    - spawn: el hijo arranca vacío; se configura Django (abre sus conexiones al usarlas).
+    - fork: el hijo hereda los sockets de las conexiones del padre; se olvidan SIN
+      cerrarlos (close() mandaría QUIT por el socket compartido y cortaría la conexión
+      del padre) y el hijo abre las suyas.
+    """
+    import django
+    from django.apps import apps
+    from django.db import connections
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
+        django.setup()
+        return
+    for conexion in connections.all(initialized_only=True):
+        conexion.connection = None
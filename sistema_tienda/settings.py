@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,11 +45,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'sistema_tienda.estaticos.EstaticosMiddleware', # Sirve /static/ comprimido y con caché larga
+    'django.middleware.gzip.GZipMiddleware', # Comprime las páginas HTML (gzip)
+    'sistema_tienda.detector_sql.DetectorConsultasMiddleware', # N+1 y consultas lentas, ver detector_sql.py
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tienda.sucursales.SucursalMiddleware', # request.sucursal_id (sucursal del empleado o la elegida)
+    'tienda.auditoria.AuditoriaMiddleware', # Atribuye los cambios auditados a request.user, ver tienda/auditoria.py
     'django.contrib.messages.middleware.MessageMiddleware',
+    'sistema_tienda.perfilador.PerfiladorMiddleware', # ?perfilar=1 (solo superusuarios), ver perfilador.py
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -64,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'tienda.sucursales.contexto', # Selector de sucursal del menú
             ],
         },
     },
@@ -97,9 +105,44 @@ DATABASES = {
 }
 
 
+# --- SUCURSALES EN BASES DE DATOS SEPARADAS (opcional, ver tienda/routers.py) ---
+# Formato: "codigo_sucursal=archivo.sqlite3,...". Las sucursales que comparten
+# archivo forman un grupo en la misma base. Vacío = todo en 'default'.
+#   TIENDA_BD_SUCURSALES="centro=grupo_a.sqlite3,norte=grupo_a.sqlite3,sur=grupo_b.sqlite3"
+TIENDA_BASES_SUCURSAL = {}
+for _par in filter(None, os.environ.get('TIENDA_BD_SUCURSALES', '').split(',')):
+    _codigo, _archivo = (parte.strip() for parte in _par.split('=', 1))
+    _alias = Path(_archivo).stem
+    DATABASES.setdefault(_alias, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / _archivo})
+    TIENDA_BASES_SUCURSAL[_codigo] = _alias
+DATABASE_ROUTERS = ['tienda.routers.SucursalRouter'] if TIENDA_BASES_SUCURSAL else []
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# --- POLÍTICA DE HASH DE CONTRASEÑAS ---
+# TIENDA_HASHER elige el algoritmo preferido para los hashes nuevos:
+#   'pbkdf2' (default), 'argon2' (pip install argon2-cffi), 'bcrypt' (pip install bcrypt) o 'scrypt'.
+# TIENDA_PBKDF2_ITERACIONES ajusta el costo de PBKDF2 (default de Django 5.2: 1,000,000).
+# Si la política cambia, cada usuario se re-hashea automáticamente en su siguiente login.
+# Medir el efecto en logins concurrentes: python benchmark_login.py
+TIENDA_HASHER = os.environ.get('TIENDA_HASHER', 'pbkdf2')
+TIENDA_PBKDF2_ITERACIONES = int(os.environ.get('TIENDA_PBKDF2_ITERACIONES', 1_000_000))
+
+_HASHERS = {
+    'pbkdf2': 'sistema_tienda.hashers.PBKDF2TiendaHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+# El preferido va primero; los demás quedan para verificar hashes antiguos
+PASSWORD_HASHERS = [_HASHERS[TIENDA_HASHER]] + [
+    hasher for nombre, hasher in _HASHERS.items() if nombre != TIENDA_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -136,8 +179,105 @@ USE_TZ = True  # Activar soporte de zonas horarias
 # ...
 STATIC_URL = 'static/' # Define la URL base para archivos estáticos (ej: /static/).
 STATICFILES_DIRS = [
-    BASE_DIR / "static", # Directorio para archivos estáticos de todo el proyecto (permite encontrar 'static/css/styles.css').
+    BASE_DIR / "sistema_tienda" / "static", # Estáticos del proyecto: 'css/styles.css' y las librerías en 'vendor/' (Bootstrap, Font Awesome).
 ]
+STATIC_ROOT = BASE_DIR / "staticfiles" # Destino de 'python manage.py collectstatic'.
+
+# collectstatic agrega el hash del contenido a cada nombre y genera las variantes .gz/.br
+# (ver sistema_tienda/estaticos.py). Con DEBUG=True se siguen usando los nombres originales.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'sistema_tienda.estaticos.ComprimidoManifestStaticFilesStorage',
+    },
+}
+
+# --- PERFILADO BAJO DEMANDA (sistema_tienda/perfilador.py) ---
+# Un superusuario agrega '?perfilar=1' a cualquier URL; los perfiles se ven en /perfiles/.
+TIENDA_PERFILES_DIR = Path(os.environ.get('TIENDA_PERFILES_DIR', BASE_DIR / 'perfiles'))
+TIENDA_PERFILES_MAX = int(os.environ.get('TIENDA_PERFILES_MAX', 50)) # Se borran los más antiguos
+
+# --- DETECTOR DE N+1 Y CONSULTAS LENTAS (sistema_tienda/detector_sql.py) ---
+# Fracción de peticiones en las que se buscan N+1 (1.0 = todas; en producción basta con 0.01).
+TIENDA_DETECTOR_MUESTREO = float(os.environ.get('TIENDA_DETECTOR_MUESTREO', 1.0 if DEBUG else 0.01))
+TIENDA_DETECTOR_REPETICIONES = int(os.environ.get('TIENDA_DETECTOR_REPETICIONES', 5)) # Misma forma de SQL N veces = aviso
+TIENDA_CONSULTA_LENTA_MS = int(os.environ.get('TIENDA_CONSULTA_LENTA_MS', 200)) # 0 desactiva el registro de lentas
+
+# --- DASHBOARD EN VIVO (tienda/en_vivo.py) ---
+# Cada cuántos segundos se revisa si hay ventas nuevas mientras haya navegadores conectados.
+TIENDA_EN_VIVO_INTERVALO = float(os.environ.get('TIENDA_EN_VIVO_INTERVALO', 2))
+
+# --- CACHÉ DE DATOS DE REFERENCIA (tienda/referencia.py) ---
+# Opciones de categorías/proveedores/productos y fotos de productos en memoria de cada proceso.
+TIENDA_REFERENCIA_TTL = int(os.environ.get('TIENDA_REFERENCIA_TTL', 30)) # Segundos que otro proceso puede tardar en ver un cambio
+TIENDA_REFERENCIA_MAX = int(os.environ.get('TIENDA_REFERENCIA_MAX', 2000)) # Entradas en memoria (LRU)
+
+# --- CARRITO: RESERVAS DE STOCK (tienda/reservas.py) ---
+# Minutos que las unidades agregadas a un carrito quedan apartadas antes de liberarse solas.
+TIENDA_RESERVA_MINUTOS = int(os.environ.get('TIENDA_RESERVA_MINUTOS', 15))
+
+# --- AUDITORÍA (tienda/auditoria.py) ---
+# Los cambios se juntan en memoria y un hilo los escribe por lotes.
+TIENDA_AUDITORIA_INTERVALO = float(os.environ.get('TIENDA_AUDITORIA_INTERVALO', 2)) # Segundos entre escrituras
+TIENDA_AUDITORIA_LOTE = int(os.environ.get('TIENDA_AUDITORIA_LOTE', 500)) # Filas por bulk_create (y umbral para escribir antes)
+TIENDA_AUDITORIA_MAX = int(os.environ.get('TIENDA_AUDITORIA_MAX', 10000)) # Entradas en memoria antes de escribir en la petición
+
+# --- BITÁCORA DE STOCK (tienda/inventario.py, 'python manage.py snapshot_stock') ---
+# El snapshot se corta este número de segundos antes de 'ahora': un movimiento toma su fecha
+# antes del COMMIT y una transacción más lenta que el margen quedaría fuera del snapshot y del delta.
+TIENDA_SNAPSHOT_MARGEN = int(os.environ.get('TIENDA_SNAPSHOT_MARGEN', 600)) # Mayor que la transacción más larga
+
+# --- EXPORTACIÓN POR COLUMNAS (tienda/columnar.py, 'python manage.py exportar_columnar') ---
+TIENDA_COLUMNAR_DIR = Path(os.environ.get('TIENDA_COLUMNAR_DIR', BASE_DIR / 'columnar'))
+
+# --- CACHÉ (CACHES) ---
+# La caché guarda las versiones y listas de tienda/referencia.py, el ranking, los
+# candados con cache.add() y, con TIENDA_SESIONES='cache', las sesiones.
+# Modos con la variable de entorno TIENDA_CACHE:
+#   'local'  -> memoria de cada proceso (default; cada worker de gunicorn tiene la suya).
+#               Solo para desarrollo: el ranking de vendedores necesita una caché
+#               compartida ('manage.py check --deploy' avisa con tienda.W001).
+#   'sqlite' -> archivo SQLite en modo WAL compartido por todos los workers del
+#               servidor, sin Redis (sistema_tienda/cache_sqlite.py)
+#   'db'     -> tabla de la base de datos (antes: python manage.py createcachetable)
+# Comparación: python benchmark_cache.py
+TIENDA_CACHE = os.environ.get('TIENDA_CACHE', 'local')
+TIENDA_CACHE_MAX = int(os.environ.get('TIENDA_CACHE_MAX', 20000)) # Entradas antes de recortar las menos usadas
+
+CACHES = {'default': {
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sqlite': {
+        'BACKEND': 'sistema_tienda.cache_sqlite.SQLiteCache',
+        'LOCATION': Path(os.environ.get('TIENDA_CACHE_ARCHIVO', BASE_DIR / 'cache_tienda.sqlite3')),
+    },
+    'db': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'tienda_cache'},
+}[TIENDA_CACHE]}
+CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': TIENDA_CACHE_MAX, 'CULL_FREQUENCY': 10}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+        'consultas_lentas': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'consultas_lentas.log',
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 3,
+            'delay': True, # El archivo se crea con la primera consulta lenta
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'tienda.sql.n_mas_1': {'handlers': ['consola'], 'level': 'WARNING', 'propagate': False},
+        'tienda.sql.lentas': {'handlers': ['consultas_lentas', 'consola'], 'level': 'WARNING', 'propagate': False},
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -165,4 +305,29 @@ LOGIN_URL = 'tienda:login'
 LOGIN_REDIRECT_URL = 'tienda:home'
 
 # Dónde ir después de cerrar sesión
-LOGOUT_REDIRECT_URL = 'tienda:login'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'tienda:login'
+
+
+# --- SESIONES Y MENSAJES (SIN ESCRITURAS EN LA BASE DE DATOS) ---
+# Por defecto Django guarda la sesión en la tabla 'django_session', lo que cuesta
+# una lectura (y a veces una escritura) en cada página. Modos disponibles con la
+# variable de entorno TIENDA_SESIONES:
+#   'cookie' -> sesión firmada en una cookie (default, cero consultas)
+#   'cache'  -> sesión en la caché configurada en CACHES (cero consultas;
+#               usar solo si la caché es compartida entre workers, ej. TIENDA_CACHE='sqlite')
+#   'db'     -> comportamiento original de Django (tabla django_session)
+# Comparación de consultas: python benchmark_sesiones.py
+TIENDA_SESIONES = os.environ.get('TIENDA_SESIONES', 'cookie')
+
+SESSION_ENGINE = {
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+}[TIENDA_SESIONES]
+
+# Los mensajes flash viajan en su propia cookie firmada, nunca en la sesión
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Solo se reescribe la sesión cuando cambia (login/logout), no en cada petición
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_COOKIE_HTTPONLY = True
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_tienda.settings')
 
 application = get_wsgi_application()
+
+# Mapa de códigos de barras y opciones del punto de venta listos antes de la primera venta
+from tienda.referencia import precalentar  # noqa: E402
+precalentar()
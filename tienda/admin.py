@@ -2,16 +2,18 @@
 
 # Importamos el módulo admin de Django para registrar modelos
 from django.contrib import admin
+from django.db import transaction
 # Importamos todos nuestros modelos
-from .models import Categoria, Producto, Proveedor, Cliente, PerfilUsuario, Venta
+from .models import Categoria, Producto, Proveedor, Cliente, PerfilUsuario, Venta, MovimientoStock, Tarea, Sucursal, StockSucursal, Reserva, Auditoria, Promocion, OrdenCompra, LineaOrdenCompra, Recepcion, LineaRecepcion
+from .inventario import registrar_movimiento
 
 
 # ============ CONFIGURACIÓN DEL ADMIN PARA PERFILES DE USUARIO ============
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
     """Configuración personalizada del admin para Perfiles de Usuario"""
-    list_display = ('user', 'rol', 'departamento', 'activo', 'fecha_contratacion')  # Columnas visibles
-    list_filter = ('rol', 'activo', 'departamento')  # Filtros laterales por rol, estado y departamento
+    list_display = ('user', 'rol', 'sucursal', 'departamento', 'activo', 'fecha_contratacion')  # Columnas visibles
+    list_filter = ('rol', 'sucursal', 'activo', 'departamento')  # Filtros laterales por rol, estado y departamento
     search_fields = ('user__username', 'user__email', 'departamento')  # Búsqueda por usuario o departamento
     list_editable = ('rol', 'activo')  # Permite editar rol y estado desde la lista
     ordering = ('-fecha_contratacion',)  # Orden descendente por fecha de contratación
@@ -33,16 +35,28 @@ class ProductoAdmin(admin.ModelAdmin):
     """Configuración personalizada del admin para Productos"""
     
     # CORRECCIÓN: Se cambió 'precio' por 'precio_venta' para que coincida con el modelo
-    list_display = ('id', 'nombre', 'categoria', 'precio_venta', 'stock', 'activo', 'fecha_creacion')
+    list_display = ('id', 'codigo', 'nombre', 'categoria', 'precio_venta', 'stock', 'activo', 'fecha_creacion')
     
-    search_fields = ('nombre', 'descripcion')  # Búsqueda por nombre o descripción
+    search_fields = ('codigo', 'nombre', 'descripcion')  # Búsqueda por código, nombre o descripción
     list_filter = ('categoria', 'activo', 'fecha_creacion')  # Filtros por categoría, estado y fecha
     
     # CORRECCIÓN: Se cambió 'precio' por 'precio_venta'
-    list_editable = ('precio_venta', 'stock', 'activo')  # Campos editables directamente en la lista
+    # 'stock' no es editable aquí: cada cambio de stock debe quedar en la bitácora
+    # (ventas, compras, ajuste masivo o edición desde la vista)
+    list_editable = ('precio_venta', 'activo')  # Campos editables directamente en la lista
     
     ordering = ('-fecha_creacion',)  # Orden descendente por fecha
 
+    def get_readonly_fields(self, request, obj=None):
+        # Al crear se puede fijar el stock inicial (se registra como 'alta')
+        return ('stock',) if obj is not None else ()
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change:
+                registrar_movimiento(obj, obj.stock, 'alta', usuario=request.user, referencia='Admin')
+
 
 # ============ CONFIGURACIÓN DEL ADMIN PARA PROVEEDORES ============
 @admin.register(Proveedor)
@@ -70,12 +84,69 @@ class ClienteAdmin(admin.ModelAdmin):
     ordering = ('apellido', 'nombre')  # Orden por apellido y luego nombre
 
 
+# ============ CONFIGURACIÓN DEL ADMIN PARA SUCURSALES ============
+@admin.register(Sucursal)
+class SucursalAdmin(admin.ModelAdmin):
+    """Sucursales (tiendas físicas)"""
+    list_display = ('id', 'codigo', 'nombre', 'activa')
+    search_fields = ('codigo', 'nombre')
+    list_filter = ('activa',)
+    ordering = ('nombre',)
+
+
+@admin.register(StockSucursal)
+class StockSucursalAdmin(admin.ModelAdmin):
+    """Existencias por sucursal (Solo Lectura, se mueven desde las vistas)"""
+    list_display = ('producto', 'sucursal', 'stock')
+    list_filter = ('sucursal',)
+    search_fields = ('producto__nombre',)
+    list_select_related = ('producto', 'sucursal')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+
+# ============ CONFIGURACIÓN DEL ADMIN PARA RESERVAS DE STOCK ============
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    """Carritos abiertos (Solo Lectura; se pueden borrar para liberar las unidades)"""
+    list_display = ('id', 'producto', 'usuario', 'cantidad', 'creada', 'vence')
+    search_fields = ('producto__nombre', 'usuario__username')
+    ordering = ('vence',)
+    list_select_related = ('producto', 'usuario')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+
+# ============ CONFIGURACIÓN DEL ADMIN PARA PROMOCIONES ============
+@admin.register(Promocion)
+class PromocionAdmin(admin.ModelAdmin):
+    """Reglas de precio de la caja (al guardar se recompilan, ver tienda/promociones.py)"""
+    list_display = ('nombre', 'tipo', 'valor', 'lleva', 'paga', 'producto', 'categoria', 'inicio', 'fin', 'activa')
+    list_filter = ('activa', 'tipo', 'categoria')
+    search_fields = ('nombre', 'producto__nombre', 'categoria__nombre')
+    list_select_related = ('producto', 'categoria')
+    raw_id_fields = ('producto',)
+
+    # Otros procesos pueden tener la tabla compilada hasta TIENDA_REFERENCIA_TTL segundos:
+    # una promoción se desactiva (no se borra) para que sus ventas no apunten a una fila inexistente
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # ============ ¡NUEVO! CONFIGURACIÓN DEL ADMIN PARA VENTAS ============
 @admin.register(Venta)
 class VentaAdmin(admin.ModelAdmin):
     """Configuración personalizada del admin para Ventas (Solo Lectura)"""
-    list_display = ('id', 'fecha_venta', 'cliente', 'vendedor', 'producto', 'cantidad', 'precio_unitario', 'total')
-    list_filter = ('fecha_venta', 'vendedor', 'cliente', 'producto')
+    list_display = ('id', 'fecha_venta', 'sucursal', 'cliente', 'vendedor', 'producto', 'cantidad', 'precio_unitario', 'descuento', 'total')
+    list_filter = ('sucursal', 'fecha_venta', 'vendedor', 'cliente', 'producto')
     search_fields = ('cliente__nombre', 'producto__nombre', 'vendedor__username')
     ordering = ('-fecha_venta',)
     
@@ -85,4 +156,113 @@ class VentaAdmin(admin.ModelAdmin):
         return False
 
     def has_add_permission(self, request):
-        return False
\ No newline at end of file
+        return False
+
+
+# ============ CONFIGURACIÓN DEL ADMIN PARA COMPRAS ============
+class LineaOrdenCompraInline(admin.TabularInline):
+    model = LineaOrdenCompra
+    extra = 0
+    raw_id_fields = ('producto',)
+    readonly_fields = ('recibida',)
+
+
+@admin.register(OrdenCompra)
+class OrdenCompraAdmin(admin.ModelAdmin):
+    """Órdenes a proveedores (la recepción se hace desde la vista, ver tienda/compras.py)"""
+    list_display = ('id', 'fecha_creacion', 'proveedor', 'estado', 'creada_por')
+    list_filter = ('estado', 'proveedor')
+    search_fields = ('proveedor__nombre', 'notas')
+    ordering = ('-fecha_creacion',)
+    list_select_related = ('proveedor', 'creada_por')
+    inlines = [LineaOrdenCompraInline]
+    readonly_fields = ('creada_por',)
+
+
+class LineaRecepcionInline(admin.TabularInline):
+    model = LineaRecepcion
+    extra = 0
+    readonly_fields = ('producto', 'cantidad', 'costo_unitario')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Recepcion)
+class RecepcionAdmin(admin.ModelAdmin):
+    """Entregas recibidas (Solo Lectura: el stock ya se sumó al registrarlas)"""
+    list_display = ('id', 'fecha', 'orden', 'sucursal', 'recibida_por')
+    list_filter = ('sucursal', 'fecha')
+    search_fields = ('orden__proveedor__nombre', 'recibida_por__username')
+    ordering = ('-fecha',)
+    list_select_related = ('orden__proveedor', 'sucursal', 'recibida_por')
+    inlines = [LineaRecepcionInline]
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# ============ CONFIGURACIÓN DEL ADMIN PARA MOVIMIENTOS DE STOCK ============
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    """Bitácora de movimientos de stock (Solo Lectura, es de solo-inserción)"""
+    list_display = ('id', 'fecha', 'producto', 'cantidad', 'motivo', 'usuario', 'venta', 'referencia')
+    list_filter = ('motivo', 'fecha')
+    search_fields = ('producto__nombre', 'referencia', 'usuario__username')
+    ordering = ('-fecha',)
+    list_select_related = ('producto', 'usuario', 'venta')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# ============ CONFIGURACIÓN DEL ADMIN PARA AUDITORÍA ============
+@admin.register(Auditoria)
+class AuditoriaAdmin(admin.ModelAdmin):
+    """Quién cambió qué (Solo Lectura, la escribe tienda/auditoria.py)"""
+    list_display = ('id', 'fecha', 'usuario', 'accion', 'modelo', 'objeto_id')
+    list_filter = ('accion', 'modelo', 'fecha')
+    search_fields = ('usuario__username', 'objeto_id')
+    ordering = ('-fecha',)
+    list_select_related = ('usuario',)
+    readonly_fields = ('fecha', 'usuario', 'modelo', 'objeto_id', 'accion', 'cambios')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# ============ CONFIGURACIÓN DEL ADMIN PARA TAREAS EN SEGUNDO PLANO ============
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    """Cola de tareas (Solo Lectura, las crean las vistas y las ejecuta el worker)"""
+    list_display = ('id', 'tipo', 'estado', 'creada_por', 'fecha_creacion', 'fecha_inicio', 'fecha_fin')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('tipo', 'creada_por__username')
+    ordering = ('-fecha_creacion',)
+    exclude = ('resultado',)
+    readonly_fields = ('tipo', 'parametros', 'estado', 'creada_por', 'fecha_inicio', 'fecha_fin', 'nombre_archivo', 'content_type', 'error')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
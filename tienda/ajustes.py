@@ -0,0 +1,106 @@
+# tienda/ajustes.py
+# Ajustes masivos de precio y stock sobre los productos.
+# Todo se resuelve con UN solo UPDATE usando expresiones F, así el tiempo
+# que pasa la aplicación es el mismo para 10 productos que para 100,000.
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Value, DecimalField, IntegerField
+from django.db.models.functions import Greatest, Round
+
+from .models import Producto
+from .inventario import registrar_movimientos_masivos
+from .versiones import tocar_version
+from . import auditoria, referencia
+
+
+TIPOS_AJUSTE_PRECIO = (
+    ('ninguno', 'Sin cambio de precio'),
+    ('porcentaje', 'Porcentaje (%)'),
+    ('absoluto', 'Monto fijo ($)'),
+)
+
+
+# ============ FILTRO DE PRODUCTOS ============
+def filtrar_productos(categoria=None, proveedor=None, activo=None):
+    """Devuelve el queryset de productos que coinciden con los filtros indicados."""
+    productos = Producto.objects.all()
+    if categoria is not None:
+        productos = productos.filter(categoria=categoria)
+    if proveedor is not None:
+        productos = productos.filter(proveedor=proveedor)
+    if activo is not None:
+        productos = productos.filter(activo=activo)
+    return productos
+
+
+# ============ EXPRESIONES DE AJUSTE ============
+def _expresion_precio(tipo_precio, valor_precio):
+    """Construye la expresión F del nuevo precio (nunca menor a 0)."""
+    campo = Producto._meta.get_field('precio_venta')
+    salida = DecimalField(max_digits=campo.max_digits, decimal_places=campo.decimal_places)
+    valor = Decimal(valor_precio)
+
+    if tipo_precio == 'porcentaje':
+        factor = Decimal('1') + valor / Decimal('100')
+        nuevo = F('precio_venta') * Value(factor, output_field=salida)
+    elif tipo_precio == 'absoluto':
+        nuevo = F('precio_venta') + Value(valor, output_field=salida)
+    else:
+        raise ValueError(f"Tipo de ajuste de precio desconocido: {tipo_precio}")
+
+    return Greatest(
+        Round(nuevo, campo.decimal_places, output_field=salida),
+        Value(Decimal('0'), output_field=salida),
+        output_field=salida,
+    )
+
+
+def _expresion_stock(ajuste_stock):
+    """Construye la expresión F del nuevo stock (nunca menor a 0)."""
+    return Greatest(
+        F('stock') + Value(int(ajuste_stock)),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+# ============ AJUSTE MASIVO ============
+def ajustar_productos(productos, tipo_precio='ninguno', valor_precio=0, ajuste_stock=0, dry_run=False, usuario=None):
+    """
+    Aplica un ajuste de precio y/o stock a todos los productos del queryset.
+
+    - tipo_precio: 'ninguno', 'porcentaje' (ej. 10 = +10%, -5 = -5%) o 'absoluto' (ej. 2.50 = +$2.50).
+    - ajuste_stock: unidades a sumar (o restar si es negativo).
+    - dry_run: si es True no modifica nada, solo cuenta los productos afectados.
+    - usuario: quien hace el ajuste (queda en la bitácora de movimientos de stock).
+
+    Devuelve el número de productos afectados (un solo COUNT o un solo UPDATE;
+    si cambia el stock, además el UPDATE que bloquea las filas y un INSERT ... SELECT
+    en la bitácora).
+    """
+    cambios = {}
+    if tipo_precio != 'ninguno' and valor_precio:
+        cambios['precio_venta'] = _expresion_precio(tipo_precio, valor_precio)
+    if ajuste_stock:
+        cambios['stock'] = _expresion_stock(ajuste_stock)
+
+    if dry_run or not cambios:
+        return productos.count()
+
+    with transaction.atomic():
+        if 'stock' in cambios:
+            # Bloquea las filas (UPDATE sin cambios, como reservas.bloquear): una venta
+            # simultánea espera y el stock leído por el INSERT ... SELECT es el que cambia el UPDATE
+            productos.update(stock=F('stock'))
+            registrar_movimientos_masivos(productos, cambios['stock'], 'ajuste_masivo', usuario=usuario)
+        afectados = productos.update(**cambios)
+        # Una sola entrada con los parámetros: los valores anteriores ya están en la bitácora de stock
+        auditoria.registrar(Producto, None, 'ajuste_masivo', {
+            'tipo_precio': tipo_precio, 'valor_precio': valor_precio, 'ajuste_stock': ajuste_stock, 'afectados': afectados,
+        }, usuario=usuario)
+        # update() no dispara señales: invalidamos los ETag y las fotos de productos a mano
+        tocar_version(Producto)
+        referencia.invalidar('producto')
+        return afectados
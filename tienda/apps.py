@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TiendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tienda'
+
+    def ready(self):
+        # Registra los receptores de señales (versiones por modelo, etc.)
+        from . import signals  # noqa: F401
+        from . import checks  # noqa: F401
@@ -0,0 +1,217 @@
+# tienda/auditoria.py
+# Bitácora de auditoría: quién creó, editó o eliminó productos, clientes,
+# proveedores, categorías y ventas, con el valor anterior y el nuevo de cada campo.
+#
+# Escribir la auditoría en la misma petición sería un INSERT más en cada venta.
+# En su lugar:
+# - Al cargar una fila solo se guarda la referencia a los valores que trajo la base
+#   (models.Auditado.from_db: sin copias ni señales por fila; un listado de mil filas
+#   no paga nada). Al guardarla se compara y solo se anotan los campos que cambiaron.
+# - La entrada se agrega al búfer en memoria del proceso cuando la transacción se
+#   confirma (si se revierte, no hubo cambio que auditar).
+# - Un hilo del proceso escribe el búfer con bulk_create cada
+#   TIENDA_AUDITORIA_INTERVALO segundos, o antes si se junta un lote.
+# - Memoria acotada: si una ráfaga llena el búfer (TIENDA_AUDITORIA_MAX
+#   entradas), quien agrega escribe en ese momento. Si la base no responde, se
+#   descartan las entradas más viejas y se registra cuántas en el log.
+# - Al terminar el proceso (atexit) se escribe lo pendiente.
+#
+# El usuario sale de AuditoriaMiddleware (o de 'como_usuario()' en comandos y tareas).
+# Los cambios hechos con queryset.update() no disparan señales: los ajustes masivos
+# y los borrados lógicos llaman a 'registrar()' a mano.
+
+import atexit
+import functools
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Auditoria
+
+logger = logging.getLogger('tienda.auditoria')
+
+_local = threading.local()
+
+
+# ============ USUARIO ACTUAL ============
+def usuario_actual():
+    return getattr(_local, 'usuario', None)
+
+
+@contextmanager
+def como_usuario(usuario):
+    """Fija el usuario al que se atribuyen los cambios del hilo."""
+    anterior = usuario_actual()
+    _local.usuario = usuario
+    try:
+        yield
+    finally:
+        _local.usuario = anterior
+
+
+class AuditoriaMiddleware:
+    """Atribuye los cambios de la petición a request.user. Va después de AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # request.user es perezoso: solo se consulta si la petición cambia algo auditado
+        with como_usuario(request.user):
+            return self.get_response(request)
+
+
+def _usuario_id(usuario=None):
+    usuario = usuario or usuario_actual()
+    if usuario is None or not usuario.is_authenticated:
+        return None
+    return usuario.pk
+
+
+# ============ COPIA Y DIFERENCIAS ============
+@functools.cache
+def _campos(modelo):
+    """Campos auditados: todos los de la tabla salvo la llave y las fechas automáticas."""
+    return tuple(
+        campo.attname for campo in modelo._meta.concrete_fields
+        if not campo.primary_key and not getattr(campo, 'auto_now', False) and not getattr(campo, 'auto_now_add', False)
+    )
+
+
+def copiar(instancia):
+    """Valores cargados de la fila (los campos diferidos no se leen)."""
+    return {campo: instancia.__dict__[campo] for campo in _campos(type(instancia)) if campo in instancia.__dict__}
+
+
+def cargados(instancia):
+    """Valores con que se leyó la fila (o los del último save()); vacío si no vino de la base."""
+    nombres, valores = getattr(instancia, '_valores_cargados', ((), ()))
+    return dict(zip(nombres, valores))
+
+
+def diferencias(antes, despues, campos=None):
+    """{campo: [antes, después]} de los campos que cambiaron."""
+    return {
+        campo: [antes[campo], valor]
+        for campo, valor in despues.items()
+        if campo in antes and antes[campo] != valor and (campos is None or campo in campos)
+    }
+
+
+# ============ BÚFER Y ESCRITURA EN SEGUNDO PLANO ============
+class Bufer:
+    """Entradas pendientes del proceso y el hilo que las escribe por lotes."""
+
+    def __init__(self, maximo, lote, intervalo):
+        self.maximo = maximo
+        self.lote = lote
+        self.intervalo = intervalo
+        self.descartadas = 0
+        self._entradas = deque()
+        self._candado = threading.Lock()
+        self._escritura = threading.Lock()  # Un solo escritor a la vez (hilo, contrapresión o atexit)
+        self._hay_lote = threading.Event()
+        self._hilo = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def agregar(self, entrada):
+        with self._candado:
+            self._entradas.append(entrada)
+            pendientes = len(self._entradas)
+        if pendientes >= self.maximo:
+            # Ráfaga más rápida que el hilo: quien agrega escribe (contrapresión)
+            self.vaciar()
+        elif pendientes >= self.lote:
+            self._hay_lote.set()
+        self._arrancar()
+
+    def _arrancar(self):
+        # Tras un fork (ej. gunicorn --preload) el hilo del padre no existe en el hijo
+        if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+            return
+        with self._candado:
+            if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._trabajar, name='auditoria', daemon=True)
+            self._hilo.start()
+
+    def _trabajar(self):
+        while True:
+            self._hay_lote.wait(self.intervalo)
+            self._hay_lote.clear()
+            self.vaciar()
+            close_old_connections()
+
+    def _tomar(self):
+        with self._candado:
+            return [self._entradas.popleft() for _ in range(min(self.lote, len(self._entradas)))]
+
+    def _devolver(self, lote):
+        """Regresa un lote que no se pudo escribir, sin pasar de 'maximo' entradas."""
+        with self._candado:
+            self._entradas.extendleft(reversed(lote))
+            sobran = len(self._entradas) - self.maximo
+            for _ in range(max(sobran, 0)):
+                self._entradas.popleft()
+        if sobran > 0:
+            self.descartadas += sobran
+            logger.warning('Auditoría: se descartaron %d entradas (la base no responde; %d en total)', sobran, self.descartadas)
+
+    def vaciar(self):
+        """Escribe todo lo pendiente. Devuelve False si la base falló (lo pendiente se reintenta después)."""
+        with self._escritura:
+            while True:
+                lote = self._tomar()
+                if not lote:
+                    return True
+                try:
+                    Auditoria.objects.bulk_create(lote)
+                except Exception:
+                    logger.exception('Auditoría: no se pudo escribir un lote de %d entradas', len(lote))
+                    self._devolver(lote)
+                    return False
+
+
+bufer = Bufer(
+    maximo=getattr(settings, 'TIENDA_AUDITORIA_MAX', 10000),
+    lote=getattr(settings, 'TIENDA_AUDITORIA_LOTE', 500),
+    intervalo=getattr(settings, 'TIENDA_AUDITORIA_INTERVALO', 2),
+)
+atexit.register(bufer.vaciar)
+
+
+# ============ REGISTRO ============
+def registrar(modelo, objeto_id, accion, cambios, using='default', usuario=None):
+    """Anota un cambio; entra al búfer cuando se confirma la transacción de 'using'."""
+    entrada = Auditoria(
+        fecha=timezone.now(), usuario_id=_usuario_id(usuario),
+        modelo=modelo._meta.label_lower, objeto_id=objeto_id, accion=accion, cambios=cambios,
+    )
+    transaction.on_commit(lambda: bufer.agregar(entrada), using=using)
+
+
+def registrar_guardado(instancia, creada, update_fields=None, using='default'):
+    """Desde post_save: creación con todos los campos, edición solo con los que cambiaron."""
+    actual = copiar(instancia)
+    if creada:
+        registrar(type(instancia), instancia.pk, 'crear', {campo: [None, valor] for campo, valor in actual.items()}, using)
+    else:
+        cambios = diferencias(cargados(instancia), actual, update_fields)
+        if cambios:
+            registrar(type(instancia), instancia.pk, 'editar', cambios, using)
+    instancia._valores_cargados = (tuple(actual), tuple(actual.values()))  # Un segundo save() compara contra lo ya guardado
+
+
+def registrar_eliminacion(instancia, using='default'):
+    """Desde post_delete o a mano: los valores que tenía la fila."""
+    registrar(type(instancia), instancia.pk, 'eliminar', {campo: [valor, None] for campo, valor in copiar(instancia).items()}, using)
@@ -0,0 +1,18 @@
+# tienda/checks.py
+# Verificaciones de configuración ('python manage.py check --deploy').
+
+from django.core.checks import Tags, Warning, register
+
+from . import ranking
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartida(app_configs, **kwargs):
+    """El ranking de vendedores (tienda/ranking.py) necesita una caché común a todos los workers."""
+    if ranking.cache_compartida():
+        return []
+    return [Warning(
+        'La caché es la memoria de cada proceso: con varios workers cada uno ve su propio ranking de vendedores.',
+        hint="Usa TIENDA_CACHE='sqlite' (o 'db') en producción; ver sistema_tienda/settings.py.",
+        id='tienda.W001',
+    )]
@@ -0,0 +1,304 @@
+# tienda/columnar.py
+# Exportación de ventas, productos y clientes a archivos por columna (NumPy .npy)
+# para análisis fuera de línea, sin paginar el admin ni cargar la base.
+#
+# Estructura en TIENDA_COLUMNAR_DIR (o --destino):
+#   manifiesto.json                 columnas, tipos, partes y último id exportado por base
+#   ventas/00001/id.npy ...         una parte por exportación (y por base, con sucursales separadas)
+#   ventas/00001/total_centavos.npy
+#   productos/nombre.valores.npy    diccionario de la columna 'nombre' (la parte guarda códigos int32)
+#
+# - Cada columna es un .npy de tipo fijo: se abre con np.load(..., mmap_mode='r')
+#   sin cargarla a memoria ('abrir()' lo hace con todas las partes).
+# - Montos en centavos (int64, exactos); fechas en datetime64[us] UTC; llaves
+#   foráneas vacías = -1. Textos codificados con diccionario: 'nombre' guarda el
+#   índice en 'nombre.valores.npy'.
+# - De clientes solo se exporta nombre, apellido y fecha (sin datos de contacto).
+# - Consistente: cada base se lee en una transacción, hasta el id máximo que había
+#   al empezar. Las filas se leen con values_list().iterator() y se escriben por
+#   lotes directo al archivo (memmap), sin tener la tabla en memoria.
+# - Incremental: solo agrega las filas con id mayor al último exportado. Las filas
+#   viejas no se actualizan (precio o stock editados): para eso, exportación completa.
+# - Las partes se escriben en un directorio temporal y se renombran; el
+#   manifiesto se reemplaza al final. Un lector nunca ve una parte a medias, y lo
+#   que deje una exportación interrumpida (temporales o partes fuera del
+#   manifiesto) se descarta en la siguiente.
+#
+# NumPy es opcional para la aplicación (pip install numpy); solo lo necesita este módulo.
+
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone as tz
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Cliente, Producto, Venta
+from .sucursales import bases
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MANIFIESTO = 'manifiesto.json'
+LOTE = 50000
+NULO = -1
+EPOCA = datetime(1970, 1, 1, tzinfo=tz.utc)
+UN_MICROSEGUNDO = timedelta(microseconds=1)
+
+
+def directorio():
+    return settings.TIENDA_COLUMNAR_DIR
+
+
+# ============ COLUMNAS ============
+# tabla: (modelo, [(columna, campo, tipo)]); 'texto' = codificado con diccionario
+TABLAS = {
+    'ventas': (Venta, [
+        ('id', 'id', 'int64'),
+        ('fecha_venta', 'fecha_venta', 'fecha'),
+        ('sucursal_id', 'sucursal_id', 'fk'),
+        ('producto_id', 'producto_id', 'int64'),
+        ('cliente_id', 'cliente_id', 'int64'),
+        ('vendedor_id', 'vendedor_id', 'fk'),
+        ('cantidad', 'cantidad', 'int32'),
+        ('precio_unitario_centavos', 'precio_unitario', 'centavos'),
+        ('total_centavos', 'total', 'centavos'),
+    ]),
+    'productos': (Producto, [
+        ('id', 'id', 'int64'),
+        ('nombre', 'nombre', 'texto'),
+        ('categoria_id', 'categoria_id', 'fk'),
+        ('proveedor_id', 'proveedor_id', 'fk'),
+        ('precio_venta_centavos', 'precio_venta', 'centavos'),
+        ('stock', 'stock', 'int64'),
+        ('activo', 'activo', 'bool'),
+        ('eliminado', 'eliminado', 'bool'),
+        ('fecha_creacion', 'fecha_creacion', 'fecha'),
+    ]),
+    'clientes': (Cliente, [
+        ('id', 'id', 'int64'),
+        ('nombre', 'nombre', 'texto'),
+        ('apellido', 'apellido', 'texto'),
+        ('eliminado', 'eliminado', 'bool'),
+        ('fecha_registro', 'fecha_registro', 'fecha'),
+    ]),
+}
+
+DTYPES = {
+    'int64': 'int64', 'int32': 'int32', 'fk': 'int64', 'centavos': 'int64',
+    'bool': 'bool', 'fecha': 'datetime64[us]', 'texto': 'int32',
+}
+
+
+def _microsegundos(valor):
+    return (valor - EPOCA) // UN_MICROSEGUNDO
+
+
+def _convertir(valores, tipo, diccionario):
+    """Lista de valores de la base -> arreglo del tipo de la columna."""
+    if tipo == 'fk':
+        return np.array([NULO if v is None else v for v in valores], dtype='int64')
+    if tipo == 'centavos':
+        return np.array([int(v * 100) for v in valores], dtype='int64')
+    if tipo == 'fecha':
+        return np.array([_microsegundos(v) for v in valores], dtype='int64').view('datetime64[us]')
+    if tipo == 'texto':
+        return np.array([diccionario.setdefault(v, len(diccionario)) for v in valores], dtype='int32')
+    return np.array(valores, dtype=DTYPES[tipo])
+
+
+# ============ MANIFIESTO Y DICCIONARIOS ============
+def leer_manifiesto(destino):
+    ruta = os.path.join(destino, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {'version': 1, 'tablas': {}}
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def _reemplazar(ruta, escribir):
+    """Escribe a un temporal y lo renombra (atómico para los lectores)."""
+    temporal = f'{ruta}.tmp-{os.getpid()}'
+    escribir(temporal)
+    os.replace(temporal, ruta)
+
+
+def _guardar_manifiesto(destino, manifiesto):
+    def escribir(ruta):
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(manifiesto, archivo, ensure_ascii=False, indent=2)
+    _reemplazar(os.path.join(destino, MANIFIESTO), escribir)
+
+
+def _ruta_diccionario(destino, tabla, columna):
+    return os.path.join(destino, tabla, f'{columna}.valores.npy')
+
+
+def _leer_diccionario(destino, tabla, columna):
+    ruta = _ruta_diccionario(destino, tabla, columna)
+    if not os.path.exists(ruta):
+        return {}
+    return {valor: codigo for codigo, valor in enumerate(np.load(ruta).tolist())}
+
+
+def _guardar_diccionario(destino, tabla, columna, diccionario):
+    # Solo crece: los códigos de las partes anteriores siguen siendo válidos
+    valores = np.array(list(diccionario), dtype=str) if diccionario else np.array([], dtype='<U1')
+
+    def escribir(ruta):
+        with open(ruta, 'wb') as archivo:  # Con un nombre sin '.npy', np.save se lo agregaría
+            np.save(archivo, valores)
+    _reemplazar(_ruta_diccionario(destino, tabla, columna), escribir)
+
+
+# ============ EXPORTACIÓN ============
+def _escribir_parte(directorio_parte, consulta, columnas, total, diccionarios, lote):
+    """Llena un memmap por columna, 'lote' filas a la vez. Devuelve las filas escritas."""
+    os.makedirs(directorio_parte)
+    arreglos = {
+        nombre: np.lib.format.open_memmap(os.path.join(directorio_parte, f'{nombre}.npy'), mode='w+', dtype=DTYPES[tipo], shape=(total,))
+        for nombre, _, tipo in columnas
+    }
+    escritas = 0
+    filas = consulta.values_list(*[campo for _, campo, _ in columnas]).iterator(chunk_size=lote)
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == lote or escritas + len(bloque) == total:
+            _volcar(arreglos, columnas, bloque, escritas, diccionarios)
+            escritas += len(bloque)
+            bloque = []
+            if escritas == total:
+                break
+    if bloque:
+        _volcar(arreglos, columnas, bloque, escritas, diccionarios)
+        escritas += len(bloque)
+    for arreglo in arreglos.values():
+        arreglo.flush()
+    if escritas < total:
+        # Filas borradas entre el conteo y la lectura (sin aislamiento de lectura repetible)
+        for nombre in list(arreglos):
+            recortado = np.array(arreglos.pop(nombre)[:escritas])  # Copia; el memmap se cierra
+            np.save(os.path.join(directorio_parte, f'{nombre}.npy'), recortado)
+    return escritas
+
+
+def _volcar(arreglos, columnas, bloque, inicio, diccionarios):
+    por_columna = list(zip(*bloque))
+    for (nombre, _, tipo), valores in zip(columnas, por_columna):
+        arreglos[nombre][inicio:inicio + len(bloque)] = _convertir(valores, tipo, diccionarios.get(nombre))
+
+
+def _siguiente_parte(partes):
+    return f'{max((int(parte["nombre"]) for parte in partes), default=0) + 1:05d}'
+
+
+def exportar_tabla(destino, manifiesto, tabla, incremental=False, lote=LOTE):
+    """Agrega una parte por base con las filas nuevas de 'tabla'. Devuelve las filas exportadas."""
+    modelo, columnas = TABLAS[tabla]
+    anterior = manifiesto['tablas'].get(tabla) if incremental else None
+    estado = anterior or {
+        'columnas': {nombre: {'tipo': tipo, 'dtype': DTYPES[tipo]} for nombre, _, tipo in columnas},
+        'partes': [],
+        'ultimos': {},
+    }
+    os.makedirs(os.path.join(destino, tabla), exist_ok=True)
+    diccionarios = {
+        nombre: _leer_diccionario(destino, tabla, nombre) if anterior else {}
+        for nombre, _, tipo in columnas if tipo == 'texto'
+    }
+
+    total_exportado = 0
+    for alias in (bases() if modelo is Venta else ['default']):
+        desde = estado['ultimos'].get(alias, 0)
+        with transaction.atomic(using=alias):
+            filas = modelo._base_manager.using(alias).filter(pk__gt=desde).order_by('pk')
+            hasta = filas.aggregate(maximo=Max('pk'))['maximo']
+            if hasta is None:
+                continue
+            filas = filas.filter(pk__lte=hasta)
+            total = filas.count()
+            if not total:
+                continue
+            nombre = _siguiente_parte(estado['partes'])
+            temporal = os.path.join(destino, tabla, f'.tmp-{nombre}')
+            shutil.rmtree(temporal, ignore_errors=True)
+            escritas = _escribir_parte(temporal, filas, columnas, total, diccionarios, lote)
+        final = os.path.join(destino, tabla, nombre)
+        # Una ejecución interrumpida pudo dejar una parte con este nombre que no llegó
+        # al manifiesto (nadie la lee); os.replace no reemplaza un directorio con archivos
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(temporal, final)
+        estado['partes'].append({
+            'nombre': nombre, 'base': alias, 'desde_id': desde + 1, 'hasta_id': hasta,
+            'filas': escritas, 'fecha': timezone.now().isoformat(),
+        })
+        estado['ultimos'][alias] = hasta
+        total_exportado += escritas
+
+    for nombre, diccionario in diccionarios.items():
+        _guardar_diccionario(destino, tabla, nombre, diccionario)
+    manifiesto['tablas'][tabla] = estado
+    return total_exportado
+
+
+def exportar(destino=None, incremental=False, tablas=None, lote=LOTE):
+    """
+    Exporta las tablas (todas por defecto). La exportación completa se arma en un
+    directorio aparte y reemplaza a la anterior al terminar. Devuelve {tabla: filas}.
+    """
+    destino = str(destino or directorio())
+    tablas = tablas or list(TABLAS)
+    if incremental:
+        trabajo = destino
+        os.makedirs(trabajo, exist_ok=True)
+        manifiesto = leer_manifiesto(trabajo)
+    else:
+        trabajo = f'{destino.rstrip(os.sep)}.tmp-{os.getpid()}'
+        shutil.rmtree(trabajo, ignore_errors=True)
+        os.makedirs(trabajo)
+        manifiesto = {'version': 1, 'tablas': {}}
+
+    resultado = {tabla: exportar_tabla(trabajo, manifiesto, tabla, incremental, lote) for tabla in tablas}
+    manifiesto['fecha'] = timezone.now().isoformat()
+    _guardar_manifiesto(trabajo, manifiesto)
+
+    if not incremental:
+        anterior = f'{destino.rstrip(os.sep)}.anterior-{os.getpid()}'
+        if os.path.exists(destino):
+            os.replace(destino, anterior)
+        os.replace(trabajo, destino)
+        shutil.rmtree(anterior, ignore_errors=True)
+    return resultado
+
+
+# ============ LECTURA (PARA EL ANÁLISIS) ============
+def abrir(tabla, destino=None):
+    """
+    {columna: arreglo} con todas las partes de 'tabla'. Con una sola parte los
+    arreglos son memmap de solo lectura; con varias se concatenan en memoria.
+    """
+    destino = str(destino or directorio())
+    estado = leer_manifiesto(destino)['tablas'][tabla]
+    columnas = {}
+    for nombre in estado['columnas']:
+        trozos = [
+            np.load(os.path.join(destino, tabla, parte['nombre'], f'{nombre}.npy'), mmap_mode='r')
+            for parte in estado['partes']
+        ]
+        if not trozos:
+            columnas[nombre] = np.empty(0, dtype=estado['columnas'][nombre]['dtype'])
+        else:
+            columnas[nombre] = trozos[0] if len(trozos) == 1 else np.concatenate(trozos)
+    return columnas
+
+
+def valores(tabla, columna, destino=None):
+    """Diccionario de una columna de texto: valores(t, c)[codigos] da los textos."""
+    return np.load(_ruta_diccionario(str(destino or directorio()), tabla, columna), mmap_mode='r')
@@ -0,0 +1,120 @@
+# tienda/compras.py
+# Órdenes de compra y recepción de mercancía.
+#
+# Antes se resurtía editando el stock de cada producto en 'producto_editar', lo
+# que además podía pisar una venta hecha entre que se abrió el formulario y se
+# guardó. Ahora:
+# - 'crear_orden()' guarda la orden y sus líneas (un bulk_create).
+# - 'recibir()' aplica una entrega completa en UNA transacción, sin leer el stock:
+#   * las líneas de la recepción y de la bitácora van en bulk_create;
+#   * el stock sube con UPDATE ... SET stock = stock + CASE id WHEN ... END, por
+#     lotes de LOTE productos: el número de consultas no depende de cuántas
+#     líneas traiga la entrega y una venta simultánea nunca se pierde;
+#   * con sucursal, lo mismo en sus existencias (StockSucursal).
+#   La orden se bloquea primero (UPDATE sin cambios, como reservas.bloquear): dos
+#   recepciones de la misma orden se forman y no reciben de más.
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import referencia
+from .models import LineaOrdenCompra, LineaRecepcion, MovimientoStock, OrdenCompra, Producto, Recepcion, StockSucursal
+from .sucursales import alias_de
+from .versiones import tocar_version
+
+LOTE = 500
+
+
+class RecepcionInvalida(Exception):
+    """La entrega no se puede aplicar a la orden (ya cerrada, productos ajenos, cantidades de más)."""
+
+
+def _usuario(usuario):
+    return usuario if usuario is not None and usuario.is_authenticated else None
+
+
+def sumar(queryset, deltas, campo='stock', llave='pk', lote=LOTE):
+    """
+    Suma deltas = {llave: n} a 'campo' con un UPDATE por lote. Es 'campo + n' en la
+    base (F), no un valor calculado en Python: los cambios concurrentes se conservan.
+    """
+    pares = sorted(deltas.items())
+    actualizadas = 0
+    for i in range(0, len(pares), lote):
+        bloque = pares[i:i + lote]
+        suma = Case(*[When(**{llave: clave}, then=Value(delta)) for clave, delta in bloque], default=Value(0), output_field=IntegerField())
+        actualizadas += queryset.filter(**{f'{llave}__in': [clave for clave, _ in bloque]}).update(**{campo: F(campo) + suma})
+    return actualizadas
+
+
+# ============ ORDEN DE COMPRA ============
+def crear_orden(proveedor, lineas, usuario=None, notas=''):
+    """lineas = {producto_id: (cantidad, costo_unitario)}. Devuelve la orden."""
+    with transaction.atomic():
+        orden = OrdenCompra.objects.create(proveedor=proveedor, notas=notas, creada_por=_usuario(usuario))
+        LineaOrdenCompra.objects.bulk_create([
+            LineaOrdenCompra(orden=orden, producto_id=pk, cantidad=cantidad, costo_unitario=costo)
+            for pk, (cantidad, costo) in sorted(lineas.items()) if cantidad > 0
+        ], batch_size=LOTE)
+    return orden
+
+
+# ============ RECEPCIÓN DE MERCANCÍA ============
+def recibir(orden_id, cantidades, usuario=None, sucursal_id=None):
+    """
+    Aplica una entrega: cantidades = {producto_id: unidades recibidas}. Todo o nada.
+    Devuelve la Recepcion; lanza RecepcionInvalida si la orden ya no admite la entrega.
+    """
+    cantidades = {pk: cantidad for pk, cantidad in cantidades.items() if cantidad > 0}
+    if not cantidades:
+        raise RecepcionInvalida('Indica al menos una cantidad recibida.')
+    usuario = _usuario(usuario)
+    alias = alias_de(sucursal_id)
+
+    with transaction.atomic(), transaction.atomic(using=alias):
+        if not OrdenCompra.objects.filter(pk=orden_id, estado__in=OrdenCompra.ABIERTAS).update(actualizada=timezone.now()):
+            raise RecepcionInvalida('La orden ya fue recibida o cancelada.')
+        lineas = {
+            linea.producto_id: linea
+            for linea in LineaOrdenCompra.objects.filter(orden_id=orden_id).select_related('producto').only(
+                'producto_id', 'cantidad', 'recibida', 'costo_unitario', 'producto__nombre',
+            )
+        }
+        if set(cantidades) - set(lineas):
+            raise RecepcionInvalida('La entrega trae productos que no están en la orden.')
+        for pk, cantidad in cantidades.items():
+            if cantidad > lineas[pk].pendiente:
+                raise RecepcionInvalida(f'Se reciben {cantidad} unidades de {lineas[pk].producto.nombre}, pero solo faltan {lineas[pk].pendiente}.')
+
+        recepcion = Recepcion.objects.create(orden_id=orden_id, sucursal_id=sucursal_id, recibida_por=usuario)
+        LineaRecepcion.objects.bulk_create([
+            LineaRecepcion(recepcion=recepcion, producto_id=pk, cantidad=cantidad, costo_unitario=lineas[pk].costo_unitario)
+            for pk, cantidad in sorted(cantidades.items())
+        ], batch_size=LOTE)
+
+        # 'todos': un producto en proceso de purga también registra lo que llegó
+        sumar(Producto.todos.all(), cantidades)
+        if sucursal_id is not None:
+            existencias = StockSucursal.objects.using(alias)
+            existencias.bulk_create(
+                [StockSucursal(sucursal_id=sucursal_id, producto_id=pk, stock=0) for pk in cantidades],
+                ignore_conflicts=True, batch_size=LOTE,
+            )
+            sumar(existencias.filter(sucursal_id=sucursal_id), cantidades, llave='producto_id')
+        sumar(LineaOrdenCompra.objects.filter(orden_id=orden_id), {lineas[pk].pk: cantidad for pk, cantidad in cantidades.items()}, campo='recibida')
+
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(producto_id=pk, cantidad=cantidad, motivo='compra', usuario=usuario,
+                            referencia=f'Recepción #{recepcion.pk} (OC #{orden_id})')
+            for pk, cantidad in sorted(cantidades.items())
+        ], batch_size=LOTE)
+
+        completa = all(linea.recibida + cantidades.get(pk, 0) >= linea.cantidad for pk, linea in lineas.items())
+        OrdenCompra.objects.filter(pk=orden_id).update(estado='recibida' if completa else 'parcial')
+
+        # update() no dispara señales: ETag de productos y fotos de la caché de referencia
+        tocar_version(Producto)
+        referencia.invalidar('producto')
+    return recepcion
+
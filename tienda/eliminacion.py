@@ -0,0 +1,164 @@
+# tienda/eliminacion.py
+# Eliminación en dos pasos para Cliente, Producto y Categoría.
+#
+# Con 'objeto.delete()' Django carga en memoria todas las ventas del cliente o del
+# producto (on_delete=CASCADE) para borrarlas una por una, y al borrar una categoría
+# actualiza todos sus productos (SET_NULL), todo dentro de la misma petición.
+# Con muchos registros la petición tarda y mantiene las tablas bloqueadas.
+#
+# 1. 'eliminar()' (en la vista): marca la fila con 'eliminado=True' y encola la
+#    tarea 'eliminar_en_lotes'. Son dos consultas sin importar cuántos
+#    dependientes tenga, y la fila desaparece al instante de 'objects'.
+# 2. 'purgar()' (en el worker): borra o desvincula los dependientes en lotes,
+#    cada lote en su propia transacción corta, reporta el avance y al final
+#    borra la fila.
+
+from django.db import transaction
+
+from . import auditoria, ranking, referencia
+from .inventario import registrar_movimiento
+from .models import (
+    Categoria, Producto, Cliente, Venta, VentaHistorial, MovimientoStock, SnapshotStock, StockSucursal, Reserva,
+    LineaOrdenCompra, LineaRecepcion, Promocion,
+)
+from .routers import MODELOS_POR_SUCURSAL
+from .sucursales import bases
+from .tareas import encolar
+from .versiones import tocar_version
+
+
+LOTE = 500
+
+MODELOS = {modelo._meta.label_lower: modelo for modelo in (Cliente, Producto, Categoria)}
+
+# modelo: [(modelo dependiente, campo que apunta al modelo, acción)]
+DEPENDIENTES = {
+    Cliente: [(Venta, 'cliente', 'borrar')],
+    Producto: [
+        (Venta, 'producto', 'borrar'),
+        (SnapshotStock, 'producto', 'borrar'),
+        (StockSucursal, 'producto', 'borrar'),
+        (Reserva, 'producto', 'borrar'),
+        (Promocion, 'producto', 'borrar'),
+        (MovimientoStock, 'producto', 'desvincular'),  # La bitácora se conserva (SET_NULL)
+        (LineaOrdenCompra, 'producto', 'desvincular'),  # Las compras también
+        (LineaRecepcion, 'producto', 'desvincular'),
+    ],
+    Categoria: [
+        (Promocion, 'categoria', 'borrar'),
+        (Producto, 'categoria', 'desvincular'),
+    ],
+}
+
+# Antes de borrar un lote se desvinculan las filas que lo referencian (SET_NULL):
+# los movimientos de stock de las ventas y las ventas a las que se aplicó una promoción
+DESVINCULAR_ANTES = {
+    Venta: [(MovimientoStock, 'venta')],
+    Promocion: [(Venta, 'promocion')],
+}
+
+# Junto con un lote de ventas se borran sus filas del historial plano (mismos ids, misma base)
+BORRAR_JUNTO = {
+    Venta: [VentaHistorial],
+}
+
+
+# ============ PASO 1: EN LA PETICIÓN ============
+def eliminar(objeto, usuario=None, lote=LOTE):
+    """Borrado lógico inmediato + tarea que purga los dependientes. Devuelve la Tarea."""
+    modelo = type(objeto)
+    cambios = {'eliminado': True}
+    if modelo is Cliente:
+        # El email es único: se libera para poder volver a registrar al cliente
+        cambios['email'] = f'eliminado-{objeto.pk}@eliminado.invalid'
+
+    with transaction.atomic():
+        if modelo is Producto:
+            # La salida queda en la bitácora antes de que el producto desaparezca
+            registrar_movimiento(objeto, -objeto.stock, 'baja', usuario=usuario, referencia=objeto.nombre)
+            cambios['stock'] = 0
+            # El código de barras también es único (y el formulario no ve las filas eliminadas)
+            cambios['codigo'] = None
+        modelo._base_manager.filter(pk=objeto.pk).update(**cambios)
+        auditoria.registrar(
+            modelo, objeto.pk, 'eliminar', {campo: [getattr(objeto, campo), valor] for campo, valor in cambios.items()}, usuario=usuario,
+        )
+        tarea = encolar('eliminar_en_lotes', usuario=usuario, modelo=modelo._meta.label_lower, pk=objeto.pk, lote=lote)
+        # update() no dispara señales: invalidamos los ETag y la caché de referencia a mano
+        tocar_version(modelo)
+        if modelo is Producto:
+            referencia.olvidar_producto(objeto.pk)
+            referencia.invalidar('productos', 'codigos')
+        elif modelo is Categoria:
+            referencia.invalidar('categorias')
+    return tarea
+
+
+# ============ PASO 2: EN EL WORKER ============
+def _bases_de(modelo):
+    """Ventas y existencias pueden estar repartidas en varias bases (ver tienda/routers.py)."""
+    return bases() if modelo._meta.model_name in MODELOS_POR_SUCURSAL else ['default']
+
+
+def _ids_por_lotes(modelo, campo, pk, lote, alias):
+    """Ids de los dependientes, 'lote' a la vez. Cada lote procesado deja de coincidir con el filtro."""
+    pendientes = modelo._base_manager.using(alias).filter(**{campo: pk}).order_by('pk').values_list('pk', flat=True)
+    while True:
+        ids = list(pendientes[:lote])
+        if not ids:
+            return
+        yield ids
+
+
+def purgar(etiqueta, pk, lote=LOTE, progreso=None):
+    """
+    Borra o desvincula por lotes los dependientes de la fila 'pk' del modelo
+    'etiqueta' (ej. 'tienda.cliente') y después la borra. Devuelve un resumen
+    {descripción: cantidad}. 'progreso(hechos, total, avance)' se llama tras cada lote.
+    """
+    modelo = MODELOS[etiqueta]
+    dependientes = DEPENDIENTES[modelo]
+    totales = [
+        sum(dependiente._base_manager.using(alias).filter(**{campo: pk}).count() for alias in _bases_de(dependiente))
+        for dependiente, campo, _ in dependientes
+    ]
+    total = sum(totales)
+
+    resumen, hechos = {}, 0
+    for (dependiente, campo, accion), total_dependiente in zip(dependientes, totales):
+        descripcion = f'{dependiente._meta.verbose_name_plural} ({"borrados" if accion == "borrar" else "desvinculados"})'
+        procesados = 0
+        for alias in _bases_de(dependiente):
+            for ids in _ids_por_lotes(dependiente, campo, pk, lote, alias):
+                with transaction.atomic(), transaction.atomic(using=alias):
+                    filas = dependiente._base_manager.using(alias).filter(pk__in=ids)
+                    if accion == 'borrar':
+                        # Solo los ids de 'default' son globales: una venta de otra sucursal puede
+                        # repetir el id de una de 'default', pero no está ligada a la bitácora
+                        for hijo, campo_hijo in DESVINCULAR_ANTES.get(dependiente, ()) if alias == 'default' else ():
+                            for alias_hijo in _bases_de(hijo):
+                                hijo._base_manager.using(alias_hijo).filter(**{f'{campo_hijo}__in': ids}).update(**{campo_hijo: None})
+                            tocar_version(hijo)
+                        for copia in BORRAR_JUNTO.get(dependiente, ()):
+                            copia._base_manager.using(alias).filter(pk__in=ids)._raw_delete(alias)
+                        # DELETE directo: sin cargar las filas ni disparar una señal por fila
+                        filas._raw_delete(alias)
+                    else:
+                        filas.update(**{campo: None})
+                    tocar_version(dependiente)
+                procesados += len(ids)
+                hechos += len(ids)
+                if progreso:
+                    progreso(hechos, total, f'{descripcion}: {procesados}/{total_dependiente}')
+        resumen[descripcion] = procesados
+        if dependiente is Venta and procesados:
+            # Las ventas se borraron sin señales: el ranking se reconstruye al leerlo
+            ranking.invalidar()
+        if dependiente is Promocion and procesados:
+            # Sin señales: las tablas de promociones en memoria se recompilan
+            referencia.invalidar('promociones')
+
+    # Ya sin dependientes, el delete() normal es una sola fila
+    borradas, _ = modelo._base_manager.filter(pk=pk, eliminado=True).delete()
+    resumen[f'{modelo._meta.verbose_name} #{pk}'] = 'borrado' if borradas else 'no encontrado'
+    return resumen
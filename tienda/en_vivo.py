@@ -0,0 +1,279 @@
+# tienda/en_vivo.py
+# Actualizaciones en vivo del dashboard y del reporte del día (server-sent events).
+#
+# El navegador abre una sola conexión (EventSource) a /ventas/eventos/ y el
+# servidor le envía:
+#   event: venta    -> cada venta nueva de su sucursal
+#   event: totales  -> total del día, número de ventas, promedio y total histórico
+#
+# Bajo ASGI (uvicorn/daphne, ver sistema_tienda/asgi.py) cada conexión es solo
+# una corrutina esperando en su cola: no ocupa un hilo. Un único 'Difusor' por
+# proceso consulta la base y reparte a todas las conexiones:
+# - El sondeo solo existe mientras haya alguien conectado.
+# - Sin ventas nuevas, cada TIENDA_EN_VIVO_INTERVALO segundos hace una consulta
+#   (la versión de 'tienda.venta', ver tienda/versiones.py).
+# - Si la versión cambió, lee las ventas nuevas y recalcula los totales una sola
+#   vez para todas las conexiones (no una vez por navegador).
+# - Las ventas guardadas en este mismo proceso lo despiertan al instante (señal
+#   post_save -> on_commit); las de otros procesos llegan en el siguiente sondeo.
+# - Un navegador que no lee (cola llena) se desconecta; EventSource se reconecta solo.
+#
+# Bajo WSGI (runserver, gunicorn) no se puede mantener la conexión abierta sin
+# ocupar un hilo: se responde un solo evento 'totales' y se le pide al navegador
+# reconectarse en 30 segundos (sondeo normal).
+
+import asyncio
+import json
+import logging
+import time as reloj
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.db import close_old_connections
+from django.db.models import Count, Max, Q, Sum
+from django.template.defaultfilters import floatformat
+from django.utils import timezone
+
+from .models import VentaHistorial, VersionModelo
+from .sucursales import bases
+
+logger = logging.getLogger('tienda.en_vivo')
+
+LIMITE_VENTAS = 200        # Ventas nuevas enviadas por sondeo (las demás solo suman a los totales)
+TAMANO_COLA = 100          # Eventos pendientes por conexión antes de desconectarla
+LATIDO = 15                # Comentario ': latido' para que proxies no cierren la conexión
+DURACION_MAXIMA = 15 * 60  # Se cierra y el navegador se reconecta (vuelve a validar la sesión)
+REINTENTO_MS = 3000        # 'retry:' bajo ASGI
+REINTENTO_WSGI_MS = 30000  # 'retry:' bajo WSGI (un evento por conexión)
+
+
+def intervalo():
+    return getattr(settings, 'TIENDA_EN_VIVO_INTERVALO', 2)
+
+
+def evento(tipo, datos):
+    return f'event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+# ============ LECTURAS (SÍNCRONAS, EN UN HILO) ============
+def _rango_dia(dia):
+    # Rango de fechas (no fecha_venta__date) para usar el índice (sucursal, fecha_venta)
+    inicio = timezone.make_aware(datetime.combine(dia, time.min))
+    return inicio, inicio + timedelta(days=1)
+
+
+def totales_por_sucursal(dia):
+    """{sucursal_id: {'total_dia', 'cantidad_dia', 'historico'}}: una consulta por base."""
+    inicio, fin = _rango_dia(dia)
+    del_dia = Q(fecha_venta__gte=inicio, fecha_venta__lt=fin)
+    totales = {}
+    for alias in bases():
+        filas = (
+            VentaHistorial.objects.using(alias).order_by().values('sucursal_id')
+            .annotate(historico=Count('id'), cantidad_dia=Count('id', filter=del_dia), total_dia=Sum('total', filter=del_dia))
+        )
+        for fila in filas:
+            acumulado = totales.setdefault(fila['sucursal_id'], {'total_dia': 0, 'cantidad_dia': 0, 'historico': 0})
+            acumulado['total_dia'] += fila['total_dia'] or 0
+            acumulado['cantidad_dia'] += fila['cantidad_dia']
+            acumulado['historico'] += fila['historico']
+    return totales
+
+
+def _venta_json(venta):
+    return {
+        'id': venta.id,
+        'sucursal_id': venta.sucursal_id,
+        'hora': timezone.localtime(venta.fecha_venta).strftime('%H:%M'),
+        'producto': venta.producto_nombre,
+        'cliente': venta.cliente_nombre,
+        'cantidad': venta.cantidad,
+        'precio_unitario': intcomma(floatformat(venta.precio_unitario, 2)),
+        'total': intcomma(floatformat(venta.total, 2)),
+        'vendedor': venta.vendedor_username,
+    }
+
+
+def _ultimos_ids():
+    return {alias: VentaHistorial.objects.using(alias).aggregate(maximo=Max('pk'))['maximo'] or 0 for alias in bases()}
+
+
+def leer_cambios(estado):
+    """
+    Compara la versión de las ventas y el día con los del sondeo anterior
+    ('estado', que se actualiza aquí). Sin cambios devuelve None (una consulta);
+    con cambios, (ventas nuevas, totales por sucursal).
+    """
+    version = VersionModelo.objects.filter(modelo='tienda.venta').values_list('version', flat=True).first() or 0
+    hoy = timezone.localdate()
+    if version == estado.get('version') and hoy == estado.get('dia'):
+        return None
+    if 'ultimos' not in estado:
+        # Primer sondeo: las ventas existentes ya están en la página
+        estado['ultimos'] = _ultimos_ids()
+
+    nuevas = []
+    for alias in bases():
+        ultimo = estado['ultimos'].get(alias, 0)
+        # Historial plano (tienda/historial.py): una consulta sin JOIN por base
+        ventas = list(VentaHistorial.objects.using(alias).filter(pk__gt=ultimo).order_by('-pk')[:LIMITE_VENTAS])
+        if ventas:
+            estado['ultimos'][alias] = ventas[0].pk
+            nuevas.extend(_venta_json(venta) for venta in reversed(ventas))
+
+    estado['version'], estado['dia'] = version, hoy
+    return nuevas, totales_por_sucursal(hoy)
+
+
+# ============ MENSAJES ============
+def resumen(totales, sucursal_id):
+    """Totales de una sucursal (o de todas si es None), ya con formato para la página."""
+    if sucursal_id is None:
+        filas = list(totales.values())
+    else:
+        filas = [totales[sucursal_id]] if sucursal_id in totales else []
+    total = sum(fila['total_dia'] for fila in filas)
+    cantidad = sum(fila['cantidad_dia'] for fila in filas)
+    return {
+        'total_dia': intcomma(floatformat(total, 2)),
+        'cantidad_dia': cantidad,
+        'promedio_dia': intcomma(floatformat(total / cantidad if cantidad else 0, 2)),
+        'total_ventas': sum(fila['historico'] for fila in filas),
+    }
+
+
+def _mensaje_totales(totales, sucursal_id, detalle):
+    datos = resumen(totales, sucursal_id)
+    if not detalle:
+        # Sin permiso para el reporte solo se ve el conteo del dashboard
+        datos = {'total_ventas': datos['total_ventas']}
+    return evento('totales', datos)
+
+
+# ============ DIFUSOR (UNO POR PROCESO) ============
+class _Suscriptor:
+    def __init__(self, sucursal_id, detalle):
+        self.sucursal_id = sucursal_id
+        self.detalle = detalle
+        self.cola = asyncio.Queue(maxsize=TAMANO_COLA)
+
+    def enviar(self, mensaje):
+        """Encola sin esperar. Devuelve False si la cola estaba llena (y la cierra)."""
+        try:
+            self.cola.put_nowait(mensaje)
+            return True
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)  # None = cerrar la conexión
+            return False
+
+
+class Difusor:
+
+    def __init__(self):
+        self.suscriptores = set()
+        self.totales = None
+        self._loop = None
+        self._despertador = None
+        self._tarea = None
+
+    # ---- Conexiones (en el event loop) ----
+    def suscribir(self, sucursal_id, detalle):
+        suscriptor = _Suscriptor(sucursal_id, detalle)
+        self.suscriptores.add(suscriptor)
+        if self.totales is not None:
+            suscriptor.enviar(_mensaje_totales(self.totales, sucursal_id, detalle))
+        loop = asyncio.get_running_loop()
+        if self._tarea is None or self._tarea.done() or self._loop is not loop:
+            self._loop = loop
+            self._despertador = asyncio.Event()
+            self._tarea = loop.create_task(self._sondear())
+        return suscriptor
+
+    def desuscribir(self, suscriptor):
+        self.suscriptores.discard(suscriptor)
+        if not self.suscriptores and self._despertador is not None:
+            self._despertador.set()  # El sondeo ve que no queda nadie y termina
+
+    # ---- Desde cualquier hilo ----
+    def despertar(self):
+        """Adelanta el siguiente sondeo (ej. al guardar una venta en este proceso)."""
+        loop, despertador = self._loop, self._despertador
+        if self.suscriptores and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(despertador.set)
+
+    # ---- Sondeo ----
+    async def _sondear(self):
+        estado = {}
+        leer = sync_to_async(leer_cambios)
+        despertador = self._despertador
+        try:
+            while self.suscriptores:
+                despertador.clear()
+                try:
+                    cambios = await leer(estado)
+                except Exception:
+                    logger.exception('No se pudieron leer las ventas para las conexiones en vivo')
+                    await sync_to_async(close_old_connections)()
+                    cambios = None
+                if cambios is not None:
+                    self.repartir(*cambios)
+                try:
+                    await asyncio.wait_for(despertador.wait(), intervalo())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.totales = None
+
+    def repartir(self, nuevas, totales):
+        self.totales = totales
+        # Cada mensaje se arma una vez por sucursal, no una vez por conexión
+        mensajes = {}
+        for suscriptor in list(self.suscriptores):
+            clave = (suscriptor.sucursal_id, suscriptor.detalle)
+            if clave not in mensajes:
+                lote = []
+                if suscriptor.detalle:
+                    lote = [
+                        evento('venta', venta) for venta in nuevas
+                        if suscriptor.sucursal_id is None or venta['sucursal_id'] == suscriptor.sucursal_id
+                    ]
+                lote.append(_mensaje_totales(totales, *clave))
+                mensajes[clave] = lote
+            for mensaje in mensajes[clave]:
+                if not suscriptor.enviar(mensaje):
+                    logger.info('Conexión en vivo lenta desconectada (sucursal %s)', suscriptor.sucursal_id)
+                    self.suscriptores.discard(suscriptor)
+                    break
+
+
+difusor = Difusor()
+
+
+# ============ FLUJOS DE RESPUESTA ============
+async def flujo(sucursal_id, detalle):
+    """Generador asíncrono para StreamingHttpResponse (ASGI)."""
+    suscriptor = difusor.suscribir(sucursal_id, detalle)
+    limite = reloj.monotonic() + DURACION_MAXIMA
+    try:
+        yield f'retry: {REINTENTO_MS}\n\n'
+        while reloj.monotonic() < limite:
+            try:
+                mensaje = await asyncio.wait_for(suscriptor.cola.get(), LATIDO)
+            except asyncio.TimeoutError:
+                yield ': latido\n\n'
+                continue
+            if mensaje is None:
+                break
+            yield mensaje
+    finally:
+        difusor.desuscribir(suscriptor)
+
+
+def flujo_wsgi(sucursal_id, detalle):
+    """Bajo WSGI: un solo evento con los totales actuales y reconexión en 30 s."""
+    totales = totales_por_sucursal(timezone.localdate())
+    return f'retry: {REINTENTO_WSGI_MS}\n\n' + _mensaje_totales(totales, sucursal_id, detalle)
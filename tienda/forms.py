@@ -2,6 +2,31 @@
 from django import forms
 # Importamos TODOS los modelos necesarios
 from .models import Producto, Categoria, Proveedor, Cliente, Venta 
+from .ajustes import TIPOS_AJUSTE_PRECIO
+from . import referencia
+
+
+def _opciones_en_cache(campo, opciones):
+    """Las opciones del <select> salen de tienda/referencia.py (sin consultar la base al mostrar el form)."""
+    campo.choices = ([('', campo.empty_label)] if campo.empty_label is not None else []) + list(opciones)
+
+
+class ProductoEnCacheField(forms.ModelChoiceField):
+    """
+    Valida el producto con su foto en caché (nombre, precio, stock) en vez de
+    cargar la fila. La venta vuelve a leer la fila con bloqueo al guardarse.
+    """
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            datos = referencia.producto(int(value))
+        except (TypeError, ValueError):
+            datos = None
+        if datos is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return referencia.instancia_producto(datos)
 
 # ============ FORMULARIO PARA PRODUCTOS ============
 class ProductoForm(forms.ModelForm):
@@ -10,13 +35,17 @@ class ProductoForm(forms.ModelForm):
     class Meta:
         model = Producto
         # CORREGIDO: 'precio_venta' coincide con el modelo
-        fields = ['nombre', 'descripcion', 'precio_venta', 'stock', 'categoria', 'proveedor', 'activo']
+        fields = ['nombre', 'codigo', 'descripcion', 'precio_venta', 'stock', 'categoria', 'proveedor', 'activo']
         
         widgets = {
             'nombre': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Ingrese el nombre del producto'
             }),
+            'codigo': forms.TextInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'Escanee o escriba el código de barras / SKU'
+            }),
             'descripcion': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -46,6 +75,7 @@ class ProductoForm(forms.ModelForm):
         
         labels = {
             'nombre': 'Nombre del Producto',
+            'codigo': 'Código de Barras / SKU',
             'descripcion': 'Descripción',
             'precio_venta': 'Precio ($)',
             'stock': 'Cantidad en Stock',
@@ -54,6 +84,15 @@ class ProductoForm(forms.ModelForm):
             'activo': '¿Producto Activo?',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _opciones_en_cache(self.fields['categoria'], referencia.categorias())
+        _opciones_en_cache(self.fields['proveedor'], referencia.proveedores())
+
+    def clean_codigo(self):
+        # Sin código se guarda NULL: varios productos pueden no tener código
+        return (self.cleaned_data.get('codigo') or '').strip() or None
+
 
 # ============ FORMULARIO PARA CATEGORÍAS ============
 class CategoriaForm(forms.ModelForm):
@@ -176,6 +215,7 @@ class VentaForm(forms.ModelForm):
     class Meta:
         model = Venta
         fields = ['cliente', 'producto', 'cantidad']
+        field_classes = {'producto': ProductoEnCacheField}
         
         widgets = {
             'cliente': forms.Select(attrs={
@@ -198,6 +238,10 @@ class VentaForm(forms.ModelForm):
             'cantidad': 'Cantidad',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _opciones_en_cache(self.fields['producto'], referencia.productos())
+
     # Esta es la parte que ya tenías (la validación de stock)
     def clean(self):
         cleaned_data = super().clean()
@@ -214,4 +258,184 @@ class VentaForm(forms.ModelForm):
                     f"No hay suficiente stock. Solo quedan {producto.stock} unidades de {producto.nombre}."
                 )
         
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+# ============ FORMULARIO PARA AJUSTE MASIVO DE PRODUCTOS ============
+class AjusteMasivoForm(forms.Form):
+    """Formulario para ajustar precio y stock de muchos productos a la vez"""
+
+    ACTIVO_CHOICES = (
+        ('', 'Todos'),
+        ('1', 'Solo activos'),
+        ('0', 'Solo inactivos'),
+    )
+
+    # --- Filtros ---
+    categoria = forms.ModelChoiceField(
+        queryset=Categoria.objects.all(), required=False, empty_label='Todas',
+        label='Categoría', widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    proveedor = forms.ModelChoiceField(
+        queryset=Proveedor.objects.all(), required=False, empty_label='Todos',
+        label='Proveedor', widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    activo = forms.ChoiceField(
+        choices=ACTIVO_CHOICES, required=False, label='Estado',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    # --- Ajustes ---
+    tipo_precio = forms.ChoiceField(
+        choices=TIPOS_AJUSTE_PRECIO, initial='ninguno', label='Ajuste de Precio',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    valor_precio = forms.DecimalField(
+        max_digits=10, decimal_places=2, required=False, initial=0, label='Valor',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': '0.00'})
+    )
+    ajuste_stock = forms.IntegerField(
+        required=False, initial=0, label='Ajuste de Stock (+/- unidades)',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '0'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _opciones_en_cache(self.fields['categoria'], referencia.categorias())
+        _opciones_en_cache(self.fields['proveedor'], referencia.proveedores())
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        tipo_precio = cleaned_data.get('tipo_precio')
+        valor_precio = cleaned_data.get('valor_precio') or 0
+        ajuste_stock = cleaned_data.get('ajuste_stock') or 0
+
+        if tipo_precio == 'porcentaje' and valor_precio <= -100:
+            raise forms.ValidationError("Un descuento de 100% o más dejaría los precios en cero.")
+
+        if (tipo_precio == 'ninguno' or not valor_precio) and not ajuste_stock:
+            raise forms.ValidationError("Indica al menos un ajuste de precio o de stock.")
+
+        cleaned_data['valor_precio'] = valor_precio
+        cleaned_data['ajuste_stock'] = ajuste_stock
+        return cleaned_data
+
+    def filtros(self):
+        """Devuelve los filtros listos para 'ajustes.filtrar_productos'"""
+        activo = self.cleaned_data.get('activo')
+        return {
+            'categoria': self.cleaned_data.get('categoria'),
+            'proveedor': self.cleaned_data.get('proveedor'),
+            'activo': None if activo in (None, '') else activo == '1',
+        }
+
+
+# ============ FORMULARIO DE RANGO DE FECHAS (REPORTES EN SEGUNDO PLANO) ============
+class RangoFechasForm(forms.Form):
+    """Rango de fechas para el reporte de ventas que se genera en segundo plano"""
+
+    desde = forms.DateField(
+        label='Desde', widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    hasta = forms.DateField(
+        label='Hasta', widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError("La fecha 'Desde' no puede ser posterior a 'Hasta'.")
+        return cleaned_data
+
+
+# ============ FORMULARIOS DEL CARRITO (RESERVAS) ============
+class ReservaForm(forms.Form):
+    """Producto y cantidad a apartar en el carrito (ver tienda/reservas.py)"""
+
+    producto = ProductoEnCacheField(
+        queryset=Producto.objects.none(), label='Producto',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    cantidad = forms.IntegerField(
+        min_value=1, initial=1, label='Cantidad',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': '1'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _opciones_en_cache(self.fields['producto'], referencia.productos())
+
+
+class CobroForm(forms.Form):
+    """Cliente al que se le cobra el carrito"""
+
+    cliente = forms.ModelChoiceField(
+        queryset=Cliente.objects.all(), label='Cliente',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+
+# ============ FORMULARIOS DE COMPRAS (ÓRDENES Y RECEPCIÓN) ============
+class OrdenCompraForm(forms.Form):
+    """Proveedor y notas de una orden de compra"""
+
+    proveedor = forms.ModelChoiceField(
+        queryset=Proveedor.objects.all(), label='Proveedor',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    notas = forms.CharField(
+        required=False, label='Notas',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _opciones_en_cache(self.fields['proveedor'], referencia.proveedores())
+
+
+class LineasCompraForm(forms.Form):
+    """
+    Una cantidad por producto (y un costo, al pedir). Los campos se arman con la
+    lista de productos: [(pk, nombre)]. Las cantidades en 0 o vacías se ignoran.
+    """
+
+    def __init__(self, productos, *args, con_costo=True, maximos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.productos = productos
+        self.con_costo = con_costo
+        self.maximos = maximos or {}
+        for pk, nombre in productos:
+            self.fields[f'cantidad_{pk}'] = forms.IntegerField(
+                min_value=0, max_value=self.maximos.get(pk), required=False, label=nombre,
+                widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'min': '0'})
+            )
+            if con_costo:
+                self.fields[f'costo_{pk}'] = forms.DecimalField(
+                    max_digits=10, decimal_places=2, min_value=0, required=False, label=f'Costo de {nombre}',
+                    widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': '0.01', 'placeholder': '0.00'})
+                )
+
+    def filas(self):
+        """[(nombre, campo cantidad, campo costo o None, máximo o None)] para la tabla de la plantilla."""
+        return [
+            (nombre, self[f'cantidad_{pk}'], self[f'costo_{pk}'] if self.con_costo else None, self.maximos.get(pk))
+            for pk, nombre in self.productos
+        ]
+
+    def cantidades(self):
+        """{producto_id: cantidad} de las líneas con cantidad mayor a 0."""
+        return {
+            pk: self.cleaned_data[f'cantidad_{pk}']
+            for pk, _ in self.productos if self.cleaned_data.get(f'cantidad_{pk}')
+        }
+
+    def costos(self):
+        return {pk: self.cleaned_data.get(f'costo_{pk}') or 0 for pk, _ in self.productos}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors and not self.cantidades():
+            raise forms.ValidationError("Indica al menos una cantidad mayor a 0.")
+        return cleaned_data
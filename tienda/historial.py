@@ -0,0 +1,119 @@
+# tienda/historial.py
+# Modelo de lectura del historial de ventas (VentaHistorial).
+#
+# - Cada venta nueva agrega su fila plana en la misma transacción y en la misma
+#   base (señal post_save en tienda/signals.py). Los nombres se toman de los
+#   objetos que la venta ya tiene cargados: no hay consultas extra.
+# - Los nombres no se actualizan después: el historial muestra el producto, el
+#   cliente y el vendedor como eran al momento de la venta.
+# - Al borrar una venta se borra su fila (también en los borrados por lotes de
+#   tienda/eliminacion.py y en views.venta_eliminar).
+# - 'reconstruir()' (comando 'python manage.py reconstruir_historial') vuelve a
+#   generar la tabla desde Venta, Producto, Cliente y User; se usa al instalar
+#   esta tabla por primera vez o si se cargaron ventas con bulk_create.
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Cliente, Producto, Venta, VentaHistorial
+from .sucursales import alias_de, bases
+from .versiones import tocar_version
+
+CAMPOS_NUMERICOS = ('sucursal_id', 'fecha_venta', 'cantidad', 'precio_unitario', 'total')
+
+
+# ============ LECTURA ============
+def historial_de(sucursal_id):
+    """Como ventas_de(), pero sobre la tabla plana."""
+    if sucursal_id is None:
+        return VentaHistorial.objects.all()
+    return VentaHistorial.objects.using(alias_de(sucursal_id)).filter(sucursal_id=sucursal_id)
+
+
+# ============ ESCRITURA (DESDE LAS SEÑALES DE VENTA) ============
+def fila_de(venta):
+    return VentaHistorial(
+        id=venta.pk,
+        sucursal_id=venta.sucursal_id,
+        fecha_venta=venta.fecha_venta,
+        producto_id=venta.producto_id,
+        producto_nombre=venta.producto.nombre,
+        cliente_id=venta.cliente_id,
+        cliente_nombre=venta.cliente.nombre_completo,
+        vendedor_id=venta.vendedor_id,
+        vendedor_username=venta.vendedor.username if venta.vendedor_id else '',
+        cantidad=venta.cantidad,
+        precio_unitario=venta.precio_unitario,
+        total=venta.total,
+    )
+
+
+def registrar(venta, creada):
+    """Agrega la fila de una venta nueva; en una venta editada solo actualiza los montos."""
+    alias = venta._state.db
+    if creada:
+        fila_de(venta).save(using=alias, force_insert=True)
+    elif not VentaHistorial.objects.using(alias).filter(pk=venta.pk).update(
+        **{campo: getattr(venta, campo) for campo in CAMPOS_NUMERICOS}
+    ):
+        fila_de(venta).save(using=alias, force_insert=True)
+
+
+def quitar(ids, alias):
+    """Borra las filas de las ventas 'ids' de la base 'alias'."""
+    VentaHistorial.objects.using(alias).filter(pk__in=ids)._raw_delete(alias)
+
+
+# ============ RECONSTRUCCIÓN ============
+def _filas_con_nombres(bloque):
+    """
+    Filas planas para un bloque de ventas (tuplas de values_list) con tres consultas
+    de nombres: las ventas pueden estar en otra base que el catálogo (sin JOIN).
+    """
+    productos = dict(Producto._base_manager.filter(pk__in={v[3] for v in bloque}).values_list('pk', 'nombre'))
+    clientes = {
+        pk: f"{nombre} {apellido}"
+        for pk, nombre, apellido in Cliente._base_manager.filter(pk__in={v[4] for v in bloque}).values_list('pk', 'nombre', 'apellido')
+    }
+    vendedores = dict(User.objects.filter(pk__in={v[5] for v in bloque if v[5]}).values_list('pk', 'username'))
+    return [
+        VentaHistorial(
+            id=pk, sucursal_id=sucursal_id, fecha_venta=fecha,
+            producto_id=producto_id, producto_nombre=productos.get(producto_id, ''),
+            cliente_id=cliente_id, cliente_nombre=clientes.get(cliente_id, ''),
+            vendedor_id=vendedor_id, vendedor_username=vendedores.get(vendedor_id, ''),
+            cantidad=cantidad, precio_unitario=precio, total=total,
+        )
+        for pk, sucursal_id, fecha, producto_id, cliente_id, vendedor_id, cantidad, precio, total in bloque
+    ]
+
+
+def reconstruir(alias=None, lote=2000):
+    """
+    Vuelve a generar el historial de la base 'alias' (o de todas) desde las ventas.
+    Cada base se reconstruye en una transacción: mientras tanto se sigue leyendo
+    el historial anterior. Devuelve {alias: filas}.
+    """
+    resultado = {}
+    for base in [alias] if alias else bases():
+        ventas = (
+            Venta.objects.using(base).order_by('pk')
+            .values_list('pk', 'sucursal_id', 'fecha_venta', 'producto_id', 'cliente_id', 'vendedor_id',
+                         'cantidad', 'precio_unitario', 'total')
+        )
+        total = 0
+        with transaction.atomic(using=base):
+            VentaHistorial.objects.using(base).all()._raw_delete(base)
+            bloque = []
+            for venta in ventas.iterator(chunk_size=lote):
+                bloque.append(venta)
+                if len(bloque) == lote:
+                    VentaHistorial.objects.using(base).bulk_create(_filas_con_nombres(bloque))
+                    total += len(bloque)
+                    bloque = []
+            if bloque:
+                VentaHistorial.objects.using(base).bulk_create(_filas_con_nombres(bloque))
+                total += len(bloque)
+        resultado[base] = total
+    tocar_version(Venta)  # Las páginas del historial cambian (ETag)
+    return resultado
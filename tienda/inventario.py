@@ -0,0 +1,128 @@
+# tienda/inventario.py
+# Bitácora de movimientos de stock y consultas de "stock a una fecha".
+
+from django.db import connections, router
+from django.db.models import F, Max, Min, OuterRef, Subquery, Value, CharField, DateTimeField, IntegerField, BigIntegerField
+from django.utils import timezone
+
+from .models import Producto, MovimientoStock, SnapshotStock
+
+
+# ============ REGISTRO DE MOVIMIENTOS ============
+def registrar_movimiento(producto, cantidad, motivo, usuario=None, venta=None, referencia=''):
+    """Agrega una fila a la bitácora. No hace nada si la cantidad es 0."""
+    if not cantidad:
+        return None
+    if venta is not None and venta._state.db != MovimientoStock.objects.db:
+        # Venta guardada en la base de su sucursal: su id no es único fuera de ella,
+        # así que se anota en la referencia en vez de la llave foránea
+        referencia = referencia or f'Venta #{venta.pk} ({venta._state.db})'
+        venta = None
+    return MovimientoStock.objects.create(
+        producto=producto,
+        cantidad=cantidad,
+        motivo=motivo,
+        usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+        venta=venta,
+        referencia=referencia[:100],
+    )
+
+
+def registrar_movimientos_masivos(productos, expresion_stock, motivo, usuario=None, referencia=''):
+    """
+    Registra en la bitácora, con un solo INSERT ... SELECT, la diferencia entre
+    'expresion_stock' y el stock actual de cada producto del queryset.
+    Debe llamarse ANTES del UPDATE, dentro de la misma transacción y con las filas
+    ya bloqueadas (ver ajustes.ajustar_productos): si no, una venta que se confirma
+    entre este INSERT y el UPDATE haría que la bitácora no cuadre con el stock.
+    """
+    ahora = timezone.now()
+    usuario_id = usuario.pk if usuario is not None and usuario.is_authenticated else None
+
+    filas = (
+        productos.order_by()
+        .alias(_delta=expresion_stock - F('stock'))
+        .exclude(_delta=0)
+        .annotate(
+            _cantidad=expresion_stock - F('stock'),
+            _motivo=Value(motivo, output_field=CharField()),
+            _referencia=Value(referencia[:100], output_field=CharField()),
+            _usuario=Value(usuario_id, output_field=BigIntegerField()),
+            _fecha=Value(ahora, output_field=DateTimeField()),
+        )
+        .values_list('pk', '_cantidad', '_motivo', '_referencia', '_usuario', '_fecha')
+    )
+    sql, params = filas.query.sql_with_params()
+
+    # La conexión de la bitácora según el router (el SELECT de productos va en la misma base)
+    conexion = connections[router.db_for_write(MovimientoStock)]
+    tabla = conexion.ops.quote_name(MovimientoStock._meta.db_table)
+    columnas = ', '.join(
+        conexion.ops.quote_name(MovimientoStock._meta.get_field(nombre).column)
+        for nombre in ('producto', 'cantidad', 'motivo', 'referencia', 'usuario', 'fecha')
+    )
+    with conexion.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {tabla} ({columnas}) {sql}", params)
+        return cursor.rowcount
+
+
+# ============ STOCK A UNA FECHA ============
+def saldos_en_fecha(producto_ids, fecha=None):
+    """
+    Devuelve {producto_id: stock} a la fecha indicada (ahora por defecto) usando
+    el snapshot más cercano anterior a 'fecha' y solo los movimientos posteriores
+    a ese snapshot. Son dos consultas sin importar cuántos productos se pidan.
+    """
+    fecha = fecha or timezone.now()
+    producto_ids = list(producto_ids)
+    if not producto_ids:
+        return {}
+
+    ultimo = SnapshotStock.objects.filter(producto=OuterRef('pk'), fecha__lte=fecha).order_by('-fecha')
+    # _base_manager: un producto eliminado (pendiente de purgar) también tiene saldo
+    bases = (
+        Producto._base_manager.filter(pk__in=producto_ids)
+        .annotate(
+            snap_fecha=Subquery(ultimo.values('fecha')[:1], output_field=DateTimeField()),
+            snap_stock=Subquery(ultimo.values('stock')[:1], output_field=IntegerField()),
+        )
+        .values_list('pk', 'snap_fecha', 'snap_stock')
+    )
+
+    saldos, desde = {}, {}
+    for pk, snap_fecha, snap_stock in bases:
+        saldos[pk] = snap_stock or 0
+        desde[pk] = snap_fecha
+    if not desde:
+        return {}  # Ninguno de los ids existe (ya purgados)
+
+    # Delta corto: solo movimientos posteriores al snapshot más antiguo del lote
+    movimientos = MovimientoStock.objects.filter(producto_id__in=list(desde), fecha__lte=fecha)
+    fechas_base = [f for f in desde.values() if f is not None]
+    if len(fechas_base) == len(desde):
+        movimientos = movimientos.filter(fecha__gt=min(fechas_base))
+
+    for pk, fecha_mov, cantidad in movimientos.values_list('producto_id', 'fecha', 'cantidad').iterator():
+        if desde.get(pk) is None or fecha_mov > desde[pk]:
+            saldos[pk] += cantidad
+
+    return saldos
+
+
+def stock_en_fecha(producto, fecha=None):
+    """Stock de un solo producto a la fecha indicada."""
+    pk = getattr(producto, 'pk', producto)
+    return saldos_en_fecha([pk], fecha).get(pk, 0)
+
+
+# ============ UTILIDADES PARA PROCESOS POR LOTES ============
+def rangos_de_ids(tamano, queryset=None):
+    """Divide los ids de producto en rangos [inicio, fin] de 'tamano' ids."""
+    queryset = queryset if queryset is not None else Producto.objects.all()
+    limites = queryset.aggregate(minimo=Min('pk'), maximo=Max('pk'))
+    if limites['minimo'] is None:
+        return []
+    return [
+        (inicio, min(inicio + tamano - 1, limites['maximo']))
+        for inicio in range(limites['minimo'], limites['maximo'] + 1, tamano)
+    ]
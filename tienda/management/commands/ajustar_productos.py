@@ -0,0 +1,79 @@
+# tienda/management/commands/ajustar_productos.py
+# Uso:
+#   python manage.py ajustar_productos --categoria 3 --porcentaje 10 --dry-run
+#   python manage.py ajustar_productos --proveedor 2 --absoluto -1.50 --stock 20
+
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.ajustes import filtrar_productos, ajustar_productos
+from tienda.models import Categoria, Proveedor
+
+
+class Command(BaseCommand):
+    help = 'Ajusta precio y/o stock de todos los productos que coinciden con un filtro (un solo UPDATE).'
+
+    def add_arguments(self, parser):
+        # --- Filtros ---
+        parser.add_argument('--categoria', type=int, help='ID de la categoría')
+        parser.add_argument('--proveedor', type=int, help='ID del proveedor')
+        estado = parser.add_mutually_exclusive_group()
+        estado.add_argument('--activos', action='store_true', help='Solo productos activos')
+        estado.add_argument('--inactivos', action='store_true', help='Solo productos inactivos')
+
+        # --- Ajustes ---
+        precio = parser.add_mutually_exclusive_group()
+        precio.add_argument('--porcentaje', type=str, help='Cambio porcentual del precio (ej. 10 o -5)')
+        precio.add_argument('--absoluto', type=str, help='Cambio fijo del precio (ej. 2.50 o -1)')
+        parser.add_argument('--stock', type=int, default=0, help='Unidades a sumar (o restar) al stock')
+
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta los productos afectados')
+
+    def handle(self, *args, **options):
+        categoria = self._obtener(Categoria, options['categoria'])
+        proveedor = self._obtener(Proveedor, options['proveedor'])
+        activo = None
+        if options['activos']:
+            activo = True
+        elif options['inactivos']:
+            activo = False
+
+        tipo_precio, valor_precio = 'ninguno', Decimal('0')
+        if options['porcentaje'] is not None:
+            tipo_precio, valor_precio = 'porcentaje', self._decimal(options['porcentaje'])
+            if valor_precio <= -100:
+                raise CommandError('Un descuento de 100% o más dejaría los precios en cero.')
+        elif options['absoluto'] is not None:
+            tipo_precio, valor_precio = 'absoluto', self._decimal(options['absoluto'])
+
+        if not valor_precio and not options['stock']:
+            raise CommandError('Indica al menos --porcentaje, --absoluto o --stock.')
+
+        productos = filtrar_productos(categoria=categoria, proveedor=proveedor, activo=activo)
+        afectados = ajustar_productos(
+            productos,
+            tipo_precio=tipo_precio,
+            valor_precio=valor_precio,
+            ajuste_stock=options['stock'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'[Vista previa] {afectados} producto(s) serían ajustados.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Ajuste aplicado a {afectados} producto(s).'))
+
+    def _obtener(self, modelo, pk):
+        if pk is None:
+            return None
+        try:
+            return modelo.objects.get(pk=pk)
+        except modelo.DoesNotExist:
+            raise CommandError(f'{modelo._meta.verbose_name} con ID {pk} no existe.')
+
+    def _decimal(self, valor):
+        try:
+            return Decimal(valor)
+        except InvalidOperation:
+            raise CommandError(f'Valor numérico inválido: {valor}')
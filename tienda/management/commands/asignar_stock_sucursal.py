@@ -0,0 +1,53 @@
+# tienda/management/commands/asignar_stock_sucursal.py
+# Paso inicial al empezar a usar sucursales: el stock actual de cada producto
+# (que hasta ahora era de una sola tienda) queda como existencia de una sucursal.
+#
+# Uso:
+#   python manage.py asignar_stock_sucursal centro
+#   python manage.py asignar_stock_sucursal centro --lote 5000
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tienda.inventario import rangos_de_ids
+from tienda.models import Sucursal, Producto, StockSucursal
+from tienda.sucursales import alias_de, bases
+from tienda.versiones import tocar_version
+
+
+class Command(BaseCommand):
+    help = 'Copia el stock total de cada producto como existencia de la sucursal indicada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sucursal', help='Código de la sucursal')
+        parser.add_argument('--lote', type=int, default=1000, help='Productos por lote (default: 1000)')
+
+    def handle(self, *args, **options):
+        try:
+            sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+        except Sucursal.DoesNotExist:
+            raise CommandError(f"No existe la sucursal '{options['sucursal']}'.")
+
+        # Cada sucursal puede tener su propia base: se revisan todas, no solo la de esta
+        if any(
+            StockSucursal.objects.using(base).exclude(sucursal=sucursal).exclude(stock=0).exists()
+            for base in bases()
+        ):
+            raise CommandError('Otras sucursales ya tienen existencias; el total ya no es de una sola sucursal.')
+
+        alias = alias_de(sucursal.pk)
+        # MySQL no acepta columnas de conflicto (ON DUPLICATE KEY UPDATE usa cualquier llave única)
+        conflicto = {'unique_fields': ['sucursal', 'producto']} if connections[alias].features.supports_update_conflicts_with_target else {}
+        total = 0
+        for inicio, fin in rangos_de_ids(options['lote']):
+            productos = list(Producto.objects.filter(pk__range=(inicio, fin)).values_list('pk', 'stock'))
+            # Inserta o reemplaza la existencia (un INSERT ... ON CONFLICT / ON DUPLICATE KEY por lote)
+            StockSucursal.objects.using(alias).bulk_create(
+                [StockSucursal(sucursal=sucursal, producto_id=pk, stock=stock) for pk, stock in productos],
+                update_conflicts=True, update_fields=['stock'], **conflicto,
+            )
+            total += len(productos)
+
+        # bulk_create no dispara señales: la lista de productos muestra las existencias (ETag)
+        tocar_version(Producto)
+        self.stdout.write(self.style.SUCCESS(f'{total} producto(s) asignados a la sucursal {sucursal.nombre} (base "{alias}").'))
@@ -0,0 +1,20 @@
+# tienda/management/commands/barrer_reservas.py
+# Borra las reservas de carrito vencidas (el worker ya lo hace cada minuto).
+# Uso (ej. desde cron si no corre el worker):
+#   python manage.py barrer_reservas
+#   python manage.py barrer_reservas --lote 5000
+
+from django.core.management.base import BaseCommand
+
+from tienda.reservas import LOTE_BARRIDO, barrer
+
+
+class Command(BaseCommand):
+    help = 'Borra las reservas de stock vencidas, por lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_BARRIDO, help=f'Reservas por lote (default: {LOTE_BARRIDO})')
+
+    def handle(self, *args, **options):
+        borradas = barrer(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{borradas} reserva(s) vencida(s) borrada(s).'))
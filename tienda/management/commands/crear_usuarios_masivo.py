@@ -0,0 +1,147 @@
+# tienda/management/commands/crear_usuarios_masivo.py
+# Alta masiva de usuarios con rol (ej. cajeros de temporada).
+#
+# El archivo CSV debe tener encabezados; 'username', 'password' y 'rol' son obligatorios:
+#   username,password,rol,email,first_name,last_name,departamento,telefono
+#   cajero001,Temporada2026!,vendedor,,Ana,López,Cajas,
+#
+# Uso:
+#   python manage.py crear_usuarios_masivo usuarios.csv
+#   python manage.py crear_usuarios_masivo usuarios.csv --procesos 8 --lote 1000
+#
+# Se puede volver a ejecutar con el mismo archivo: los usuarios que ya existen se
+# omiten (sin calcular su hash) y solo se les crea el perfil si les falta.
+
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from sistema_tienda.procesos import iniciar_proceso
+from tienda.models import PerfilUsuario
+from tienda.versiones import tocar_version
+
+
+ROLES_VALIDOS = {rol for rol, _ in PerfilUsuario.ROLES}
+CAMPOS_USUARIO = ('email', 'first_name', 'last_name')
+CAMPOS_PERFIL = ('departamento', 'telefono')
+
+
+def _hashear(passwords):
+    """Se ejecuta en un proceso del pool: PBKDF2 usa CPU, no comparte el GIL."""
+    return [make_password(password) for password in passwords]
+
+
+class Command(BaseCommand):
+    help = 'Crea usuarios y sus perfiles desde un CSV, con hash de contraseñas en paralelo y bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV con los usuarios')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help='Procesos para calcular los hashes (default: todos los núcleos)')
+        parser.add_argument('--lote', type=int, default=500, help='Usuarios por lote de inserción (default: 500)')
+
+    def handle(self, *args, **options):
+        filas = self._leer(options['archivo'])
+        inicio = time.perf_counter()
+
+        # --- 1. Separar nuevos de existentes (idempotencia) ---
+        usernames = [fila['username'] for fila in filas]
+        existentes = set()
+        for i in range(0, len(usernames), options['lote']):
+            existentes.update(
+                User.objects.filter(username__in=usernames[i:i + options['lote']]).values_list('username', flat=True)
+            )
+        nuevas = [fila for fila in filas if fila['username'] not in existentes]
+
+        # --- 2. Hash de contraseñas en paralelo ---
+        t_hash = time.perf_counter()
+        hashes = []
+        if nuevas:
+            # Los procesos hijos no deben heredar conexiones abiertas
+            connections.close_all()
+            tamano_tarea = max(1, len(nuevas) // (options['procesos'] * 4))
+            bloques = [
+                [fila['password'] for fila in nuevas[i:i + tamano_tarea]]
+                for i in range(0, len(nuevas), tamano_tarea)
+            ]
+            with ProcessPoolExecutor(max_workers=options['procesos'], initializer=iniciar_proceso) as pool:
+                for resultado in pool.map(_hashear, bloques):
+                    hashes.extend(resultado)
+        t_hash = time.perf_counter() - t_hash
+
+        # --- 3. Inserción por lotes ---
+        t_insert = time.perf_counter()
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [
+                    User(username=fila['username'], password=hash_,
+                         **{campo: fila.get(campo) or '' for campo in CAMPOS_USUARIO})
+                    for fila, hash_ in zip(nuevas, hashes)
+                ],
+                batch_size=options['lote'],
+            )
+            perfiles_creados = self._crear_perfiles(filas, options['lote'])
+        t_insert = time.perf_counter() - t_insert
+
+        # bulk_create no dispara señales: invalidamos los ETag a mano
+        tocar_version(User, PerfilUsuario)
+
+        total = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS('--- Alta masiva finalizada ---'))
+        reporte = [
+            ('Filas leídas', len(filas)),
+            ('Usuarios creados', len(nuevas)),
+            ('Ya existían (omitidos)', len(existentes)),
+            ('Perfiles creados', perfiles_creados),
+            (f'Hash ({options["procesos"]} procesos)', f'{t_hash:.2f} s'),
+            ('Inserción', f'{t_insert:.2f} s'),
+            ('Total', f'{total:.2f} s'),
+        ]
+        if nuevas and total > 0:
+            reporte.append(('Rendimiento', f'{len(nuevas) / total:.1f} usuarios/s'))
+        for etiqueta, valor in reporte:
+            self.stdout.write(f'  {etiqueta + ":":<26}{valor}')
+
+    def _leer(self, ruta):
+        try:
+            with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+                filas = [
+                    {clave.strip(): (valor or '').strip() for clave, valor in fila.items() if clave}
+                    for fila in csv.DictReader(archivo)
+                ]
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+
+        vistos = set()
+        for numero, fila in enumerate(filas, start=2):
+            if not fila.get('username') or not fila.get('password'):
+                raise CommandError(f'Línea {numero}: faltan username o password.')
+            if fila.get('rol') not in ROLES_VALIDOS:
+                raise CommandError(f"Línea {numero}: rol inválido '{fila.get('rol')}'. Opciones: {', '.join(sorted(ROLES_VALIDOS))}")
+            if fila['username'] in vistos:
+                raise CommandError(f"Línea {numero}: el usuario '{fila['username']}' está repetido en el archivo.")
+            vistos.add(fila['username'])
+        return filas
+
+    def _crear_perfiles(self, filas, lote):
+        """Crea el PerfilUsuario de cada usuario del archivo que todavía no lo tenga."""
+        creados = 0
+        for i in range(0, len(filas), lote):
+            bloque = {fila['username']: fila for fila in filas[i:i + lote]}
+            sin_perfil = User.objects.filter(username__in=bloque, perfil__isnull=True).values_list('pk', 'username')
+            perfiles = [
+                PerfilUsuario(
+                    user_id=pk, rol=bloque[username]['rol'],
+                    **{campo: bloque[username].get(campo) or None for campo in CAMPOS_PERFIL}
+                )
+                for pk, username in sin_perfil
+            ]
+            PerfilUsuario.objects.bulk_create(perfiles, batch_size=lote)
+            creados += len(perfiles)
+        return creados
@@ -0,0 +1,34 @@
+# tienda/management/commands/exportar_columnar.py
+# Exporta ventas, productos y clientes a archivos .npy por columna (ver tienda/columnar.py).
+# Uso (requiere: pip install numpy):
+#   python manage.py exportar_columnar                      (completa, reemplaza la anterior)
+#   python manage.py exportar_columnar --incremental        (solo las filas nuevas, ej. en un cron)
+#   python manage.py exportar_columnar --tabla ventas --destino /datos/tienda --lote 100000
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda import columnar
+
+
+class Command(BaseCommand):
+    help = 'Exporta ventas, productos y clientes a archivos NumPy por columna para análisis fuera de línea.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', help='Directorio de salida (default: TIENDA_COLUMNAR_DIR)')
+        parser.add_argument('--incremental', action='store_true', help='Agrega solo las filas con id mayor al último exportado')
+        parser.add_argument('--tabla', action='append', choices=list(columnar.TABLAS), help='Solo esta tabla (se puede repetir)')
+        parser.add_argument('--lote', type=int, default=columnar.LOTE, help=f'Filas por lote (default: {columnar.LOTE})')
+
+    def handle(self, *args, **options):
+        if columnar.np is None:
+            raise CommandError('Esta exportación necesita NumPy: pip install numpy')
+        if options['tabla'] and not options['incremental']:
+            # La completa reemplaza el directorio entero: las otras tablas se perderían
+            raise CommandError('--tabla solo se puede usar con --incremental.')
+
+        resultado = columnar.exportar(
+            destino=options['destino'], incremental=options['incremental'],
+            tablas=options['tabla'], lote=options['lote'],
+        )
+        for tabla, filas in resultado.items():
+            self.stdout.write(self.style.SUCCESS(f'{tabla}: {filas} fila(s) exportada(s).'))
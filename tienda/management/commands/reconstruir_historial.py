@@ -0,0 +1,22 @@
+# tienda/management/commands/reconstruir_historial.py
+# Uso (al instalar la tabla VentaHistorial, o tras cargar ventas con bulk_create):
+#   python manage.py reconstruir_historial
+#   python manage.py reconstruir_historial --base grupo_a --lote 5000
+
+from django.core.management.base import BaseCommand
+
+from tienda.historial import reconstruir
+from tienda.sucursales import bases
+
+
+class Command(BaseCommand):
+    help = 'Vuelve a generar el historial plano de ventas (VentaHistorial) desde Venta, Producto, Cliente y User.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base', choices=bases(), help='Solo esta base de datos (default: todas)')
+        parser.add_argument('--lote', type=int, default=2000, help='Ventas por lote (default: 2000)')
+
+    def handle(self, *args, **options):
+        resultado = reconstruir(alias=options['base'], lote=options['lote'])
+        for alias, filas in resultado.items():
+            self.stdout.write(self.style.SUCCESS(f'{alias}: {filas} venta(s) en el historial.'))
@@ -0,0 +1,100 @@
+# tienda/management/commands/worker.py
+# Ejecuta las tareas en segundo plano encoladas por las vistas.
+# Uso:
+#   python manage.py worker                 (4 hilos, corre hasta Ctrl+C)
+#   python manage.py worker --procesos 2    (pool de procesos, para tareas pesadas de CPU)
+#   python manage.py worker --una-vez       (procesa lo pendiente y termina)
+# Además, cada minuto borra las reservas de carrito vencidas (tienda/reservas.py).
+
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sistema_tienda.procesos import iniciar_proceso
+from tienda.models import Tarea
+from tienda.reservas import barrer
+from tienda.tareas import reclamar_pendientes, recuperar_abandonadas, ejecutar_tarea
+
+BARRIDO_RESERVAS = 60  # Segundos entre barridos de reservas vencidas
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano guardadas en la base de datos (sin broker externo).'
+
+    def add_arguments(self, parser):
+        pool = parser.add_mutually_exclusive_group()
+        pool.add_argument('--hilos', type=int, default=4, help='Tamaño del pool de hilos (default: 4)')
+        pool.add_argument('--procesos', type=int, help='Usar un pool de procesos de este tamaño')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre revisiones de la cola')
+        parser.add_argument(
+            '--timeout', type=int, default=3600,
+            help="Tareas 'en_proceso' por más de estos segundos se vuelven a encolar al iniciar"
+        )
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        recuperadas = recuperar_abandonadas(options['timeout'])
+        if recuperadas:
+            self.stdout.write(self.style.WARNING(f'{recuperadas} tarea(s) abandonada(s) regresaron a la cola.'))
+
+        tamano = options['procesos'] or options['hilos']
+        pool = self.crear_pool(options)
+
+        self.stdout.write(f'Worker iniciado con {tamano} {"proceso(s)" if options["procesos"] else "hilo(s)"}.')
+        en_curso = {}  # futuro -> pk de la tarea
+        proximo_barrido = 0
+        try:
+            while True:
+                if time.monotonic() >= proximo_barrido:
+                    proximo_barrido = time.monotonic() + BARRIDO_RESERVAS
+                    borradas = barrer()
+                    if borradas:
+                        self.stdout.write(f'  Reservas vencidas borradas: {borradas}')
+
+                libres = tamano - len(en_curso)
+                if libres > 0:
+                    for pk in reclamar_pendientes(libres):
+                        self.stdout.write(f'  -> Tarea #{pk} iniciada')
+                        en_curso[pool.submit(ejecutar_tarea, pk)] = pk
+
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                terminadas, _ = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                roto = False
+                for futuro in terminadas:
+                    pk = en_curso.pop(futuro)
+                    try:
+                        futuro.result()
+                    except Exception as e:
+                        # Una tarea que falla fuera de su propio try (o un proceso que muere) no detiene al worker
+                        roto = roto or isinstance(e, BrokenProcessPool)
+                        Tarea.objects.filter(pk=pk, estado='en_proceso').update(
+                            estado='error', fecha_fin=timezone.now(), error=traceback.format_exc(),
+                        )
+                        self.stderr.write(f'  <- Tarea #{pk} falló: {e!r}')
+                    else:
+                        self.stdout.write(f'  <- Tarea #{pk} finalizada')
+                if roto:
+                    # Un proceso del pool murió: el pool ya no acepta tareas; se reemplaza
+                    pool.shutdown(wait=False)
+                    pool = self.crear_pool(options)
+        except KeyboardInterrupt:
+            self.stdout.write('Deteniendo worker; esperando tareas en curso...')
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS('Worker detenido.'))
+
+    def crear_pool(self, options):
+        if options['procesos']:
+            # iniciar_proceso vive en un módulo sin modelos: funciona con 'fork' y con 'spawn'
+            return ProcessPoolExecutor(max_workers=options['procesos'], initializer=iniciar_proceso)
+        return ThreadPoolExecutor(max_workers=options['hilos'])
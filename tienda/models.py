@@ -1,7 +1,35 @@
 # tienda/models.py
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# Con sucursales en bases de datos separadas (ver tienda/routers.py) las ventas y
+# existencias viven en otra base que el catálogo: sus llaves foráneas hacia el
+# catálogo no pueden tener restricción en la base de datos.
+FK_CON_RESTRICCION = not getattr(settings, 'TIENDA_BASES_SUCURSAL', None)
+
+# ============ MODELO SUCURSAL ============
+# Cada tienda física. Las ventas y el stock se separan por sucursal; el catálogo
+# (productos, categorías, clientes) es compartido.
+
+class Sucursal(models.Model):
+    codigo = models.SlugField(max_length=30, unique=True)  # ej. 'centro'; lo usa TIENDA_BD_SUCURSALES
+    nombre = models.CharField(max_length=100)
+    direccion = models.TextField(blank=True)
+    activa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name = "Sucursal"
+        verbose_name_plural = "Sucursales"
+        ordering = ['nombre']
+
 
 # ============ MODELO PERFIL DE USUARIO ============
 
@@ -17,6 +45,8 @@ class PerfilUsuario(models.Model):
     rol = models.CharField(max_length=20, choices=ROLES, default='vendedor')
     telefono = models.CharField(max_length=15, blank=True, null=True)
     departamento = models.CharField(max_length=100, blank=True, null=True)
+    # Sucursal fija del empleado; sin sucursal puede elegirla en el menú
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.SET_NULL, null=True, blank=True, related_name='empleados')
     fecha_contratacion = models.DateField(auto_now_add=True)
     activo = models.BooleanField(default=True)
     
@@ -50,12 +80,40 @@ class PerfilUsuario(models.Model):
         verbose_name_plural = "Perfiles de Usuario"
 
 
+# ============ AUDITORÍA: VALORES CARGADOS ============
+# La auditoría (tienda/auditoria.py) compara al guardar contra lo que se leyó de la base.
+
+class Auditado:
+    """Guarda los valores de la fila tal como llegan de la base, sin copiarlos."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._valores_cargados = (field_names, values)
+        return instancia
+
+
+# ============ BORRADO LÓGICO ============
+# Categoría, Producto y Cliente se eliminan en dos pasos (ver tienda/eliminacion.py):
+# primero se marcan con 'eliminado=True' (desaparecen de 'objects' al instante) y
+# después una tarea en segundo plano borra o desvincula sus dependientes por lotes.
+
+class VisiblesManager(models.Manager):
+    """Manager por defecto: oculta las filas marcadas como eliminadas."""
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminado=False)
+
+
 # ============ MODELO CATEGORÍA ============
 
-class Categoria(models.Model):
+class Categoria(Auditado, models.Model):
     nombre = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    eliminado = models.BooleanField(default=False, db_index=True)
+
+    objects = VisiblesManager()
+    todos = models.Manager()  # Incluye las eliminadas (pendientes de purgar)
 
     def __str__(self):
         return self.nombre
@@ -67,7 +125,7 @@ class Categoria(models.Model):
 
 # ============ MODELO PROVEEDOR ============
 # (CORREGIDO PARA COINCIDIR CON TU ProveedorForm)
-class Proveedor(models.Model):
+class Proveedor(Auditado, models.Model):
     # 'nombre' en el form es el contacto
     nombre = models.CharField(max_length=100, blank=True) 
     # 'empresa' en el form es el nombre principal/compañía
@@ -84,8 +142,10 @@ class Proveedor(models.Model):
 
 # ============ MODELO PRODUCTO ============
 
-class Producto(models.Model):
+class Producto(Auditado, models.Model):
     nombre = models.CharField(max_length=200)
+    # Código de barras o SKU que se escanea en caja; único (vacío = NULL, puede repetirse)
+    codigo = models.CharField(max_length=64, unique=True, null=True, blank=True)
     descripcion = models.TextField()
     precio_venta = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
@@ -94,6 +154,10 @@ class Producto(models.Model):
     creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='productos_creados')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     activo = models.BooleanField(default=True)
+    eliminado = models.BooleanField(default=False, db_index=True)
+
+    objects = VisiblesManager()
+    todos = models.Manager()  # Incluye los eliminados (pendientes de purgar)
 
     def __str__(self):
         return self.nombre
@@ -101,13 +165,17 @@ class Producto(models.Model):
 
 # ============ MODELO CLIENTE ============
 
-class Cliente(models.Model):
+class Cliente(Auditado, models.Model):
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
     email = models.EmailField(max_length=191, unique=True)
     telefono = models.CharField(max_length=15)
     direccion = models.TextField()
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    eliminado = models.BooleanField(default=False, db_index=True)
+
+    objects = VisiblesManager()
+    todos = models.Manager()  # Incluye los eliminados (pendientes de purgar)
     
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
@@ -122,25 +190,415 @@ class Cliente(models.Model):
         ordering = ['apellido', 'nombre']
 
 
+# ============ MODELO PROMOCIÓN ============
+# Descuento por producto o por categoría, con vigencia opcional. Las reglas activas
+# se compilan en tablas en memoria (ver tienda/promociones.py).
+
+class Promocion(models.Model):
+
+    TIPOS = (
+        ('porcentaje', 'Porcentaje de descuento'),
+        ('monto', 'Monto de descuento por unidad'),
+        ('lleva_paga', 'Lleva N, paga M'),
+    )
+
+    nombre = models.CharField(max_length=100)
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    valor = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text='Porcentaje o monto (no aplica a "lleva N, paga M")')
+    lleva = models.PositiveIntegerField(null=True, blank=True)
+    paga = models.PositiveIntegerField(null=True, blank=True)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, blank=True, related_name='promociones')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True, related_name='promociones')
+    inicio = models.DateTimeField(default=timezone.now)
+    fin = models.DateTimeField(null=True, blank=True)  # None = sin fecha de término
+    activa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.nombre
+
+    def clean(self):
+        if self.producto_id is None and self.categoria_id is None:
+            raise ValidationError('Indica el producto o la categoría de la promoción.')
+        if self.tipo == 'lleva_paga' and not (self.lleva and self.paga is not None and self.paga < self.lleva):
+            raise ValidationError('En "lleva N, paga M", M debe ser menor que N.')
+        if self.tipo == 'porcentaje' and not 0 < self.valor <= 100:
+            raise ValidationError('El porcentaje debe estar entre 0 y 100.')
+        if self.fin is not None and self.fin <= self.inicio:
+            raise ValidationError('La fecha de término debe ser posterior al inicio.')
+
+    class Meta:
+        verbose_name = "Promoción"
+        verbose_name_plural = "Promociones"
+        ordering = ['-inicio']
+
+
 # ============ MODELO VENTA ============
 
-class Venta(models.Model):
-    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='ventas')
-    vendedor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='ventas_realizadas')
-    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='ventas')
+class Venta(Auditado, models.Model):
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='ventas', db_constraint=FK_CON_RESTRICCION)
+    vendedor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='ventas_realizadas', db_constraint=FK_CON_RESTRICCION)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='ventas', db_constraint=FK_CON_RESTRICCION)
+    # null: ventas anteriores a las sucursales
+    sucursal = models.ForeignKey('Sucursal', on_delete=models.PROTECT, null=True, blank=True, related_name='ventas', db_constraint=FK_CON_RESTRICCION)
     cantidad = models.IntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    # Promoción aplicada a la línea (tienda/promociones.py) y su descuento sobre cantidad x precio
+    promocion = models.ForeignKey('Promocion', on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas', db_constraint=FK_CON_RESTRICCION)
+    descuento = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     fecha_venta = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"Venta #{self.id} - {self.producto.nombre} - ${self.total}"
+        # Sin consultar el producto si no está cargado (el nombre está en VentaHistorial)
+        producto = self.producto.nombre if Venta.producto.is_cached(self) else f"producto {self.producto_id}"
+        return f"Venta #{self.id} - {producto} - ${self.total}"
     
     def save(self, *args, **kwargs):
-        self.total = self.cantidad * self.precio_unitario
+        self.total = self.cantidad * self.precio_unitario - self.descuento
         super().save(*args, **kwargs)
     
     class Meta:
         verbose_name = "Venta"
         verbose_name_plural = "Ventas"
-        ordering = ['-fecha_venta']
\ No newline at end of file
+        ordering = ['-fecha_venta']
+        indexes = [
+            # Listas y reportes siempre filtran por sucursal y rango de fechas
+            models.Index(fields=['sucursal', 'fecha_venta']),
+        ]
+
+
+# ============ MODELO DE LECTURA: HISTORIAL DE VENTAS ============
+# Copia plana de cada venta con los nombres tal como eran al venderse. Se escribe
+# en la misma transacción que la venta y en su misma base (ver tienda/historial.py).
+# El historial y los reportes leen solo esta tabla: sin JOIN a producto, cliente
+# ni usuario. Sin llaves foráneas para que no haya JOIN ni restricciones entre bases.
+
+class VentaHistorial(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # El mismo id de la Venta
+    sucursal_id = models.BigIntegerField(null=True, blank=True)
+    fecha_venta = models.DateTimeField()
+    producto_id = models.BigIntegerField()
+    producto_nombre = models.CharField(max_length=200)
+    cliente_id = models.BigIntegerField()
+    cliente_nombre = models.CharField(max_length=201)
+    vendedor_id = models.BigIntegerField(null=True, blank=True)
+    vendedor_username = models.CharField(max_length=150, blank=True)
+    cantidad = models.IntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"Venta #{self.id} - {self.producto_nombre} - ${self.total}"
+
+    class Meta:
+        verbose_name = "Historial de Venta"
+        verbose_name_plural = "Historial de Ventas"
+        ordering = ['-fecha_venta']
+        indexes = [
+            models.Index(fields=['sucursal_id', 'fecha_venta']),
+            models.Index(fields=['fecha_venta']),
+        ]
+
+
+# ============ MODELO STOCK POR SUCURSAL ============
+# Existencias de cada producto en cada sucursal. 'Producto.stock' sigue siendo
+# el total de todas las sucursales (ver tienda/sucursales.py).
+
+class StockSucursal(models.Model):
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='existencias', db_constraint=FK_CON_RESTRICCION)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='existencias', db_constraint=FK_CON_RESTRICCION)
+    stock = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.sucursal_id} = {self.stock}"
+
+    class Meta:
+        verbose_name = "Stock por Sucursal"
+        verbose_name_plural = "Stock por Sucursal"
+        constraints = [
+            models.UniqueConstraint(fields=['sucursal', 'producto'], name='stock_unico_por_sucursal'),
+        ]
+
+
+# ============ MODELO RESERVA DE STOCK ============
+# Unidades apartadas para el carrito abierto de un empleado hasta 'vence' (ver
+# tienda/reservas.py). Disponible = Producto.stock - reservas vigentes.
+
+class Reserva(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    creada = models.DateTimeField(auto_now_add=True)
+    vence = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id} para {self.usuario_id} hasta {self.vence:%H:%M}"
+
+    @property
+    def subtotal(self):
+        return self.producto.precio_venta * self.cantidad
+
+    class Meta:
+        verbose_name = "Reserva de Stock"
+        verbose_name_plural = "Reservas de Stock"
+        indexes = [
+            # Suma de reservas vigentes de un producto
+            models.Index(fields=['producto', 'vence']),
+            # Carrito del empleado
+            models.Index(fields=['usuario', 'vence']),
+            # Barrido de vencidas
+            models.Index(fields=['vence']),
+        ]
+
+
+# ============ MODELOS DE COMPRAS: ORDEN Y RECEPCIÓN ============
+# Orden de compra a un proveedor y las recepciones de mercancía contra ella (ver
+# tienda/compras.py). Recibir suma al stock con F(): nunca pisa las ventas en curso.
+# Las líneas conservan el historial aunque se purgue el producto o el proveedor (SET_NULL).
+
+class OrdenCompra(models.Model):
+
+    ESTADOS = (
+        ('pendiente', 'Pendiente'),
+        ('parcial', 'Recibida en parte'),
+        ('recibida', 'Recibida'),
+        ('cancelada', 'Cancelada'),
+    )
+    ABIERTAS = ('pendiente', 'parcial')
+
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.SET_NULL, null=True, related_name='ordenes_compra')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente', db_index=True)
+    notas = models.TextField(blank=True)
+    creada_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ordenes_compra')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"OC #{self.id} - {self.proveedor or 'Sin proveedor'}"
+
+    class Meta:
+        verbose_name = "Orden de Compra"
+        verbose_name_plural = "Órdenes de Compra"
+        ordering = ['-fecha_creacion']
+
+
+class LineaOrdenCompra(models.Model):
+    orden = models.ForeignKey(OrdenCompra, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, related_name='lineas_compra')
+    cantidad = models.PositiveIntegerField()
+    recibida = models.PositiveIntegerField(default=0)
+    costo_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id} (OC #{self.orden_id})"
+
+    @property
+    def pendiente(self):
+        return max(self.cantidad - self.recibida, 0)
+
+    class Meta:
+        verbose_name = "Línea de Orden de Compra"
+        verbose_name_plural = "Líneas de Orden de Compra"
+        constraints = [
+            models.UniqueConstraint(fields=['orden', 'producto'], name='producto_unico_por_orden'),
+        ]
+
+
+class Recepcion(models.Model):
+    orden = models.ForeignKey(OrdenCompra, on_delete=models.CASCADE, related_name='recepciones')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.SET_NULL, null=True, blank=True, related_name='recepciones')
+    recibida_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='recepciones')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Recepción #{self.id} (OC #{self.orden_id})"
+
+    class Meta:
+        verbose_name = "Recepción de Mercancía"
+        verbose_name_plural = "Recepciones de Mercancía"
+        ordering = ['-fecha']
+
+
+class LineaRecepcion(models.Model):
+    recepcion = models.ForeignKey(Recepcion, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, related_name='recepciones')
+    cantidad = models.PositiveIntegerField()
+    costo_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Línea de Recepción"
+        verbose_name_plural = "Líneas de Recepción"
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id} (Recepción #{self.recepcion_id})"
+
+
+# ============ MODELO MOVIMIENTO DE STOCK (BITÁCORA) ============
+# Bitácora de solo-inserción: cada cambio de 'Producto.stock' deja aquí
+# una fila con la cantidad (+/-) y el motivo. Nunca se editan ni se borran.
+
+class MovimientoStock(models.Model):
+
+    MOTIVOS = (
+        ('alta', 'Alta de producto'),
+        ('venta', 'Venta'),
+        ('devolucion', 'Venta eliminada (devolución)'),
+        ('edicion', 'Edición de producto'),
+        ('ajuste_masivo', 'Ajuste masivo'),
+        ('baja', 'Producto eliminado'),
+        ('reconciliacion', 'Reconciliación'),
+        ('compra', 'Recepción de compra'),
+    )
+
+    # SET_NULL: el historial sobrevive aunque el producto se elimine
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, related_name='movimientos')
+    cantidad = models.IntegerField()  # Positivo = entrada, negativo = salida
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    referencia = models.CharField(max_length=100, blank=True)
+    venta = models.ForeignKey(Venta, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos', db_constraint=FK_CON_RESTRICCION)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_motivo_display()} {self.cantidad:+d} - {self.producto_id}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Los movimientos de stock no se pueden modificar.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los movimientos de stock no se pueden eliminar.")
+
+    class Meta:
+        verbose_name = "Movimiento de Stock"
+        verbose_name_plural = "Movimientos de Stock"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['producto', 'fecha']),
+        ]
+
+
+# ============ MODELO SNAPSHOT DE STOCK ============
+# Foto periódica del stock de cada producto. "Stock a la fecha X" se calcula
+# con el snapshot más cercano anterior a X más los movimientos posteriores.
+
+class SnapshotStock(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots')
+    stock = models.IntegerField()
+    fecha = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.producto_id} = {self.stock} @ {self.fecha:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        verbose_name = "Snapshot de Stock"
+        verbose_name_plural = "Snapshots de Stock"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['producto', 'fecha']),
+        ]
+
+
+# ============ MODELO TAREA (COLA DE TRABAJOS EN SEGUNDO PLANO) ============
+# Cola guardada en la misma base de datos: las vistas encolan y el comando
+# 'python manage.py worker' las ejecuta. No necesita Redis ni otro broker.
+
+class Tarea(models.Model):
+
+    ESTADOS = (
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('terminada', 'Terminada'),
+        ('error', 'Error'),
+    )
+
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    creada_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tareas')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    # Resultado descargable (ej. un CSV) o el mensaje de error
+    resultado = models.BinaryField(null=True, blank=True)
+    nombre_archivo = models.CharField(max_length=150, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+
+    # Avance que reporta la tarea mientras corre (ver tareas.reportar_progreso)
+    progreso = models.PositiveSmallIntegerField(default=0)  # 0 a 100
+    avance = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        return f"Tarea #{self.id} - {self.tipo} ({self.get_estado_display()})"
+
+    @property
+    def lista(self):
+        return self.estado in ('terminada', 'error')
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # El worker busca siempre "la pendiente más antigua"
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+
+# ============ MODELO VERSIÓN POR MODELO ============
+# Contador que sube cada vez que se guarda o elimina una fila del modelo
+# (ver tienda/versiones.py). Permite responder "304 Not Modified" en las
+# listas y reportes con una sola consulta por llave primaria.
+
+class VersionModelo(models.Model):
+    modelo = models.CharField(max_length=100, primary_key=True)  # ej. 'tienda.categoria'
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.modelo} v{self.version}"
+
+    class Meta:
+        verbose_name = "Versión de Modelo"
+        verbose_name_plural = "Versiones de Modelos"
+
+
+# ============ MODELO AUDITORÍA ============
+# Quién cambió qué en el catálogo y las ventas, con el valor anterior y el nuevo
+# de cada campo. Las filas se escriben por lotes desde un hilo (ver
+# tienda/auditoria.py): 'fecha' es la del cambio, no la de la escritura.
+
+class Auditoria(models.Model):
+
+    ACCIONES = (
+        ('crear', 'Creación'),
+        ('editar', 'Edición'),
+        ('eliminar', 'Eliminación'),
+        ('ajuste_masivo', 'Ajuste masivo'),
+    )
+
+    fecha = models.DateTimeField(default=timezone.now)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='auditoria')
+    modelo = models.CharField(max_length=50)  # ej. 'tienda.producto'
+    objeto_id = models.BigIntegerField(null=True, blank=True)  # None en los ajustes masivos
+    accion = models.CharField(max_length=20, choices=ACCIONES)
+    # {campo: [antes, después]}; en los ajustes masivos, los parámetros del ajuste
+    cambios = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+
+    def __str__(self):
+        return f"{self.get_accion_display()} {self.modelo} #{self.objeto_id} ({self.fecha:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        verbose_name = "Registro de Auditoría"
+        verbose_name_plural = "Auditoría"
+        ordering = ['-fecha']
+        indexes = [
+            # Historia de un objeto
+            models.Index(fields=['modelo', 'objeto_id', 'fecha']),
+            # Lo que hizo un usuario
+            models.Index(fields=['usuario', 'fecha']),
+            models.Index(fields=['fecha']),
+        ]
@@ -0,0 +1,107 @@
+# tienda/promociones.py
+# Motor de promociones de la caja.
+#
+# Tipos de regla (modelo Promocion): porcentaje, monto por unidad y "lleva N,
+# paga M". Cada regla es de un producto o de una categoría y puede tener vigencia.
+#
+# - 'compilar()' lee las reglas activas no vencidas (una consulta) y las deja en
+#   dos tablas: {producto_id: reglas} y {categoria_id: reglas}. La tabla se
+#   guarda en la caché de referencia (tienda/referencia.py) y se recompila cuando
+#   cambia una promoción (señal -> referencia.invalidar('promociones')).
+# - 'evaluar()' recibe todas las líneas del ticket y devuelve la promoción y el
+#   descuento de cada una sin consultar la base: por línea, dos búsquedas en
+#   diccionario y las reglas de ese producto y su categoría.
+# - Las fechas de inicio/fin se revisan al evaluar: una promoción programada
+#   empieza y termina sola, sin recompilar.
+# - Si varias reglas aplican a una línea se queda la de mayor descuento.
+# - "Lleva N, paga M" cuenta las unidades del producto en todo el ticket (aunque
+#   estén en varias líneas) y reparte las unidades gratis en orden.
+
+from collections import Counter, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import chain
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import referencia
+from .models import Promocion
+
+CERO = Decimal('0.00')
+CENTAVO = Decimal('0.01')
+
+Regla = namedtuple('Regla', 'id tipo valor lleva paga inicio fin')
+
+
+# ============ COMPILACIÓN ============
+def compilar():
+    """{'productos': {pk: (Regla, ...)}, 'categorias': {pk: (Regla, ...)}} con las reglas activas no vencidas."""
+    productos, categorias = {}, {}
+    filas = (
+        Promocion.objects.filter(activa=True).filter(Q(fin=None) | Q(fin__gt=timezone.now()))
+        .values_list('id', 'tipo', 'valor', 'lleva', 'paga', 'inicio', 'fin', 'producto_id', 'categoria_id')
+    )
+    for *campos, producto_id, categoria_id in filas:
+        regla = Regla(*campos)
+        if producto_id is not None:
+            productos.setdefault(producto_id, []).append(regla)
+        if categoria_id is not None:
+            categorias.setdefault(categoria_id, []).append(regla)
+    return {
+        'productos': {pk: tuple(reglas) for pk, reglas in productos.items()},
+        'categorias': {pk: tuple(reglas) for pk, reglas in categorias.items()},
+    }
+
+
+# ============ EVALUACIÓN DE UN TICKET ============
+def _descuento(regla, precio, cantidad):
+    if regla.tipo == 'porcentaje':
+        return (precio * cantidad * regla.valor / 100).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    return min(regla.valor, precio) * cantidad  # 'monto' por unidad, sin dejar el precio negativo
+
+
+def evaluar(lineas, cuando=None):
+    """
+    lineas: [(producto_id, categoria_id, precio_unitario, cantidad)].
+    Devuelve [(promocion_id o None, descuento)] en el mismo orden, sin consultas.
+    """
+    tabla = referencia.promociones()
+    if not tabla['productos'] and not tabla['categorias']:
+        return [(None, CERO)] * len(lineas)
+    cuando = cuando or timezone.now()
+
+    unidades = Counter()
+    for producto_id, _, _, cantidad in lineas:
+        unidades[producto_id] += cantidad
+    gratis = {}  # (producto, regla): unidades gratis que quedan por repartir
+
+    resultado = []
+    for producto_id, categoria_id, precio, cantidad in lineas:
+        mejor, descuento_mejor, gratis_mejor = None, CERO, 0
+        for regla in chain(tabla['productos'].get(producto_id, ()), tabla['categorias'].get(categoria_id, ())):
+            if regla.inicio > cuando or (regla.fin is not None and regla.fin <= cuando):
+                continue
+            usadas = 0
+            if regla.tipo == 'lleva_paga':
+                clave = (producto_id, regla.id)
+                if clave not in gratis:
+                    gratis[clave] = unidades[producto_id] // regla.lleva * (regla.lleva - regla.paga)
+                usadas = min(gratis[clave], cantidad)
+                descuento = precio * usadas
+            else:
+                descuento = _descuento(regla, precio, cantidad)
+            if descuento > descuento_mejor:
+                mejor, descuento_mejor, gratis_mejor = regla, descuento, usadas
+        if gratis_mejor:
+            gratis[(producto_id, mejor.id)] -= gratis_mejor
+        resultado.append((mejor.id if mejor else None, descuento_mejor))
+    return resultado
+
+
+def aplicar(ventas, categorias, cuando=None):
+    """Fija promocion_id y descuento en ventas sin guardar. 'categorias' = {producto_id: categoria_id}."""
+    lineas = [(v.producto_id, categorias.get(v.producto_id), v.precio_unitario, v.cantidad) for v in ventas]
+    for venta, (promocion_id, descuento) in zip(ventas, evaluar(lineas, cuando)):
+        venta.promocion_id = promocion_id
+        venta.descuento = descuento
+    return ventas
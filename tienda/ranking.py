@@ -0,0 +1,227 @@
+# tienda/ranking.py
+# Ranking de vendedores (hoy / esta semana / este mes) sin GROUP BY por petición.
+#
+# Cada periodo de cada sucursal es una "cubeta" en la caché compartida (CACHES):
+#   {'totales': {vendedor_id: [centavos, ventas]},
+#    'orden':   [(-centavos, vendedor_id), ...]   # lista ordenada
+#    'nombres': {vendedor_id: username},
+#    'corte':   fecha_venta desde la que se guardan los ids vistos,
+#    'vistas':  ids de las ventas posteriores a 'corte' que ya contó la reconstrucción}
+#
+# - Lectura: si la cubeta no está (primera vez, expiró o se invalidó) se
+#   reconstruye con un GROUP BY del periodo y se guarda DURACION segundos.
+# - Escritura: al confirmarse una venta (o su eliminación) se actualizan solo las
+#   cubetas que ya existen: se quita la entrada del vendedor de 'orden' y se vuelve
+#   a insertar con bisect. Si no se obtiene el candado a tiempo, la cubeta se borra
+#   y la siguiente lectura la reconstruye.
+# - Una venta confirmada después de reconstruir puede tener un id menor que otra que
+#   sí se contó (el id se asigna al INSERT, no al COMMIT). Por eso no se compara con
+#   el id máximo: la reconstrucción guarda los ids de las ventas de los últimos
+#   VENTANA segundos y la venta nueva se suma si no está entre ellos. Las anteriores
+#   a 'corte' ya estaban confirmadas (ninguna transacción dura VENTANA segundos).
+# - top(n) es un slice de 'orden'; posicion() es un bisect: O(log n).
+# - El cambio de periodo es automático: la clave incluye la fecha de inicio del
+#   periodo (día, lunes de la semana, día 1 del mes), así que a medianoche se usa
+#   una cubeta nueva y las viejas expiran solas.
+# - Borrados masivos (tienda/eliminacion.py) llaman a invalidar(): se sube la
+#   generación y todas las cubetas se reconstruyen al leerlas.
+# Cualquier diferencia por carreras entre procesos dura a lo más DURACION.
+#
+# Requiere una caché compartida entre procesos (TIENDA_CACHE='sqlite' o 'db'): con
+# 'local' cada worker tiene sus propias cubetas y solo suma sus propias ventas. En
+# ese caso las cubetas duran DURACION_LOCAL segundos y 'manage.py check --deploy'
+# avisa (tienda.W001, ver tienda/checks.py).
+
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, DecimalField, Sum, Value
+from django.utils import timezone
+
+from .sucursales import enrutado, ventas_de
+
+DURACION = 15 * 60
+DURACION_LOCAL = 30  # Con una caché por proceso: las ventas de otros workers se ven tras expirar
+VENTANA = 5 * 60     # Segundos de ventas cuyos ids guarda la reconstrucción
+PERIODOS = {'dia': 'Hoy', 'semana': 'Esta semana', 'mes': 'Este mes'}
+CLAVE_GENERACION = 'ranking:generacion'
+ESPERA_CANDADO = 0.5
+
+
+def cache_compartida():
+    """False si la caché es la memoria de cada proceso (TIENDA_CACHE='local')."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _duracion():
+    return DURACION if cache_compartida() else DURACION_LOCAL
+
+
+# ============ PERIODOS ============
+def inicio_periodo(periodo, dia):
+    if periodo == 'dia':
+        return dia
+    if periodo == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    return dia.replace(day=1)
+
+
+def fin_periodo(periodo, inicio):
+    if periodo == 'dia':
+        return inicio + timedelta(days=1)
+    if periodo == 'semana':
+        return inicio + timedelta(days=7)
+    return (inicio + timedelta(days=32)).replace(day=1)
+
+
+def _clave(periodo, inicio, sucursal_id):
+    generacion = cache.get(CLAVE_GENERACION, 0)
+    return f'ranking:{generacion}:{periodo}:{inicio.isoformat()}:{sucursal_id if sucursal_id is not None else "todas"}'
+
+
+def _centavos(monto):
+    return int((Decimal(monto) * 100).to_integral_value())
+
+
+# ============ CONSTRUCCIÓN (FALLBACK A LA BASE) ============
+def reconstruir(periodo, inicio, sucursal_id):
+    """Cubeta del periodo calculada con la base: un GROUP BY + los nombres de los vendedores."""
+    desde = timezone.make_aware(datetime.combine(inicio, hora.min))
+    hasta = timezone.make_aware(datetime.combine(fin_periodo(periodo, inicio), hora.min))
+    corte = timezone.now() - timedelta(seconds=VENTANA)
+    ventas = ventas_de(sucursal_id).filter(fecha_venta__gte=desde, fecha_venta__lt=hasta, vendedor__isnull=False).order_by()
+    # Totales por vendedor y, en la misma consulta (mismas ventas confirmadas), los ids
+    # de las recientes: estas filas llevan ventas=0
+    por_vendedor = ventas.values_list('vendedor_id').annotate(total=Sum('total'), ventas=Count('id'))
+    recientes = (
+        ventas.filter(fecha_venta__gte=corte)
+        .annotate(total_=Value(None, output_field=DecimalField()), ventas_=Value(0))
+        .values_list('pk', 'total_', 'ventas_')
+    )
+    totales, vistas = {}, set()
+    for pk, total, cantidad in por_vendedor.union(recientes, all=True):
+        if cantidad:
+            totales[pk] = [_centavos(total or 0), cantidad]
+        else:
+            vistas.add(pk)
+    # Los usuarios siempre están en 'default' (las ventas pueden estar en otra base)
+    nombres = dict(User.objects.filter(pk__in=totales).values_list('pk', 'username')) if totales else {}
+    return {
+        'totales': totales,
+        'orden': sorted((-centavos, pk) for pk, (centavos, _) in totales.items()),
+        'nombres': nombres,
+        'corte': corte,
+        'vistas': vistas,
+    }
+
+
+def cubeta(periodo, sucursal_id=None, dia=None):
+    inicio = inicio_periodo(periodo, dia or timezone.localdate())
+    clave = _clave(periodo, inicio, sucursal_id)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = reconstruir(periodo, inicio, sucursal_id)
+        cache.set(clave, datos, _duracion())
+    return datos
+
+
+# ============ CONSULTAS ============
+def top(periodo, sucursal_id=None, n=10):
+    """Los 'n' mejores vendedores del periodo: [{'posicion', 'vendedor_id', 'username', 'total', 'ventas'}]."""
+    datos = cubeta(periodo, sucursal_id)
+    resultado = []
+    for negativo, pk in datos['orden'][:n]:
+        # Empates: misma posición (la del primero con ese total)
+        posicion = resultado[-1]['posicion'] if resultado and resultado[-1]['centavos'] == -negativo else len(resultado) + 1
+        resultado.append({
+            'posicion': posicion,
+            'vendedor_id': pk,
+            'username': datos['nombres'].get(pk, f'#{pk}'),
+            'centavos': -negativo,
+            'total': Decimal(-negativo) / 100,
+            'ventas': datos['totales'][pk][1],
+        })
+    return resultado
+
+
+def posicion(vendedor_id, periodo, sucursal_id=None):
+    """(posición, de cuántos vendedores) en el periodo, o (None, total) si no ha vendido."""
+    datos = cubeta(periodo, sucursal_id)
+    if vendedor_id not in datos['totales']:
+        return None, len(datos['orden'])
+    centavos = datos['totales'][vendedor_id][0]
+    return bisect_left(datos['orden'], (-centavos,)) + 1, len(datos['orden'])
+
+
+# ============ ACTUALIZACIÓN INCREMENTAL ============
+def _mover(datos, vendedor_id, centavos, ventas):
+    """Suma (o resta) al vendedor y lo reacomoda en 'orden' con bisect."""
+    anterior = datos['totales'].get(vendedor_id)
+    if anterior is not None:
+        indice = bisect_left(datos['orden'], (-anterior[0], vendedor_id))
+        del datos['orden'][indice]
+        centavos += anterior[0]
+        ventas += anterior[1]
+    if ventas > 0:
+        datos['totales'][vendedor_id] = [centavos, ventas]
+        insort(datos['orden'], (-centavos, vendedor_id))
+    else:
+        datos['totales'].pop(vendedor_id, None)
+
+
+def _contada(datos, venta):
+    """True si la reconstrucción de la cubeta ya incluyó la venta."""
+    return venta.fecha_venta < datos['corte'] or venta.pk in datos['vistas']
+
+
+def _actualizar(venta, signo):
+    if venta.vendedor_id is None:
+        return
+    dia = timezone.localdate(venta.fecha_venta)
+    centavos = signo * _centavos(venta.total)
+    # Sin bases separadas, la cubeta "todas" también incluye la venta (ver ventas_de)
+    alcances = {venta.sucursal_id} | ({None} if not enrutado() else set())
+    for periodo in PERIODOS:
+        inicio = inicio_periodo(periodo, dia)
+        for sucursal_id in alcances:
+            clave = _clave(periodo, inicio, sucursal_id)
+            candado = clave + ':candado'
+            limite = time.monotonic() + ESPERA_CANDADO
+            while not cache.add(candado, 1, 5):
+                if time.monotonic() >= limite:
+                    cache.delete(clave)  # Se reconstruirá al leerla
+                    break
+                time.sleep(0.005)
+            else:
+                try:
+                    datos = cache.get(clave)
+                    # Una venta nueva que ya contó la reconstrucción no se suma dos veces
+                    if datos is not None and not (signo > 0 and _contada(datos, venta)):
+                        if venta.vendedor_id not in datos['nombres']:
+                            datos['nombres'][venta.vendedor_id] = venta.vendedor.username
+                        _mover(datos, venta.vendedor_id, centavos, signo)
+                        cache.set(clave, datos, _duracion())
+                finally:
+                    cache.delete(candado)
+
+
+def registrar_venta(venta):
+    """Llamar cuando la venta ya está confirmada (transaction.on_commit)."""
+    _actualizar(venta, 1)
+
+
+def quitar_venta(venta):
+    _actualizar(venta, -1)
+
+
+def invalidar():
+    """Descarta todas las cubetas (ej. tras borrar ventas por lotes)."""
+    try:
+        cache.incr(CLAVE_GENERACION)
+    except ValueError:
+        cache.set(CLAVE_GENERACION, 1, None)
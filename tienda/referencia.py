@@ -0,0 +1,195 @@
+# tienda/referencia.py
+# Caché de datos de referencia: opciones de categorías, proveedores y productos
+# para los formularios, una "foto" (nombre, precio, stock) de cada producto y el
+# mapa código de barras -> producto del escáner de caja y las promociones
+# compiladas de la caja (tienda/promociones.py).
+#
+# Tres niveles, del más rápido al más lento:
+#   1. LRU en memoria del proceso, con TTL (TIENDA_REFERENCIA_TTL segundos).
+#   2. Caché compartida (CACHES), con la versión del conjunto en la clave:
+#      'referencia:categorias:<versión>'.
+#   3. La base de datos.
+# Al guardar o eliminar (señales en tienda/signals.py, o a mano tras un
+# queryset.update()) se sube la versión del conjunto en la caché compartida: las
+# claves viejas dejan de usarse en todos los procesos. Este proceso lo ve al
+# instante; los demás, cuando vence su copia local (a lo más el TTL).
+#
+# Los datos pueden estar hasta TTL segundos atrasados: sirven para mostrar y para
+# la validación rápida de los formularios. La escritura final (ej. la venta en
+# views.venta_crear) vuelve a leer la fila con bloqueo dentro de la transacción.
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+
+from .models import Categoria, Proveedor, Producto
+
+logger = logging.getLogger('tienda.referencia')
+
+CAMPOS_PRODUCTO = ('id', 'nombre', 'precio_venta', 'stock', 'activo')
+DURACION_COMPARTIDA = 24 * 60 * 60  # Las claves de versiones viejas expiran solas
+_FALTA = object()
+
+
+# ============ LRU CON TTL (POR PROCESO) ============
+class LRU:
+    """Diccionario acotado a 'maximo' entradas; cada una vence a los 'ttl' segundos."""
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+
+    def get(self, clave):
+        with self._candado:
+            entrada = self._datos.get(clave, _FALTA)
+            if entrada is _FALTA:
+                return _FALTA
+            vence, valor = entrada
+            if time.monotonic() >= vence:
+                del self._datos[clave]
+                return _FALTA
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        with self._candado:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def pop(self, clave):
+        with self._candado:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._candado:
+            self._datos.clear()
+
+
+_local = LRU(getattr(settings, 'TIENDA_REFERENCIA_MAX', 2000), getattr(settings, 'TIENDA_REFERENCIA_TTL', 30))
+
+
+# ============ VERSIONES Y LECTURA ============
+def _version(conjunto):
+    clave = f'referencia:version:{conjunto}'
+    version = _local.get(clave)
+    if version is _FALTA:
+        version = cache.get(clave)
+        if version is None:
+            # Si la caché perdió la versión no se vuelve a empezar en 0 (habría claves viejas):
+            # se arranca con la hora actual
+            cache.add(clave, int(time.time()), None)
+            version = cache.get(clave)
+        _local.set(clave, version)
+    return version
+
+
+def _leer(clave, cargar):
+    valor = _local.get(clave)
+    if valor is _FALTA:
+        valor = cache.get(clave, _FALTA)
+        if valor is _FALTA:
+            valor = cargar()
+            cache.set(clave, valor, DURACION_COMPARTIDA)
+        _local.set(clave, valor)
+    return valor
+
+
+def categorias():
+    """[(pk, nombre)] de las categorías visibles, en orden de nombre."""
+    return _leer(
+        f"referencia:categorias:{_version('categorias')}",
+        lambda: list(Categoria.objects.order_by('nombre').values_list('pk', 'nombre')),
+    )
+
+
+def proveedores():
+    """[(pk, empresa)] de los proveedores."""
+    return _leer(
+        f"referencia:proveedores:{_version('proveedores')}",
+        lambda: list(Proveedor.objects.order_by('pk').values_list('pk', 'empresa')),
+    )
+
+
+def productos():
+    """[(pk, nombre)] de los productos visibles (opciones del punto de venta)."""
+    return _leer(
+        f"referencia:productos:{_version('productos')}",
+        lambda: list(Producto.objects.order_by('pk').values_list('pk', 'nombre')),
+    )
+
+
+def codigos():
+    """{código: pk} de los productos visibles con código (lector de código de barras)."""
+    return _leer(
+        f"referencia:codigos:{_version('codigos')}",
+        lambda: dict(Producto.objects.exclude(codigo=None).values_list('codigo', 'pk')),
+    )
+
+
+def promociones():
+    """Reglas de promoción activas en tablas por producto y por categoría (ver promociones.compilar)."""
+    from .promociones import compilar  # promociones importa este módulo
+    return _leer(f"referencia:promociones:{_version('promociones')}", compilar)
+
+
+def precalentar():
+    """Carga en este proceso lo que la caja usa primero (al arrancar el servidor)."""
+    try:
+        codigos()
+        productos()
+        promociones()
+    except DatabaseError:
+        logger.warning('No se pudo precalentar la caché de referencia; se cargará en la primera petición', exc_info=True)
+    finally:
+        # Con 'gunicorn --preload' los procesos hijos no deben heredar esta conexión
+        connection.close()
+
+
+def producto(pk):
+    """{'id', 'nombre', 'precio_venta', 'stock', 'activo'} del producto visible, o None."""
+    return _leer(
+        f"referencia:producto:{_version('producto')}:{pk}",
+        lambda: Producto.objects.filter(pk=pk).values(*CAMPOS_PRODUCTO).first(),
+    )
+
+
+def instancia_producto(datos):
+    """Producto (solo con los campos de la foto; el resto se difiere) para asignarlo a una venta."""
+    return Producto.from_db('default', CAMPOS_PRODUCTO, [datos[campo] for campo in CAMPOS_PRODUCTO])
+
+
+# ============ INVALIDACIÓN ============
+def _subir_version(*conjuntos):
+    for conjunto in conjuntos:
+        clave = f'referencia:version:{conjunto}'
+        try:
+            version = cache.incr(clave)
+        except ValueError:
+            version = int(time.time())
+            cache.set(clave, version, None)
+        _local.set(clave, version)
+
+
+def invalidar(*conjuntos):
+    """Descarta los conjuntos indicados (al confirmarse la transacción actual)."""
+    transaction.on_commit(lambda: _subir_version(*conjuntos))
+
+
+def _olvidar(pk):
+    clave = f"referencia:producto:{_version('producto')}:{pk}"
+    cache.delete(clave)
+    _local.pop(clave)
+
+
+def olvidar_producto(pk):
+    """Descarta la foto de un producto (ej. tras mover su stock con F())."""
+    transaction.on_commit(lambda: _olvidar(pk))
@@ -0,0 +1,178 @@
+# tienda/reservas.py
+# Reservas de stock con vencimiento para el carrito de cada empleado.
+#
+# Sin reservas, dos cajas que venden las últimas unidades de un producto pasan
+# las dos la validación del formulario y compiten al guardar. Con reservas:
+#
+# - 'reservar()' aparta unidades por TIENDA_RESERVA_MINUTOS. Bloquea la fila del
+#   producto, suma las reservas vigentes (índice (producto, vence)) y solo inserta
+#   la reserva si stock - reservado alcanza. Dos reservas del mismo producto se
+#   hacen una después de otra; las de productos distintos no se estorban.
+# - 'cobrar()' convierte las reservas vigentes del carrito en ventas en una sola
+#   transacción: bloquea los productos (en orden de id, sin deadlocks entre
+#   carritos), descuenta stock con UPDATE condicional, crea las ventas y borra
+#   las reservas. Si algo falla no se vende nada y las reservas siguen.
+# - La venta directa (views.venta_crear) también respeta las reservas de otros.
+# - 'barrer()' borra las vencidas por lotes (índice en 'vence'); lo llaman el
+#   worker cada minuto y el comando 'python manage.py barrer_reservas'. Una
+#   reserva vencida deja de contar aunque todavía no se haya barrido.
+#
+# "Bloquear" es un UPDATE que no cambia nada: toma el candado de escritura de la
+# fila en MySQL y el de la base en SQLite (donde select_for_update no hace nada).
+# Si la base responde con deadlock o "database is locked" se reintenta.
+
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import promociones, referencia
+from .inventario import registrar_movimiento
+from .models import Producto, Reserva, Venta
+from .sucursales import alias_de, descontar_existencias
+from .versiones import tocar_version
+
+REINTENTOS = 12
+ESPERA_MAXIMA = 0.2  # Segundos máximos entre reintentos (espera exponencial con azar)
+LOTE_BARRIDO = 1000
+
+
+class StockInsuficiente(Exception):
+    """No hay unidades suficientes para la reserva o el cobro (nada se guardó)."""
+
+
+def duracion():
+    return timedelta(minutes=getattr(settings, 'TIENDA_RESERVA_MINUTOS', 15))
+
+
+def _reintentar(funcion):
+    """Reintenta 'funcion' (que abre su propia transacción) si la base reporta un bloqueo."""
+    for intento in range(REINTENTOS):
+        try:
+            return funcion()
+        except OperationalError:
+            # Dentro de otra transacción no se puede reintentar: la de afuera ya falló
+            if intento == REINTENTOS - 1 or transaction.get_connection().in_atomic_block:
+                raise
+            time.sleep(random.uniform(0, min(ESPERA_MAXIMA, 0.005 * 2 ** intento)))
+
+
+def bloquear(producto_ids):
+    """Bloquea las filas de los productos hasta el fin de la transacción. Devuelve cuántos existen."""
+    return Producto.objects.filter(pk__in=producto_ids).update(stock=F('stock'))
+
+
+# ============ CONSULTAS ============
+def vigentes():
+    return Reserva.objects.filter(vence__gt=timezone.now())
+
+
+def reservado(producto_id, usuario=None):
+    """Unidades apartadas del producto por reservas vigentes (sin las de 'usuario', si se indica)."""
+    reservas = vigentes().filter(producto_id=producto_id)
+    if usuario is not None:
+        reservas = reservas.exclude(usuario=usuario)
+    return reservas.aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+def disponibles(producto_ids):
+    """{producto_id: stock - reservado} con dos consultas."""
+    stock = dict(Producto.objects.filter(pk__in=producto_ids).values_list('pk', 'stock'))
+    apartado = dict(
+        vigentes().filter(producto_id__in=producto_ids).order_by()
+        .values('producto_id').annotate(total=Sum('cantidad')).values_list('producto_id', 'total')
+    )
+    return {pk: cantidad - apartado.get(pk, 0) for pk, cantidad in stock.items()}
+
+
+def carrito(usuario):
+    """Reservas vigentes del empleado, con su producto."""
+    return vigentes().filter(usuario=usuario).select_related('producto').order_by('creada')
+
+
+# ============ RESERVAR / LIBERAR ============
+def reservar(producto_id, cantidad, usuario):
+    """Aparta 'cantidad' unidades para el carrito de 'usuario'. Lanza StockInsuficiente si no alcanzan."""
+    def _reservar():
+        with transaction.atomic():
+            if not bloquear([producto_id]):
+                raise StockInsuficiente('El producto ya no existe.')
+            stock = Producto.objects.filter(pk=producto_id).values_list('stock', flat=True).get()
+            libre = stock - reservado(producto_id)
+            if libre < cantidad:
+                raise StockInsuficiente(f'Solo hay {max(libre, 0)} unidad(es) disponibles (el resto está apartado).')
+            return Reserva.objects.create(
+                producto_id=producto_id, usuario=usuario, cantidad=cantidad, vence=timezone.now() + duracion(),
+            )
+    return _reintentar(_reservar)
+
+
+def liberar(usuario, reserva_id=None):
+    """Quita una reserva del carrito (o todas). Devuelve cuántas se borraron."""
+    reservas = Reserva.objects.filter(usuario=usuario)
+    if reserva_id is not None:
+        reservas = reservas.filter(pk=reserva_id)
+    return reservas.delete()[0]
+
+
+# ============ COBRAR (RESERVAS -> VENTAS) ============
+def cobrar(usuario, cliente, sucursal_id=None):
+    """
+    Convierte las reservas vigentes de 'usuario' en ventas para 'cliente', todo o
+    nada. Devuelve la lista de ventas (vacía si el carrito no tenía reservas vigentes).
+    """
+    def _cobrar():
+        with transaction.atomic(), transaction.atomic(using=alias_de(sucursal_id)):
+            reservas = list(vigentes().filter(usuario=usuario).order_by('producto_id', 'pk'))
+            if not reservas:
+                return []
+            producto_ids = sorted({reserva.producto_id for reserva in reservas})
+            bloquear(producto_ids)
+            productos = Producto.objects.only('nombre', 'precio_venta', 'stock', 'categoria_id').in_bulk(producto_ids)
+
+            ventas = []
+            for reserva in reservas:
+                producto = productos.get(reserva.producto_id)
+                if producto is None:
+                    raise StockInsuficiente('Un producto del carrito ya no existe.')
+                ventas.append(Venta(
+                    cliente=cliente, producto=producto, vendedor=usuario, sucursal_id=sucursal_id,
+                    cantidad=reserva.cantidad, precio_unitario=producto.precio_venta,
+                ))
+            # Promociones de todo el ticket en una pasada (tienda/promociones.py)
+            promociones.aplicar(ventas, {pk: producto.categoria_id for pk, producto in productos.items()})
+
+            for venta in ventas:
+                producto = venta.producto
+                # Las reservas ya estaban descontadas del disponible; aquí solo se
+                # verifica que el stock no haya bajado por un ajuste manual
+                if not Producto.objects.filter(pk=producto.pk, stock__gte=venta.cantidad).update(stock=F('stock') - venta.cantidad):
+                    raise StockInsuficiente(f'Ya no hay stock suficiente de {producto.nombre}.')
+                if sucursal_id is not None and not descontar_existencias(sucursal_id, producto.pk, venta.cantidad):
+                    raise StockInsuficiente(f'No hay stock suficiente de {producto.nombre} en esta sucursal.')
+                venta.save()
+                registrar_movimiento(producto, -venta.cantidad, 'venta', usuario=usuario, venta=venta)
+
+            Reserva.objects.filter(pk__in=[reserva.pk for reserva in reservas]).delete()
+            # update() no dispara señales
+            tocar_version(Producto)
+            for pk in producto_ids:
+                referencia.olvidar_producto(pk)
+            return ventas
+    return _reintentar(_cobrar)
+
+
+# ============ BARRIDO DE VENCIDAS ============
+def barrer(lote=LOTE_BARRIDO):
+    """Borra las reservas vencidas, 'lote' a la vez. Devuelve cuántas se borraron."""
+    ahora = timezone.now()
+    borradas = 0
+    while True:
+        ids = list(Reserva.objects.filter(vence__lte=ahora).values_list('pk', flat=True)[:lote])
+        if not ids:
+            return borradas
+        borradas += Reserva.objects.filter(pk__in=ids)._raw_delete(Reserva.objects.db)
@@ -0,0 +1,48 @@
+# tienda/routers.py
+# Router opcional: ventas y existencias de cada grupo de sucursales en su
+# propia base de datos. El catálogo (usuarios, productos, clientes, bitácora,
+# tareas...) se queda en 'default'.
+#
+# Se activa desde settings.py con la variable de entorno TIENDA_BD_SUCURSALES:
+#   TIENDA_BD_SUCURSALES="centro=grupo_a.sqlite3,norte=grupo_a.sqlite3,sur=grupo_b.sqlite3"
+#   python manage.py migrate --run-syncdb
+#   python manage.py migrate --run-syncdb --database grupo_a
+#   python manage.py migrate --run-syncdb --database grupo_b
+# (las sucursales que no aparecen se quedan en 'default').
+
+from .sucursales import alias_de, sucursal_actual
+
+MODELOS_POR_SUCURSAL = {'venta', 'ventahistorial', 'stocksucursal'}
+
+
+class SucursalRouter:
+
+    def _es_de_sucursal(self, model):
+        return model._meta.app_label == 'tienda' and model._meta.model_name in MODELOS_POR_SUCURSAL
+
+    def _alias(self, model, **hints):
+        if not self._es_de_sucursal(model):
+            # Todo lo demás vive en 'default', aunque se llegue desde una venta
+            # (ej. venta.cliente o la validación de la llave foránea en un formulario)
+            return 'default'
+        # Una venta ya guardada se queda en su base; una nueva va a la de su sucursal.
+        # Sin instancia (o si es de otro modelo, ej. producto.ventas) se usa la sucursal actual.
+        instancia = hints.get('instance')
+        if isinstance(instancia, model):
+            if instancia._state.db:
+                return instancia._state.db
+            if instancia.sucursal_id is not None:
+                return alias_de(instancia.sucursal_id)
+        return alias_de(sucursal_actual())
+
+    db_for_read = _alias
+    db_for_write = _alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Una venta (base de la sucursal) apunta a su producto y cliente (base 'default')
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default':
+            return None
+        return app_label == 'tienda' and model_name in MODELOS_POR_SUCURSAL
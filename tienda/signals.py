@@ -0,0 +1,117 @@
+# tienda/signals.py
+# Señales de la app. Se conectan en TiendaConfig.ready() (tienda/apps.py).
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import PerfilUsuario, Categoria, Proveedor, Producto, Cliente, Venta, Sucursal, Promocion
+from . import auditoria, historial, ranking, referencia
+from .en_vivo import difusor
+from .sucursales import olvidar_sucursales
+from .versiones import tocar_version
+
+
+# ============ VERSIONES POR MODELO (GET CONDICIONAL) ============
+MODELOS_VERSIONADOS = (User, PerfilUsuario, Categoria, Proveedor, Producto, Cliente, Venta)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def subir_version(sender, update_fields=None, **kwargs):
+    """Cualquier cambio en un modelo versionado invalida los ETag de sus páginas."""
+    if sender not in MODELOS_VERSIONADOS:
+        return
+    # El login solo actualiza 'last_login', que no se muestra en ninguna página
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    tocar_version(sender)
+
+
+# ============ CATÁLOGO DE SUCURSALES EN MEMORIA ============
+@receiver(post_save, sender=Sucursal)
+@receiver(post_delete, sender=Sucursal)
+def recargar_sucursales(sender, **kwargs):
+    olvidar_sucursales()
+
+
+# ============ DASHBOARD EN VIVO ============
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def avisar_en_vivo(sender, using=None, **kwargs):
+    """Despierta el sondeo de tienda/en_vivo.py cuando la venta ya está confirmada."""
+    if difusor.suscriptores:
+        transaction.on_commit(difusor.despertar, using=using)
+
+
+# ============ RANKING DE VENDEDORES (tienda/ranking.py) ============
+@receiver(post_save, sender=Venta)
+def sumar_al_ranking(sender, instance, created, using=None, **kwargs):
+    if created:
+        transaction.on_commit(lambda: ranking.registrar_venta(instance), using=using)
+
+
+@receiver(post_delete, sender=Venta)
+def restar_del_ranking(sender, instance, using=None, **kwargs):
+    transaction.on_commit(lambda: ranking.quitar_venta(instance), using=using)
+
+
+# ============ CACHÉ DE DATOS DE REFERENCIA (tienda/referencia.py) ============
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_categorias(sender, **kwargs):
+    referencia.invalidar('categorias')
+
+
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+def invalidar_proveedores(sender, **kwargs):
+    referencia.invalidar('proveedores')
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_producto(sender, instance, update_fields=None, **kwargs):
+    referencia.olvidar_producto(instance.pk)
+    # Un cambio solo de stock no cambia las opciones (pk, nombre) ni los códigos del punto de venta
+    if update_fields is None or set(update_fields) != {'stock'}:
+        referencia.invalidar('productos', 'codigos')
+
+
+@receiver(post_save, sender=Promocion)
+@receiver(post_delete, sender=Promocion)
+def invalidar_promociones(sender, **kwargs):
+    referencia.invalidar('promociones')
+
+
+# ============ HISTORIAL DE VENTAS PLANO (tienda/historial.py) ============
+@receiver(post_save, sender=Venta)
+def escribir_historial(sender, instance, created, **kwargs):
+    # Dentro de la misma transacción que la venta
+    historial.registrar(instance, created)
+
+
+@receiver(post_delete, sender=Venta)
+def borrar_historial(sender, instance, using=None, **kwargs):
+    historial.quitar([instance.pk], using)
+
+
+# ============ AUDITORÍA (tienda/auditoria.py) ============
+# Lo leído de la base lo conserva models.Auditado.from_db (sin señal post_init por fila)
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Venta)
+def auditar_guardado(sender, instance, created, update_fields=None, using=None, **kwargs):
+    auditoria.registrar_guardado(instance, created, update_fields, using)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Venta)
+def auditar_eliminacion(sender, instance, using=None, **kwargs):
+    auditoria.registrar_eliminacion(instance, using)
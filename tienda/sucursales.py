@@ -0,0 +1,232 @@
+# tienda/sucursales.py
+# Sucursal actual de cada petición, existencias por sucursal y consultas de
+# ventas acotadas a una sucursal.
+#
+# - 'SucursalMiddleware' fija 'request.sucursal_id': la sucursal del perfil del
+#   empleado o, si no tiene una fija, la que eligió en el menú (guardada en la
+#   sesión). None = todas las sucursales.
+# - 'Producto.stock' es el total de todas las sucursales; 'StockSucursal' tiene
+#   el detalle. Toda función que mueve stock de una sucursal actualiza ambos.
+# - 'ventas_de(sucursal_id)' devuelve las ventas de la sucursal en su base de
+#   datos (ver tienda/routers.py) y filtradas por el índice (sucursal, fecha_venta).
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, Value
+from django.db.models.functions import Greatest
+
+from .models import Sucursal, Producto, Venta, StockSucursal, MovimientoStock
+from . import referencia
+
+
+# ============ CATÁLOGO DE SUCURSALES (EN MEMORIA) ============
+# Son pocas y casi nunca cambian: se leen una vez por minuto por proceso y las
+# señales de Sucursal borran la copia al guardar o eliminar.
+DURACION_CACHE = 60
+_cache = {'hasta': 0, 'sucursales': {}}
+
+
+def sucursales():
+    """{pk: {'codigo', 'nombre', 'activa'}} de todas las sucursales."""
+    if time.monotonic() >= _cache['hasta']:
+        _cache['sucursales'] = {
+            pk: {'codigo': codigo, 'nombre': nombre, 'activa': activa}
+            for pk, codigo, nombre, activa in
+            Sucursal.objects.order_by('nombre').values_list('pk', 'codigo', 'nombre', 'activa')
+        }
+        _cache['hasta'] = time.monotonic() + DURACION_CACHE
+    return _cache['sucursales']
+
+
+def olvidar_sucursales():
+    _cache['hasta'] = 0
+
+
+def hay_sucursales():
+    return bool(sucursales())
+
+
+# ============ BASE DE DATOS DE CADA SUCURSAL ============
+def enrutado():
+    """True si hay sucursales en bases de datos separadas (TIENDA_BD_SUCURSALES)."""
+    return bool(getattr(settings, 'TIENDA_BASES_SUCURSAL', None))
+
+
+def alias_de(sucursal_id):
+    """Alias de la base de datos donde viven las ventas/existencias de la sucursal."""
+    if sucursal_id is None or not enrutado():
+        return 'default'
+    codigo = sucursales().get(sucursal_id, {}).get('codigo')
+    return settings.TIENDA_BASES_SUCURSAL.get(codigo, 'default')
+
+
+def bases():
+    """Todas las bases de datos que pueden tener ventas o existencias."""
+    return ['default'] + sorted(set(getattr(settings, 'TIENDA_BASES_SUCURSAL', {}).values()) - {'default'})
+
+
+# ============ SUCURSAL ACTUAL (POR HILO) ============
+_local = threading.local()
+
+
+def sucursal_actual():
+    return getattr(_local, 'sucursal_id', None)
+
+
+@contextmanager
+def usar_sucursal(sucursal_id):
+    """Fija la sucursal actual del hilo (la usa el router), ej. en tareas y comandos."""
+    anterior = sucursal_actual()
+    _local.sucursal_id = sucursal_id
+    try:
+        yield
+    finally:
+        _local.sucursal_id = anterior
+
+
+class SucursalMiddleware:
+    """Fija request.sucursal_id y la sucursal actual del hilo. Va después de AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.sucursal_id = self.resolver(request)
+        with usar_sucursal(request.sucursal_id):
+            return self.get_response(request)
+
+    def resolver(self, request):
+        if not request.user.is_authenticated:
+            return None
+        perfil = getattr(request.user, 'perfil', None)
+        if perfil is not None and perfil.sucursal_id is not None:
+            return perfil.sucursal_id
+        elegida = request.session.get('sucursal_id')
+        if elegida in sucursales():
+            return elegida
+        if enrutado() and sucursales():
+            # Con bases separadas no hay una vista de "todas": se usa la primera
+            return next(iter(sucursales()))
+        return None
+
+
+def contexto(request):
+    """Context processor: sucursal actual y las disponibles para el menú."""
+    if not getattr(request, 'user', None) or not request.user.is_authenticated or not hay_sucursales():
+        return {}
+    disponibles = {pk: datos for pk, datos in sucursales().items() if datos['activa']}
+    perfil = getattr(request.user, 'perfil', None)
+    return {
+        'sucursal_actual': sucursales().get(getattr(request, 'sucursal_id', None)),
+        'sucursales_menu': disponibles if perfil is None or perfil.sucursal_id is None else {},
+        'sucursal_todas_permitida': not enrutado(),
+    }
+
+
+# ============ CONSULTAS ACOTADAS A LA SUCURSAL ============
+def ventas_de(sucursal_id):
+    """Ventas de la sucursal (o de todas si es None), en la base de datos que le corresponde."""
+    if sucursal_id is None:
+        return Venta.objects.all()
+    return Venta.objects.using(alias_de(sucursal_id)).filter(sucursal_id=sucursal_id)
+
+
+def con_relacionados(ventas, *campos):
+    """
+    select_related si las ventas están en la misma base que el catálogo (un JOIN);
+    si no, prefetch_related (una consulta extra por relación, en la otra base).
+    """
+    if ventas.db == 'default':
+        return ventas.select_related(*campos)
+    return ventas.prefetch_related(*campos)
+
+
+def existencias(sucursal_id, producto_ids=None):
+    """{producto_id: stock} de la sucursal."""
+    filas = StockSucursal.objects.using(alias_de(sucursal_id)).filter(sucursal_id=sucursal_id)
+    if producto_ids is not None:
+        filas = filas.filter(producto_id__in=producto_ids)
+    return dict(filas.values_list('producto_id', 'stock'))
+
+
+# ============ MOVIMIENTOS DE STOCK POR SUCURSAL ============
+def mover_existencias(sucursal_id, producto_id, cantidad):
+    """Suma 'cantidad' (o resta si es negativa) al stock de la sucursal, creando la fila si falta."""
+    if not cantidad:
+        return
+    alias = alias_de(sucursal_id)
+    filas = StockSucursal.objects.using(alias).filter(sucursal_id=sucursal_id, producto_id=producto_id)
+    if filas.update(stock=F('stock') + cantidad):
+        return
+    try:
+        with transaction.atomic(using=alias):
+            StockSucursal.objects.using(alias).create(sucursal_id=sucursal_id, producto_id=producto_id, stock=cantidad)
+    except IntegrityError:
+        # Otra petición la creó al mismo tiempo
+        filas.update(stock=F('stock') + cantidad)
+
+
+def descontar_existencias(sucursal_id, producto_id, cantidad):
+    """
+    Resta 'cantidad' solo si alcanza (UPDATE condicional: dos cajeros no pueden
+    vender la misma última unidad). Devuelve False si no hay suficiente.
+    """
+    return bool(
+        StockSucursal.objects.using(alias_de(sucursal_id))
+        .filter(sucursal_id=sucursal_id, producto_id=producto_id, stock__gte=cantidad)
+        .update(stock=F('stock') - cantidad)
+    )
+
+
+def ajustar_existencias(sucursal_id, productos, ajuste_stock, usuario=None, lote=1000):
+    """
+    Ajuste masivo de stock en una sucursal (nunca queda menor a 0). Actualiza las
+    existencias de la sucursal, el total de cada producto y la bitácora, por lotes.
+    Devuelve el número de productos cuyo stock cambió.
+    """
+    alias = alias_de(sucursal_id)
+    usuario = usuario if usuario is not None and usuario.is_authenticated else None
+    ids = list(productos.order_by('pk').values_list('pk', flat=True))
+    cambiados = 0
+    for i in range(0, len(ids), lote):
+        bloque = ids[i:i + lote]
+        with transaction.atomic(), transaction.atomic(using=alias):
+            # Asegura una fila por producto en la sucursal
+            StockSucursal.objects.using(alias).bulk_create(
+                [StockSucursal(sucursal_id=sucursal_id, producto_id=pk, stock=0) for pk in bloque],
+                ignore_conflicts=True,
+            )
+            filas = StockSucursal.objects.using(alias).filter(sucursal_id=sucursal_id, producto_id__in=bloque)
+            # Bloquea las filas (UPDATE sin cambios, como reservas.bloquear): una venta
+            # simultánea espera, así los deltas leídos son los que aplica el UPDATE
+            filas.update(stock=F('stock'))
+            deltas = {}
+            for producto_id, stock in filas.values_list('producto_id', 'stock'):
+                nuevo = max(0, stock + ajuste_stock)
+                if nuevo != stock:
+                    deltas[producto_id] = nuevo - stock
+            if not deltas:
+                continue
+
+            # La suma se hace en la base (F), no se escribe un valor calculado en Python
+            filas.filter(producto_id__in=deltas).update(
+                stock=Greatest(F('stock') + Value(int(ajuste_stock)), Value(0), output_field=IntegerField()),
+            )
+            # El total se mueve con F(): un UPDATE por cada delta distinto (casi siempre uno)
+            por_delta = {}
+            for pk, delta in deltas.items():
+                por_delta.setdefault(delta, []).append(pk)
+            for delta, pks in por_delta.items():
+                Producto.objects.filter(pk__in=pks).update(stock=F('stock') + delta)
+            referencia.invalidar('producto')
+            MovimientoStock.objects.bulk_create([
+                MovimientoStock(producto_id=pk, cantidad=delta, motivo='ajuste_masivo', usuario=usuario,
+                                referencia=f'Sucursal {sucursales().get(sucursal_id, {}).get("codigo", sucursal_id)}')
+                for pk, delta in deltas.items()
+            ])
+        cambiados += len(deltas)
+    return cambiados
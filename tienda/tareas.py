@@ -0,0 +1,173 @@
+# tienda/tareas.py
+# Cola de tareas en segundo plano respaldada por la base de datos.
+#
+# Las vistas llaman a 'encolar()' y responden de inmediato con el id de la tarea.
+# El comando 'python manage.py worker' toma las tareas pendientes y las ejecuta
+# en un pool de hilos o de procesos.
+
+import csv
+import io
+import threading
+import traceback
+from datetime import datetime, time, timedelta
+
+from django.core.management import call_command
+from django.db import connections
+from django.utils import timezone
+
+from .models import Producto, Tarea
+from .historial import historial_de
+from .sucursales import sucursales
+
+
+# ============ REGISTRO DE TIPOS DE TAREA ============
+TIPOS_TAREA = {}
+
+# Tarea que ejecuta el hilo actual (para reportar_progreso)
+_actual = threading.local()
+
+
+def tarea(tipo, descripcion):
+    """
+    Decorador que registra una función como tipo de tarea.
+    La función recibe los parámetros de la tarea y devuelve
+    (contenido_bytes, nombre_archivo, content_type).
+    """
+    def decorator(func):
+        TIPOS_TAREA[tipo] = (func, descripcion)
+        return func
+    return decorator
+
+
+def _csv(nombre_archivo, encabezados, filas):
+    salida = io.StringIO()
+    writer = csv.writer(salida)
+    writer.writerow(encabezados)
+    writer.writerows(filas)
+    # BOM para que Excel abra bien los acentos
+    return ('\ufeff' + salida.getvalue()).encode('utf-8'), nombre_archivo, 'text/csv; charset=utf-8'
+
+
+# ============ TAREAS DISPONIBLES ============
+@tarea('reporte_ventas', 'Reporte de ventas por rango de fechas (CSV)')
+def reporte_ventas(desde, hasta, sucursal_id=None, lote=2000):
+    desde = datetime.strptime(desde, '%Y-%m-%d').date()
+    hasta = datetime.strptime(hasta, '%Y-%m-%d').date()
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+
+    # Tabla plana del historial (tienda/historial.py): los nombres ya vienen en cada fila
+    ventas = (
+        historial_de(sucursal_id).filter(fecha_venta__gte=inicio, fecha_venta__lt=fin)
+        .order_by('fecha_venta')
+        .values_list('id', 'fecha_venta', 'producto_nombre', 'cliente_nombre', 'cantidad', 'precio_unitario', 'total', 'vendedor_username')
+    )
+    filas = (
+        (pk, fecha.strftime('%Y-%m-%d %H:%M'), producto, cliente, cantidad, precio, total, vendedor)
+        for pk, fecha, producto, cliente, cantidad, precio, total, vendedor in ventas.iterator(chunk_size=lote)
+    )
+
+    sufijo = f"_{sucursales().get(sucursal_id, {}).get('codigo', sucursal_id)}" if sucursal_id else ''
+    return _csv(
+        f'reporte_ventas{sufijo}_{desde:%Y%m%d}_{hasta:%Y%m%d}.csv',
+        ['# Venta', 'Fecha', 'Producto', 'Cliente', 'Cantidad', 'Precio Unit.', 'Total', 'Vendedor'],
+        filas,
+    )
+
+
+@tarea('exportar_productos', 'Exportación completa de productos (CSV)')
+def exportar_productos():
+    productos = (
+        Producto.objects.order_by('pk')
+        .values_list('id', 'nombre', 'precio_venta', 'stock', 'categoria__nombre', 'proveedor__empresa', 'activo')
+    )
+    filas = (
+        (pk, nombre, precio, stock, categoria or '', proveedor or '', 'Sí' if activo else 'No')
+        for pk, nombre, precio, stock, categoria, proveedor, activo in productos.iterator(chunk_size=2000)
+    )
+    return _csv(
+        f'productos_{timezone.now():%Y%m%d_%H%M}.csv',
+        ['ID', 'Nombre', 'Precio Venta', 'Stock', 'Categoría', 'Proveedor', 'Activo'],
+        filas,
+    )
+
+
+@tarea('snapshot_stock', 'Recalcular snapshot de stock')
+def snapshot_stock():
+    salida = io.StringIO()
+    call_command('snapshot_stock', stdout=salida)
+    return salida.getvalue().encode('utf-8'), 'snapshot_stock.txt', 'text/plain; charset=utf-8'
+
+
+@tarea('eliminar_en_lotes', 'Eliminación por lotes de un registro y sus dependientes')
+def eliminar_en_lotes(modelo, pk, lote=500):
+    from .eliminacion import purgar
+    resumen = purgar(modelo, pk, lote=lote, progreso=reportar_progreso)
+    texto = '\n'.join(f'{etiqueta}: {cantidad}' for etiqueta, cantidad in resumen.items())
+    return texto.encode('utf-8'), f'eliminacion_{modelo.split(".")[-1]}_{pk}.txt', 'text/plain; charset=utf-8'
+
+
+# ============ API DE LA COLA ============
+def encolar(tipo, usuario=None, **parametros):
+    """Crea una tarea pendiente y la devuelve (no la ejecuta)."""
+    if tipo not in TIPOS_TAREA:
+        raise ValueError(f"Tipo de tarea desconocido: {tipo}")
+    return Tarea.objects.create(
+        tipo=tipo,
+        parametros=parametros,
+        creada_por=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+def reclamar_pendientes(limite):
+    """
+    Marca como 'en_proceso' hasta 'limite' tareas pendientes y devuelve sus ids.
+    Cada tarea se reclama con un UPDATE condicional, así dos workers nunca
+    ejecutan la misma tarea.
+    """
+    reclamadas = []
+    candidatas = (
+        Tarea.objects.filter(estado='pendiente')
+        .order_by('fecha_creacion')
+        .values_list('pk', flat=True)[:limite]
+    )
+    for pk in candidatas:
+        if Tarea.objects.filter(pk=pk, estado='pendiente').update(estado='en_proceso', fecha_inicio=timezone.now()):
+            reclamadas.append(pk)
+    return reclamadas
+
+
+def recuperar_abandonadas(segundos):
+    """Regresa a 'pendiente' las tareas en proceso desde hace más de 'segundos' (ej. un worker que murió)."""
+    limite = timezone.now() - timedelta(seconds=segundos)
+    return Tarea.objects.filter(estado='en_proceso', fecha_inicio__lt=limite).update(estado='pendiente', fecha_inicio=None)
+
+
+def reportar_progreso(hechos, total, avance=''):
+    """Para usar dentro de una tarea: guarda su avance (lo muestra la lista de tareas)."""
+    pk = getattr(_actual, 'pk', None)
+    if pk is None:
+        return
+    porcentaje = min(100, int(hechos * 100 / total)) if total else 100
+    Tarea.objects.filter(pk=pk).update(progreso=porcentaje, avance=avance[:200])
+
+
+def ejecutar_tarea(pk):
+    """Ejecuta una tarea ya reclamada y guarda su resultado o su error."""
+    _actual.pk = pk
+    try:
+        tarea_actual = Tarea.objects.get(pk=pk)
+        func, _ = TIPOS_TAREA[tarea_actual.tipo]
+        try:
+            contenido, nombre_archivo, content_type = func(**tarea_actual.parametros)
+            Tarea.objects.filter(pk=pk).update(
+                estado='terminada', fecha_fin=timezone.now(), progreso=100,
+                resultado=contenido, nombre_archivo=nombre_archivo, content_type=content_type,
+            )
+        except Exception:
+            Tarea.objects.filter(pk=pk).update(estado='error', fecha_fin=timezone.now(), error=traceback.format_exc())
+        return pk
+    finally:
+        _actual.pk = None
+        # Cada hilo/proceso del pool usa sus propias conexiones; las cerramos al terminar
+        connections.close_all()
@@ -1,3 +1,1657 @@
-from django.test import TestCase
+# tienda/tests.py
+# Pruebas de rendimiento: presupuesto de consultas SQL por vista y por rol.
+#
+# Cada vista de tienda/urls.py tiene un número máximo de consultas para cada rol.
+# Si una vista se pasa (por ejemplo por un N+1 al olvidar un select_related),
+# la prueba falla y muestra qué consultas sobran y cuáles se repiten.
+#
+# Ejecutar:  python manage.py test tienda
 
-# Create your tests here.
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F, Sum
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    PerfilUsuario, Categoria, Proveedor, Producto, Cliente, Venta, VentaHistorial, Tarea, Reserva, Promocion, OrdenCompra,
+    MovimientoStock, Sucursal, Auditoria,
+)
+from . import auditoria, checks, columnar, compras, eliminacion, en_vivo, historial, inventario, promociones, ranking, referencia, reservas, tareas, versiones, urls as tienda_urls
+from .ajustes import ajustar_productos, filtrar_productos
+from .forms import ProductoForm, ReservaForm
+from .inventario import registrar_movimiento
+from .sucursales import ajustar_existencias, descontar_existencias, existencias, sucursales
+from .versiones import tocar_version
+from sistema_tienda.cache_sqlite import SQLiteCache
+from sistema_tienda.detector_sql import DetectorConsultasMiddleware
+from sistema_tienda.estaticos import EstaticosMiddleware
+from sistema_tienda.hashers import PBKDF2TiendaHasher
+from sistema_tienda.procesos import iniciar_proceso
+
+
+ROLES = ('vendedor', 'gerente', 'administrador')
+
+# ============ PRESUPUESTO DE CONSULTAS ============
+# nombre de la url: (vendedor, gerente, administrador)
+# Un rol sin permiso se redirige, por eso su presupuesto suele ser menor.
+PRESUPUESTOS = {
+    'login': (2, 2, 2),
+    'home': (8, 8, 8),
+    'producto_lista': (4, 4, 4),
+    'producto_crear': (2, 3, 3),
+    'producto_escanear': (3, 3, 3),
+    'producto_editar': (2, 4, 4),
+    'producto_eliminar': (2, 2, 3),
+    'producto_ajuste_masivo': (2, 4, 4),
+    'categoria_lista': (2, 4, 4),
+    'categoria_crear': (2, 2, 2),
+    'categoria_editar': (2, 3, 3),
+    'categoria_eliminar': (2, 2, 3),
+    'proveedor_lista': (2, 4, 4),
+    'proveedor_crear': (2, 2, 2),
+    'proveedor_editar': (2, 3, 3),
+    'proveedor_eliminar': (2, 2, 3),
+    'cliente_lista': (4, 4, 4),
+    'cliente_crear': (2, 2, 2),
+    'cliente_editar': (2, 3, 3),
+    'cliente_eliminar': (2, 2, 3),
+    'venta_lista': (2, 4, 4),
+    'venta_crear': (4, 4, 4),
+    'venta_eliminar': (2, 2, 4),
+    'reporte_ventas': (2, 6, 6),
+    'ventas_eventos': (3, 3, 3),
+    'ranking_vendedores': (2, 9, 9),
+    'carrito': (4, 4, 4),
+    'carrito_agregar': (2, 2, 2),
+    'carrito_quitar': (2, 2, 2),
+    'carrito_cobrar': (2, 2, 2),
+    'tarea_lista': (2, 3, 3),
+    'tarea_encolar': (2, 2, 2),
+    'tarea_estado': (2, 3, 3),
+    'tarea_descargar': (2, 3, 3),
+    'sucursal_cambiar': (2, 2, 2),
+    'perfil_lista': (2, 2, 2),
+    'perfil_descargar': (2, 2, 2),
+    'orden_compra_lista': (2, 3, 3),
+    'orden_compra_crear': (2, 3, 3),
+    'orden_compra_recibir': (2, 3, 3),
+    'logout': (2, 2, 2),
+}
+
+# Vistas con formularios u opciones de tienda/referencia.py, con la caché vacía:
+# incluye las consultas de carga (una por conjunto; un N+1 en un cargador se pasa)
+PRESUPUESTOS_EN_FRIO = {
+    'producto_crear': (2, 4, 4),
+    'producto_editar': (2, 5, 5),
+    'producto_escanear': (4, 4, 4),
+    'producto_ajuste_masivo': (2, 4, 4),
+    'venta_crear': (4, 4, 4),
+    'carrito': (5, 5, 5),
+    'orden_compra_crear': (2, 3, 3),
+}
+
+# Vistas de lista/reporte: su número de consultas no debe crecer con las filas
+VISTAS_DE_LISTA = (
+    'home', 'producto_lista', 'categoria_lista', 'proveedor_lista',
+    'cliente_lista', 'venta_lista', 'reporte_ventas', 'tarea_lista',
+    'ventas_eventos',
+)
+
+
+# ============ UTILIDADES ============
+def forma_sql(sql):
+    """Normaliza una consulta: mismos valores distintos => misma 'forma'."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = re.sub(r'IN \((?:\?, )*\?\)', 'IN (...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def explicar_exceso(consultas, presupuesto):
+    """Texto legible con las consultas que exceden el presupuesto y las formas repetidas."""
+    lineas = [f'Se esperaban como máximo {presupuesto} consultas y se ejecutaron {len(consultas)}:']
+    for i, consulta in enumerate(consultas, start=1):
+        marca = '+' if i > presupuesto else ' '
+        lineas.append(f'  {marca} {i:>3}. {consulta["sql"][:300]}')
+
+    repetidas = [(forma, n) for forma, n in Counter(forma_sql(c['sql']) for c in consultas).items() if n > 1]
+    if repetidas:
+        lineas.append('Formas repetidas (posible N+1, falta select_related/prefetch_related):')
+        for forma, n in sorted(repetidas, key=lambda x: -x[1]):
+            lineas.append(f'  x{n}  {forma[:300]}')
+    return '\n'.join(lineas)
+
+
+def sembrar(cantidad, sufijo, usuario):
+    """Crea 'cantidad' filas de cada modelo (dataset mediano para las pruebas)."""
+    categorias = Categoria.objects.bulk_create(
+        [Categoria(nombre=f'Categoría {sufijo}-{i}') for i in range(cantidad)]
+    )
+    proveedores = Proveedor.objects.bulk_create(
+        [Proveedor(empresa=f'Proveedor {sufijo}-{i}', nombre='Contacto') for i in range(cantidad)]
+    )
+    productos = Producto.objects.bulk_create([
+        Producto(
+            nombre=f'Producto {sufijo}-{i}', descripcion='-', precio_venta=Decimal('10.00'), stock=1000,
+            categoria=categorias[i % len(categorias)], proveedor=proveedores[i % len(proveedores)],
+            creado_por=usuario,
+        )
+        for i in range(cantidad)
+    ])
+    clientes = Cliente.objects.bulk_create([
+        Cliente(nombre=f'Cliente{i}', apellido=sufijo, email=f'cliente{sufijo}{i}@ejemplo.com', telefono='0', direccion='-')
+        for i in range(cantidad)
+    ])
+    Venta.objects.bulk_create([
+        Venta(
+            cliente=clientes[i % len(clientes)], vendedor=usuario, producto=productos[i % len(productos)],
+            cantidad=1, precio_unitario=Decimal('10.00'), total=Decimal('10.00'),
+        )
+        for i in range(cantidad)
+    ])
+
+
+# Sin collectstatic: los templates usan los nombres originales de los estáticos
+SIN_COLLECTSTATIC = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+# ============ PRUEBAS ============
+@override_settings(STORAGES=SIN_COLLECTSTATIC)
+class PresupuestoConsultasTests(TestCase):
+    """Presupuesto de consultas por vista y por rol."""
+
+    FILAS = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuarios = {}
+        for rol in ROLES:
+            usuario = User.objects.create(username=f'prueba_{rol}')
+            PerfilUsuario.objects.create(user=usuario, rol=rol)
+            cls.usuarios[rol] = usuario
+
+        sembrar(cls.FILAS, 'a', cls.usuarios['administrador'])
+        cls.tarea = Tarea.objects.create(
+            tipo='exportar_productos', estado='terminada', creada_por=None,
+            resultado=b'id\n', nombre_archivo='productos.csv', content_type='text/csv',
+        )
+
+    def url(self, nombre):
+        """URL de prueba para cada vista (con un pk válido cuando lo necesita)."""
+        con_pk = {
+            'producto': Producto, 'categoria': Categoria, 'proveedor': Proveedor,
+            'cliente': Cliente, 'venta': Venta, 'tarea': Tarea,
+        }
+        if nombre == 'tarea_encolar':
+            return reverse('tienda:tarea_encolar', args=['exportar_productos'])
+        if nombre == 'perfil_descargar':
+            return reverse('tienda:perfil_descargar', args=['no-existe', 'json'])
+        if nombre == 'producto_escanear':
+            return reverse('tienda:producto_escanear') + '?codigo=7501234567890'
+        if nombre in ('carrito_quitar', 'orden_compra_recibir'):
+            return reverse(f'tienda:{nombre}', args=[0])
+        prefijo = nombre.split('_')[0]
+        if nombre.endswith(('_editar', '_eliminar', '_estado', '_descargar')) and prefijo in con_pk:
+            return reverse(f'tienda:{nombre}', args=[con_pk[prefijo].objects.order_by('pk').first().pk])
+        return reverse(f'tienda:{nombre}')
+
+    def contar(self, rol, nombre, fria=False):
+        """
+        Ejecuta un GET como 'rol' y devuelve las consultas capturadas. Con fria=True
+        la caché de referencia empieza vacía y sus cargas también se cuentan.
+        """
+        usuario = self.usuarios[rol]
+        # El superusuario ve todas las tareas; los demás, solo las suyas
+        Tarea.objects.filter(pk=self.tarea.pk).update(creada_por=usuario)
+        if fria:
+            # Como tras reiniciar o subir una versión: nada en memoria ni en la caché compartida
+            cache.clear()
+            referencia._local.clear()
+        # Sesión y cookies nuevas: un mensaje flash pendiente de la vista anterior
+        # haría que condicional() se salte la consulta de versiones
+        self.client.logout()
+        self.client.force_login(usuario)
+        url = self.url(nombre)
+        sucursales()  # La lista de sucursales se guarda en memoria por un minuto; no se cuenta
+        if not fria:
+            # Opciones de los formularios: en uso normal ya están en la caché (tienda/referencia.py)
+            referencia.categorias(), referencia.proveedores(), referencia.productos()
+            referencia.codigos(), referencia.promociones()
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(url)
+        self.assertLess(respuesta.status_code, 500, f'{nombre} ({rol}) respondió {respuesta.status_code}')
+        return ctx.captured_queries
+
+    def test_todas_las_vistas_tienen_presupuesto(self):
+        nombres = {patron.name for patron in tienda_urls.urlpatterns}
+        self.assertEqual(nombres - set(PRESUPUESTOS), set(), 'Agrega las vistas nuevas a PRESUPUESTOS')
+
+    def test_presupuesto_por_vista_y_rol(self):
+        for nombre, presupuestos in PRESUPUESTOS.items():
+            for rol, presupuesto in zip(ROLES, presupuestos):
+                with self.subTest(vista=nombre, rol=rol):
+                    consultas = self.contar(rol, nombre)
+                    if len(consultas) > presupuesto:
+                        self.fail(f'{nombre} ({rol}): ' + explicar_exceso(consultas, presupuesto))
+
+    def test_presupuesto_con_cache_fria(self):
+        for nombre, presupuestos in PRESUPUESTOS_EN_FRIO.items():
+            for rol, presupuesto in zip(ROLES, presupuestos):
+                with self.subTest(vista=nombre, rol=rol):
+                    consultas = self.contar(rol, nombre, fria=True)
+                    if len(consultas) > presupuesto:
+                        self.fail(f'{nombre} ({rol}, caché fría): ' + explicar_exceso(consultas, presupuesto))
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        antes = {
+            (nombre, rol): len(self.contar(rol, nombre))
+            for nombre in VISTAS_DE_LISTA for rol in ROLES
+        }
+        sembrar(self.FILAS * 2, 'b', self.usuarios['administrador'])
+        for nombre in VISTAS_DE_LISTA:
+            for rol in ROLES:
+                with self.subTest(vista=nombre, rol=rol):
+                    consultas = self.contar(rol, nombre)
+                    if len(consultas) != antes[(nombre, rol)]:
+                        self.fail(
+                            f'{nombre} ({rol}): pasó de {antes[(nombre, rol)]} a {len(consultas)} consultas '
+                            f'al triplicar las filas.\n' + explicar_exceso(consultas, antes[(nombre, rol)])
+                        )
+
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    """Reservas de carrito (tienda/reservas.py): sin sobreventa aunque muchas cajas compitan."""
+
+    HILOS = 8
+    STOCK = 20
+    INTENTOS_POR_HILO = 5  # 40 intentos por 20 unidades: la mitad debe fallar limpio
+    SEGUNDOS_MAXIMOS = 30
+
+    def setUp(self):
+        # Las ventas dejan entradas de auditoría en memoria: se escriben antes de vaciar la base de prueba
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.vendedores = [User.objects.create(username=f'caja_{i}') for i in range(self.HILOS)]
+        self.cliente = Cliente.objects.create(nombre='Cliente', apellido='Prueba', email='c@ejemplo.com', telefono='0', direccion='-')
+        self.producto = Producto.objects.create(
+            nombre='Último modelo', descripcion='-', precio_venta=Decimal('10.00'), stock=self.STOCK,
+        )
+
+    def test_sin_sobreventa_con_cajas_concurrentes(self):
+        resultados = Counter()
+        errores = []
+        candado = threading.Lock()
+        salida = threading.Barrier(self.HILOS)
+
+        def caja(vendedor):
+            try:
+                salida.wait()
+                for _ in range(self.INTENTOS_POR_HILO):
+                    try:
+                        reservas.reservar(self.producto.pk, 1, vendedor)
+                    except reservas.StockInsuficiente:
+                        continue
+                    vendidas = sum(venta.cantidad for venta in reservas.cobrar(vendedor, self.cliente))
+                    with candado:
+                        resultados['vendidas'] += vendidas
+            except Exception as e:  # Se reporta en el hilo principal
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        inicio = time.monotonic()
+        hilos = [threading.Thread(target=caja, args=(vendedor,)) for vendedor in self.vendedores]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.monotonic() - inicio
+
+        self.assertEqual(errores, [])
+        self.producto.refresh_from_db()
+        vendidas = Venta.objects.filter(producto=self.producto).aggregate(total=Sum('cantidad'))['total'] or 0
+        self.assertGreaterEqual(self.producto.stock, 0)
+        self.assertEqual(vendidas + self.producto.stock, self.STOCK, 'Se vendió más (o menos) de lo que se descontó')
+        self.assertEqual(vendidas, resultados['vendidas'])
+        self.assertEqual(vendidas, self.STOCK, 'Con intentos de sobra se debe vender todo el stock')
+        self.assertFalse(Reserva.objects.exists(), 'Cada reserva cobrada debe borrarse')
+        operaciones = self.HILOS * self.INTENTOS_POR_HILO
+        self.assertLess(
+            segundos, self.SEGUNDOS_MAXIMOS,
+            f'{operaciones} reservas+cobros tardaron {segundos:.1f}s ({operaciones / segundos:.0f} op/s)',
+        )
+
+    def test_reservas_vencidas_no_apartan_stock(self):
+        primero, segundo = self.vendedores[:2]
+        reservas.reservar(self.producto.pk, self.STOCK, primero)
+        with self.assertRaises(reservas.StockInsuficiente):
+            reservas.reservar(self.producto.pk, 1, segundo)
+
+        Reserva.objects.update(vence=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reservas.disponibles([self.producto.pk]), {self.producto.pk: self.STOCK})
+        reservas.reservar(self.producto.pk, 1, segundo)
+        self.assertEqual(reservas.cobrar(primero, self.cliente), [])
+        self.assertEqual(reservas.barrer(), 1)
+        self.assertEqual(list(Reserva.objects.values_list('usuario', flat=True)), [segundo.pk])
+
+
+class PromocionesTests(TestCase):
+    """Promociones compiladas (tienda/promociones.py): un ticket completo sin consultas por línea."""
+
+    def setUp(self):
+        # La tabla compilada vive en la caché: no debe sobrevivir al rollback de la prueba
+        self.addCleanup(referencia._subir_version, 'promociones')
+        categoria = Categoria.objects.create(nombre='Bebidas')
+        self.agua = Producto.objects.create(nombre='Agua', descripcion='-', precio_venta=Decimal('10.00'), stock=50, categoria=categoria)
+        self.jugo = Producto.objects.create(nombre='Jugo', descripcion='-', precio_venta=Decimal('20.00'), stock=50, categoria=categoria)
+        self.pan = Producto.objects.create(nombre='Pan', descripcion='-', precio_venta=Decimal('5.00'), stock=50)
+        # Las señales recompilan la tabla al confirmar; aquí se ejecuta el on_commit a mano
+        with self.captureOnCommitCallbacks(execute=True):
+            Promocion.objects.create(nombre='Bebidas -10%', tipo='porcentaje', valor=Decimal('10'), categoria=categoria)
+            self.jugo_5 = Promocion.objects.create(nombre='Jugo -$5', tipo='monto', valor=Decimal('5'), producto=self.jugo)
+            self.pan_3x2 = Promocion.objects.create(nombre='Pan 3x2', tipo='lleva_paga', lleva=3, paga=2, producto=self.pan)
+            Promocion.objects.create(
+                nombre='Agua mañana', tipo='porcentaje', valor=Decimal('50'), producto=self.agua,
+                inicio=timezone.now() + timedelta(days=1),
+            )
+
+    def test_ticket_en_una_pasada_sin_consultas(self):
+        lineas = [
+            (self.agua.pk, self.agua.categoria_id, self.agua.precio_venta, 2),
+            (self.jugo.pk, self.jugo.categoria_id, self.jugo.precio_venta, 1),
+            (self.pan.pk, None, self.pan.precio_venta, 2),
+            (self.pan.pk, None, self.pan.precio_venta, 2),
+        ]
+        promociones.evaluar(lineas)  # Compila la tabla
+        with self.assertNumQueries(0):
+            resultado = promociones.evaluar(lineas)
+        categoria_10 = Promocion.objects.get(nombre='Bebidas -10%').pk
+        self.assertEqual(resultado, [
+            (categoria_10, Decimal('2.00')),  # La de mañana todavía no aplica
+            (self.jugo_5.pk, Decimal('5.00')),  # Gana el mayor descuento
+            (self.pan_3x2.pk, Decimal('5.00')),  # 4 panes en dos líneas: uno gratis
+            (None, Decimal('0.00')),
+        ])
+
+    def test_cobro_registra_la_promocion_de_cada_linea(self):
+        vendedor = User.objects.create(username='caja_promo')
+        cliente = Cliente.objects.create(nombre='Cliente', apellido='Promo', email='p@ejemplo.com', telefono='0', direccion='-')
+        reservas.reservar(self.jugo.pk, 2, vendedor)
+        reservas.reservar(self.pan.pk, 3, vendedor)
+        ventas = {venta.producto_id: venta for venta in reservas.cobrar(vendedor, cliente)}
+
+        jugo = Venta.objects.get(pk=ventas[self.jugo.pk].pk)
+        self.assertEqual((jugo.promocion_id, jugo.descuento, jugo.total), (self.jugo_5.pk, Decimal('10.00'), Decimal('30.00')))
+        pan = Venta.objects.get(pk=ventas[self.pan.pk].pk)
+        self.assertEqual((pan.promocion_id, pan.descuento, pan.total), (self.pan_3x2.pk, Decimal('5.00'), Decimal('10.00')))
+
+
+class ComprasTests(TestCase):
+    """Recepción de mercancía (tienda/compras.py): suma con F() en lotes, sin leer el stock."""
+
+    def setUp(self):
+        self.gerente = User.objects.create(username='compras_gerente')
+        self.proveedor = Proveedor.objects.create(empresa='Mayorista', nombre='Contacto')
+        self.productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Insumo {i}', descripcion='-', precio_venta=Decimal('10.00'), stock=20, proveedor=self.proveedor)
+            for i in range(150)
+        ])
+
+    def orden(self, productos, cantidad=10):
+        return compras.crear_orden(self.proveedor, {p.pk: (cantidad, Decimal('4.00')) for p in productos}, self.gerente)
+
+    def test_consultas_no_crecen_con_las_lineas(self):
+        # Hasta 140 líneas: SQLite admite 999 parámetros por consulta y bulk_create
+        # parte en varios INSERT un lote más grande (en MySQL sigue siendo uno)
+        tocar_version(Producto)  # La fila de versión ya existe, como en producción
+        numeros = []
+        for productos in (self.productos[:10], self.productos[10:150]):
+            orden = self.orden(productos)
+            with CaptureQueriesContext(connection) as ctx:
+                compras.recibir(orden.pk, {p.pk: 10 for p in productos}, self.gerente)
+            numeros.append(len(ctx.captured_queries))
+        self.assertEqual(numeros[0], numeros[1], f'10 líneas: {numeros[0]} consultas; 140 líneas: {numeros[1]}')
+
+    def test_venta_durante_la_recepcion_no_se_pierde(self):
+        orden = self.orden(self.productos[:3])
+        # El formulario de recepción se abrió con stock=20; mientras tanto se vendieron 5
+        Producto.objects.filter(pk=self.productos[0].pk).update(stock=F('stock') - 5)
+        compras.recibir(orden.pk, {p.pk: 10 for p in self.productos[:2]}, self.gerente)
+
+        stock = dict(Producto.objects.filter(pk__in=[p.pk for p in self.productos[:3]]).values_list('pk', 'stock'))
+        self.assertEqual([stock[p.pk] for p in self.productos[:3]], [25, 30, 20])
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, 'parcial')
+        self.assertEqual(MovimientoStock.objects.filter(motivo='compra').count(), 2)
+
+        compras.recibir(orden.pk, {self.productos[2].pk: 10}, self.gerente)
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, 'recibida')
+        with self.assertRaises(compras.RecepcionInvalida):
+            compras.recibir(orden.pk, {self.productos[2].pk: 1}, self.gerente)
+
+    def test_no_recibe_de_mas(self):
+        orden = self.orden(self.productos[:1], cantidad=5)
+        for cantidades in ({self.productos[0].pk: 6}, {self.productos[1].pk: 1}):
+            with self.subTest(cantidades=cantidades), self.assertRaises(compras.RecepcionInvalida):
+                compras.recibir(orden.pk, cantidades, self.gerente)
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).stock, 20)
+        self.assertEqual(OrdenCompra.objects.get(pk=orden.pk).estado, 'pendiente')
+
+
+class CacheSQLiteTests(SimpleTestCase):
+    """Caché compartida en SQLite (sistema_tienda/cache_sqlite.py)."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.ruta = f'{carpeta.name}/cache.sqlite3'
+        self.cache = SQLiteCache(self.ruta, {'OPTIONS': {'MAX_ENTRIES': 100, 'CULL_FREQUENCY': 4}})
+
+    def test_incr_atomico_entre_conexiones(self):
+        self.cache.set('version', 0)
+        otra = SQLiteCache(self.ruta, {})  # Como otro worker: su propia conexión al mismo archivo
+
+        def sumar(cache):
+            for _ in range(200):
+                cache.incr('version')
+
+        hilos = [threading.Thread(target=sumar, args=(cache,)) for cache in (self.cache, otra) * 3]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(otra.get('version'), 1200)
+        self.assertFalse(otra.add('version', 0))
+
+    def test_ttl_y_recorte_de_las_menos_usadas(self):
+        self.cache.set('breve', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('breve'))
+        self.assertTrue(self.cache.add('breve', 2))
+
+        self.cache.set('usada', 'sí')
+        self.cache.set_many({f'vieja:{i}': i for i in range(90)})
+        conexion = self.cache._conexion()
+        conexion.execute('UPDATE cache SET acceso = acceso - 60')  # Todas sin usar hace un minuto...
+        self.cache.get('usada')  # ...salvo esta
+        for i in range(60):
+            self.cache.set(f'nueva:{i}', i)
+        self.assertLessEqual(conexion.execute('SELECT COUNT(*) FROM cache').fetchone()[0], 100)
+        self.assertEqual(self.cache.get('usada'), 'sí')
+        self.assertEqual(self.cache.get('nueva:59'), 59)
+        self.assertIsNone(self.cache.get('vieja:0'))
+
+
+
+class EstaticosTests(SimpleTestCase):
+    """Estáticos servidos por sistema_tienda/estaticos.py: variante comprimida y Cache-Control."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.raiz = carpeta.name
+        for nombre, contenido in (
+            ('styles.3f2a9c1b7e4d.css', b'css'), ('styles.3f2a9c1b7e4d.css.gz', b'gz'),
+            ('styles.3f2a9c1b7e4d.css.br', b'br'), ('app.js', b'js'),
+        ):
+            with open(f'{self.raiz}/{nombre}', 'wb') as archivo:
+                archivo.write(contenido)
+        ajustes = override_settings(STATIC_ROOT=self.raiz, STATIC_URL='/static/')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.middleware = EstaticosMiddleware(lambda request: HttpResponse('siguiente', status=404))
+
+    def pedir(self, ruta, codificaciones=None):
+        cabeceras = {'HTTP_ACCEPT_ENCODING': codificaciones} if codificaciones is not None else {}
+        respuesta = self.middleware(RequestFactory().get(ruta, **cabeceras))
+        self.addCleanup(respuesta.close)
+        return respuesta
+
+    def contenido(self, respuesta):
+        return b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+
+    def test_cache_control_con_y_sin_hash(self):
+        con_hash = self.pedir('/static/styles.3f2a9c1b7e4d.css')
+        self.assertEqual(con_hash['Cache-Control'], 'public, max-age=31536000, immutable')
+        sin_hash = self.pedir('/static/app.js')
+        self.assertEqual(sin_hash['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(sin_hash['Vary'], 'Accept-Encoding')
+
+    def test_elige_la_codificacion_segun_q(self):
+        casos = (
+            ('gzip, deflate, br', 'br', b'br'),
+            ('gzip', 'gzip', b'gz'),
+            ('br;q=0, gzip', 'gzip', b'gz'),
+            ('br;q=0.5, gzip;q=0.8', 'gzip', b'gz'),
+            ('gzip;q=0, br;q=0', None, b'css'),
+            ('*', 'br', b'br'),
+            ('*;q=0, gzip', 'gzip', b'gz'),
+            ('identity', None, b'css'),
+            ('', None, b'css'),
+        )
+        for cabecera, esperada, contenido in casos:
+            with self.subTest(cabecera=cabecera):
+                respuesta = self.pedir('/static/styles.3f2a9c1b7e4d.css', cabecera)
+                self.assertEqual(respuesta.get('Content-Encoding'), esperada)
+                self.assertEqual(self.contenido(respuesta), contenido)
+
+    def test_sin_variante_se_sirve_el_original(self):
+        respuesta = self.pedir('/static/app.js', 'br, gzip')
+        self.assertNotIn('Content-Encoding', respuesta)
+        self.assertEqual(self.contenido(respuesta), b'js')
+
+    def test_lo_que_no_existe_sigue_su_camino(self):
+        for ruta in ('/static/no-existe.css', '/static/../secreto.txt', '/otra/app.js'):
+            with self.subTest(ruta=ruta):
+                self.assertEqual(self.contenido(self.pedir(ruta, 'gzip')), b'siguiente')
+
+
+@override_settings(TIENDA_PBKDF2_ITERACIONES=1000)  # Costo bajo: las pruebas no miden el hash
+class ContrasenasTests(TestCase):
+    """Hash de contraseñas (sistema_tienda/hashers.py y login_view)."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero_hash', password='Temporada2026!')
+        PerfilUsuario.objects.create(user=self.usuario, rol='vendedor')
+
+    def entrar(self):
+        respuesta = self.client.post(reverse('tienda:login'), {'username': 'cajero_hash', 'password': 'Temporada2026!'})
+        self.assertRedirects(respuesta, reverse('tienda:home'), fetch_redirect_response=False)
+
+    def test_un_login_calcula_el_hash_una_sola_vez(self):
+        hash_anterior = self.usuario.password
+        with mock.patch.object(
+            PBKDF2TiendaHasher, 'verify', autospec=True, side_effect=PBKDF2TiendaHasher.verify,
+        ) as verificaciones:
+            self.entrar()
+        self.assertEqual(verificaciones.call_count, 1)
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.password, hash_anterior, 'Con la política vigente no se debe re-hashear')
+
+    def test_se_rehashea_al_cambiar_las_iteraciones(self):
+        self.assertTrue(self.usuario.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(TIENDA_PBKDF2_ITERACIONES=1200):
+            self.entrar()
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('pbkdf2_sha256$1200$'))
+        self.assertTrue(self.usuario.check_password('Temporada2026!'))
+
+
+@override_settings(STORAGES=SIN_COLLECTSTATIC)
+class PerfiladorTests(TestCase):
+    """Perfilado bajo demanda (sistema_tienda/perfilador.py): solo superusuarios y con límite de archivos."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = carpeta.name
+        ajustes = override_settings(TIENDA_PERFILES_DIR=self.carpeta, TIENDA_PERFILES_MAX=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.gerente = User.objects.create(username='perfil_gerente')
+        PerfilUsuario.objects.create(user=self.gerente, rol='gerente')
+        self.root = User.objects.create(username='perfil_root', is_superuser=True, is_staff=True)
+        PerfilUsuario.objects.create(user=self.root, rol='administrador')
+
+    def perfiles(self):
+        return sorted(archivo for archivo in os.listdir(self.carpeta) if archivo.endswith('.json'))
+
+    def test_un_usuario_normal_no_se_perfila(self):
+        self.client.force_login(self.gerente)
+        respuesta = self.client.get(reverse('tienda:home'), {'perfilar': '1'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('X-Perfil', respuesta)
+        self.assertNotIn('Server-Timing', respuesta)
+        self.assertEqual(os.listdir(self.carpeta), [])
+
+    def test_un_superusuario_recibe_los_encabezados(self):
+        self.client.force_login(self.root)
+        respuesta = self.client.get(reverse('tienda:home'), {'perfilar': '1'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('sql;dur=', respuesta['Server-Timing'])
+        nombre = respuesta['X-Perfil']
+        self.assertTrue(os.path.isfile(os.path.join(self.carpeta, nombre + '.pstats')))
+        with open(os.path.join(self.carpeta, nombre + '.json'), encoding='utf-8') as archivo:
+            resumen = json.load(archivo)
+        self.assertEqual(resumen['usuario'], 'perfil_root')
+        self.assertGreater(resumen['sql_consultas'], 0)
+
+    def test_se_conservan_solo_los_mas_recientes(self):
+        self.client.force_login(self.root)
+        nombres = [
+            self.client.get(reverse('tienda:home'), HTTP_X_PERFILAR='1')['X-Perfil']
+            for _ in range(3)
+        ]
+        self.assertEqual(self.perfiles(), [nombre + '.json' for nombre in nombres[1:]])
+        self.assertFalse(os.path.exists(os.path.join(self.carpeta, nombres[0] + '.pstats')))
+
+
+@override_settings(TIENDA_DETECTOR_MUESTREO=1.0, TIENDA_DETECTOR_REPETICIONES=3, TIENDA_CONSULTA_LENTA_MS=0)
+class DetectorSQLTests(TestCase):
+    """Detector de N+1 (sistema_tienda/detector_sql.py)."""
+
+    def setUp(self):
+        for nombre in ('Pan', 'Leche', 'Huevo'):
+            Categoria.objects.create(nombre=nombre)
+
+    def pedir(self, vista):
+        return DetectorConsultasMiddleware(vista)(RequestFactory().get('/reporte/'))
+
+    def test_una_forma_repetida_se_avisa(self):
+        def vista(request):
+            for pk in Categoria.objects.values_list('pk', flat=True):
+                Categoria.objects.get(pk=pk)  # Una consulta por fila
+            return HttpResponse('ok')
+
+        with self.assertLogs('tienda.sql.n_mas_1', level='WARNING') as registro:
+            self.pedir(vista)
+        self.assertEqual(len(registro.output), 1)
+        self.assertIn('GET /reporte/: 3 consultas', registro.output[0])
+        self.assertIn('tienda/tests.py', registro.output[0])
+
+    def test_listas_in_de_distinto_largo_son_la_misma_forma(self):
+        def vista(request):
+            for largo in (1, 2, 3):
+                list(Categoria.objects.filter(pk__in=range(largo)))
+            return HttpResponse('ok')
+
+        with self.assertLogs('tienda.sql.n_mas_1', level='WARNING'):
+            self.pedir(vista)
+
+    def test_consultas_distintas_no_se_avisan(self):
+        def vista(request):
+            Categoria.objects.count()
+            list(Categoria.objects.all())
+            Categoria.objects.filter(nombre='Pan').exists()
+            return HttpResponse('ok')
+
+        with self.assertNoLogs('tienda.sql.n_mas_1', level='WARNING'):
+            self.pedir(vista)
+
+def _modelo_en_otro_proceso():
+    """Se ejecuta en un proceso del pool: necesita Django configurado por el initializer."""
+    return Tarea._meta.label
+
+
+class ColaTareasTests(TransactionTestCase):
+    """Cola de tareas (tienda/tareas.py y el comando worker): cada tarea se ejecuta una sola vez."""
+
+    def test_dos_workers_no_reclaman_la_misma_tarea(self):
+        for _ in range(20):
+            tareas.encolar('exportar_productos')
+        reclamadas, errores = [], []
+        salida = threading.Barrier(4)
+
+        def worker():
+            try:
+                salida.wait()
+                # SQLite en memoria responde 'table is locked' en vez de esperar: se reintenta.
+                # De una en una, para que un reintento no pierda tareas ya reclamadas
+                while True:
+                    nuevas = reservas._reintentar(lambda: tareas.reclamar_pendientes(1))
+                    reclamadas.extend(nuevas)
+                    if not nuevas and not reservas._reintentar(Tarea.objects.filter(estado='pendiente').exists):
+                        break
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=worker) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(sorted(reclamadas), sorted(set(reclamadas)), 'Una tarea se reclamó dos veces')
+        self.assertEqual(len(reclamadas), 20)
+        self.assertFalse(Tarea.objects.filter(estado='pendiente').exists())
+
+    def test_el_pool_de_procesos_arranca_con_spawn(self):
+        # Con 'spawn' el hijo no hereda nada: el initializer debe configurar Django
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto, initializer=iniciar_proceso) as pool:
+            self.assertEqual(pool.submit(_modelo_en_otro_proceso).result(timeout=60), 'tienda.Tarea')
+
+    def test_una_tarea_rota_no_detiene_al_worker(self):
+        Producto.objects.create(nombre='Exportable', descripcion='-', precio_venta=Decimal('1.00'), stock=1)
+        rota = Tarea.objects.create(tipo='ya_no_existe', parametros={})  # Falla fuera del try de la tarea
+        buena = tareas.encolar('exportar_productos')
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('worker', '--una-vez', '--hilos', '1', '--intervalo', '0.1', stdout=salida, stderr=errores)
+
+        rota.refresh_from_db()
+        buena.refresh_from_db()
+        self.assertEqual(rota.estado, 'error')
+        self.assertIn('KeyError', rota.error)
+        self.assertEqual(buena.estado, 'terminada')
+        self.assertIn(b'Exportable', buena.resultado)
+        self.assertIn(f'Tarea #{rota.pk} falló', errores.getvalue())
+
+
+class CodigoBarrasTests(TestCase):
+    """Código de barras de los productos y el endpoint del lector (producto_escanear)."""
+
+    def setUp(self):
+        # El mapa de códigos vive en la caché: no debe sobrevivir al rollback de la prueba
+        self.addCleanup(referencia._subir_version, 'codigos')
+        self.addCleanup(auditoria.bufer.vaciar)  # Dentro de la transacción de la prueba
+        self.gerente = User.objects.create(username='codigo_gerente')
+        PerfilUsuario.objects.create(user=self.gerente, rol='gerente')
+        self.producto = Producto.objects.create(nombre='Leche', codigo='7501', descripcion='-', precio_venta=Decimal('20.00'), stock=8)
+
+    def formulario(self, codigo):
+        return ProductoForm({'nombre': 'Leche nueva', 'codigo': codigo, 'descripcion': '-', 'precio_venta': '21.00', 'stock': 3, 'activo': True})
+
+    def escanear(self, codigo):
+        self.client.force_login(self.gerente)
+        return self.client.get(reverse('tienda:producto_escanear'), {'codigo': codigo})
+
+    def test_codigo_repetido_no_pasa_el_formulario(self):
+        self.assertFalse(self.formulario('7501').is_valid())
+
+    def test_eliminar_libera_el_codigo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            eliminacion.eliminar(self.producto, self.gerente)
+        formulario = self.formulario('7501')
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        nuevo = formulario.save()  # Antes: IntegrityError (la fila eliminada conservaba el código)
+        self.assertEqual(Producto.todos.get(pk=self.producto.pk).codigo, None)
+        self.assertEqual(self.escanear('7501').json()['id'], nuevo.pk)
+
+    def test_escanear(self):
+        respuesta = self.escanear('7501')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), {'id': self.producto.pk, 'nombre': 'Leche', 'precio_venta': '20.00', 'stock': 8, 'activo': True})
+        self.assertEqual(self.escanear('0000').status_code, 404)
+        self.assertEqual(self.escanear(' ').status_code, 400)
+
+    def test_escanear_con_mapa_atrasado(self):
+        referencia.codigos()  # El mapa ya conoce '7501'
+        Producto.objects.filter(pk=self.producto.pk).update(codigo='7502')  # Sin invalidar la caché
+        self.assertEqual(self.escanear('7501').status_code, 404, 'El mapa atrasado no debe devolver el producto')
+        self.assertEqual(self.escanear('7502').json()['id'], self.producto.pk)
+
+
+class BitacoraStockTests(TransactionTestCase):
+    """Bitácora de stock (tienda/inventario.py): saldo a una fecha, snapshots y reconciliación."""
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.admin = User.objects.create(username='bitacora_admin')
+        PerfilUsuario.objects.create(user=self.admin, rol='administrador')
+        self.productos = []
+        for nombre in ('Arroz', 'Frijol', 'Azúcar'):
+            producto = Producto.objects.create(nombre=nombre, descripcion='-', precio_venta=Decimal('10.00'), stock=10)
+            registrar_movimiento(producto, 10, 'alta')
+            self.productos.append(producto)
+
+    def mover(self, producto, cantidad, dias):
+        """Movimiento fechado hace 'dias' días (con su efecto en el stock)."""
+        Producto.todos.filter(pk=producto.pk).update(stock=F('stock') + cantidad)
+        movimiento = registrar_movimiento(producto, cantidad, 'edicion')
+        MovimientoStock.objects.filter(pk=movimiento.pk).update(fecha=timezone.now() - timedelta(days=dias))
+
+    def test_saldo_a_una_fecha_con_snapshot(self):
+        arroz = self.productos[0]
+        MovimientoStock.objects.update(fecha=timezone.now() - timedelta(days=10))
+        self.mover(arroz, -3, dias=5)
+        call_command('snapshot_stock', stdout=io.StringIO())
+        self.mover(arroz, 4, dias=0)
+
+        self.assertEqual(inventario.stock_en_fecha(arroz, timezone.now() - timedelta(days=7)), 10)
+        self.assertEqual(inventario.stock_en_fecha(arroz, timezone.now() - timedelta(days=1)), 7)
+        self.assertEqual(inventario.saldos_en_fecha([p.pk for p in self.productos]), {
+            self.productos[0].pk: 11, self.productos[1].pk: 10, self.productos[2].pk: 10,
+        })
+
+    def test_productos_eliminados_no_rompen_los_saldos(self):
+        arroz, frijol, _ = self.productos
+        eliminacion.eliminar(arroz)
+        self.assertEqual(inventario.saldos_en_fecha([arroz.pk]), {arroz.pk: 0})
+        saldos = inventario.saldos_en_fecha([arroz.pk, frijol.pk, 999999])
+        self.assertEqual(saldos, {arroz.pk: 0, frijol.pk: 10})
+
+        salida = io.StringIO()
+        call_command('snapshot_stock', stdout=salida)
+        call_command('reconciliar_stock', '--hilos', '2', '--lote', '1', stdout=salida)
+        self.assertIn('coincide', salida.getvalue())
+
+    def test_reconciliar_corrige_la_diferencia(self):
+        Producto.objects.filter(pk=self.productos[1].pk).update(stock=15)  # Cambio sin bitácora
+        salida = io.StringIO()
+        call_command('reconciliar_stock', '--corregir', stdout=salida)
+        self.assertIn('diferencia +5', salida.getvalue())
+        self.assertEqual(inventario.stock_en_fecha(self.productos[1]), 15)
+
+    def test_el_snapshot_no_pierde_movimientos_en_curso(self):
+        arroz = self.productos[0]
+        call_command('snapshot_stock', stdout=io.StringIO())
+        # Venta que tomó su fecha antes del snapshot pero confirmó después
+        self.mover(arroz, -4, dias=0)
+        MovimientoStock.objects.filter(motivo='edicion').update(fecha=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(inventario.stock_en_fecha(arroz), 6)
+        call_command('snapshot_stock', '--margen', '0', stdout=io.StringIO())
+        self.assertEqual(inventario.stock_en_fecha(arroz), 6)
+
+    def test_reconciliar_con_una_venta_concurrente(self):
+        arroz = self.productos[0]
+
+        def vender():
+            def venta():
+                with transaction.atomic():
+                    Producto.objects.filter(pk=arroz.pk).update(stock=F('stock') - 2)
+                    movimiento = registrar_movimiento(arroz, -2, 'venta')
+                    # La venta empezó (y fechó su movimiento) antes que la reconciliación
+                    MovimientoStock.objects.filter(pk=movimiento.pk).update(fecha=inicio)
+            try:
+                while True:
+                    try:
+                        return reservas._reintentar(venta)
+                    except OperationalError:
+                        time.sleep(0.05)  # SQLite: la reconciliación todavía tiene la tabla
+            finally:
+                connection.close()
+
+        inicio = timezone.now()
+        hilo = threading.Thread(target=vender)
+        saldos_reales = inventario.saldos_en_fecha
+
+        def saldos_con_venta(ids, fecha=None):
+            # Otra caja vende entre la lectura del stock y la de la bitácora
+            hilo.start()
+            hilo.join(timeout=0.3)
+            return saldos_reales(ids, fecha)
+
+        salida = io.StringIO()
+        with mock.patch('tienda.management.commands.reconciliar_stock.saldos_en_fecha', saldos_con_venta):
+            call_command('reconciliar_stock', '--hilos', '1', '--corregir', stdout=salida)
+        hilo.join()
+        self.assertIn('coincide', salida.getvalue())
+        self.assertFalse(MovimientoStock.objects.filter(motivo='reconciliacion').exists())
+        self.assertEqual(Producto.objects.get(pk=arroz.pk).stock, 8)
+        self.assertEqual(inventario.stock_en_fecha(arroz), 8)
+
+    def test_eliminar_venta_suma_en_la_base(self):
+        arroz = self.productos[0]
+        cliente = Cliente.objects.create(nombre='Ana', apellido='B', email='ana@ejemplo.com', telefono='0', direccion='-')
+        venta = Venta.objects.create(cliente=cliente, vendedor=self.admin, producto=arroz, cantidad=2, precio_unitario=Decimal('10.00'), total=Decimal('20.00'))
+        self.mover(arroz, -2, dias=0)
+        self.client.force_login(self.admin)
+        # Otra caja vende 3: la devolución suma sobre el stock de la base, no sobre uno leído antes
+        Producto.objects.filter(pk=arroz.pk).update(stock=F('stock') - 3)
+        registrar_movimiento(arroz, -3, 'venta')
+        respuesta = self.client.post(reverse('tienda:venta_eliminar', args=[venta.pk]))
+        self.assertRedirects(respuesta, reverse('tienda:venta_lista'), fetch_redirect_response=False)
+        self.assertFalse(Venta.objects.filter(pk=venta.pk).exists())
+
+        self.assertEqual(Producto.objects.get(pk=arroz.pk).stock, 7)
+        self.assertEqual(inventario.stock_en_fecha(arroz), 7)
+
+    def test_admin_no_cambia_el_stock_sin_bitacora(self):
+        modelo_admin = admin.site._registry[Producto]
+        self.assertNotIn('stock', modelo_admin.list_editable)
+        self.assertEqual(modelo_admin.get_readonly_fields(None, self.productos[0]), ('stock',))
+
+
+class VersionesTests(TransactionTestCase):
+    """Versiones por modelo (tienda/versiones.py): la fila de versión no se bloquea durante una venta."""
+
+    def test_la_version_sube_al_confirmar(self):
+        antes = versiones.versiones(Venta)['tienda.venta'][0]
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx:
+                versiones.tocar_version(Venta, Producto)
+            self.assertEqual(ctx.captured_queries, [], 'La versión no debe escribirse dentro de la transacción')
+        self.assertEqual(versiones.versiones(Venta)['tienda.venta'][0], antes + 1)
+
+    def test_una_transaccion_revertida_no_sube_la_version(self):
+        antes = versiones.versiones(Producto)['tienda.producto'][0]
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            Producto.objects.create(nombre='Revertido', descripcion='-', precio_venta=Decimal('1.00'), stock=1)
+            1 / 0
+        self.assertEqual(versiones.versiones(Producto)['tienda.producto'][0], antes)
+
+
+class ExistenciasSucursalTests(TransactionTestCase):
+    """Existencias por sucursal (tienda/sucursales.py): los ajustes masivos no pisan las ventas."""
+
+    HILOS = 4
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.sucursal = Sucursal.objects.create(codigo='centro', nombre='Centro')
+        self.productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Surtido {i}', descripcion='-', precio_venta=Decimal('10.00'), stock=30) for i in range(40)
+        ])
+
+    def existencias(self):
+        return existencias(self.sucursal.pk, [p.pk for p in self.productos])
+
+    def test_asignar_stock_inicial(self):
+        salida = io.StringIO()
+        call_command('asignar_stock_sucursal', 'centro', '--lote', '15', stdout=salida)
+        Producto.objects.filter(pk=self.productos[0].pk).update(stock=12)
+        call_command('asignar_stock_sucursal', 'centro', stdout=salida)  # Reemplaza la existencia
+        existencias_ = self.existencias()
+        self.assertEqual(existencias_[self.productos[0].pk], 12)
+        self.assertEqual(existencias_[self.productos[1].pk], 30)
+
+    def test_asignar_sube_la_version_y_no_pisa_otras_sucursales(self):
+        tocar_version(Producto)  # Crea la fila de versión
+        antes = versiones.versiones(Producto)['tienda.producto'][0]
+        call_command('asignar_stock_sucursal', 'centro', stdout=io.StringIO())
+        self.assertEqual(versiones.versiones(Producto)['tienda.producto'][0], antes + 1, 'El ETag de la lista no cambió')
+
+        Sucursal.objects.create(codigo='norte', nombre='Norte')
+        with self.assertRaisesMessage(CommandError, 'Otras sucursales ya tienen existencias'):
+            call_command('asignar_stock_sucursal', 'norte', stdout=io.StringIO())
+
+    def test_ajuste_no_baja_de_cero_y_queda_en_la_bitacora(self):
+        call_command('asignar_stock_sucursal', 'centro', stdout=io.StringIO())
+        cambiados = ajustar_existencias(self.sucursal.pk, Producto.objects.filter(pk=self.productos[0].pk), -50, lote=7)
+        self.assertEqual(cambiados, 1)
+        self.assertEqual(self.existencias()[self.productos[0].pk], 0)
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).stock, 0)
+        self.assertEqual(list(MovimientoStock.objects.values_list('cantidad', flat=True)), [-30])
+
+    def test_ajuste_con_ventas_simultaneas(self):
+        call_command('asignar_stock_sucursal', 'centro', stdout=io.StringIO())
+        vendidas, errores = Counter(), []
+        salida = threading.Barrier(self.HILOS + 1)
+
+        def caja():
+            try:
+                salida.wait()
+                for producto in self.productos:
+                    # SQLite en memoria responde 'table is locked' en vez de esperar: se reintenta
+                    if reservas._reintentar(lambda: descontar_existencias(self.sucursal.pk, producto.pk, 1)):
+                        vendidas[producto.pk] += 1
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=caja) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        salida.wait()
+        for _ in range(5):
+            # Un solo lote (una transacción): reintentarlo completo no suma dos veces
+            reservas._reintentar(lambda: ajustar_existencias(self.sucursal.pk, Producto.objects.all(), 2, lote=50))
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        ajustes = Counter()
+        for pk, cantidad in MovimientoStock.objects.filter(motivo='ajuste_masivo').values_list('producto_id', 'cantidad'):
+            ajustes[pk] += cantidad
+        for pk, stock in self.existencias().items():
+            self.assertEqual(stock, 30 + ajustes[pk] - vendidas[pk], f'Producto #{pk}: la bitácora no cuadra con la sucursal')
+
+
+class EnVivoTests(TransactionTestCase):
+    """Dashboard en vivo (tienda/en_vivo.py): un sondeo por proceso repartido a todas las conexiones."""
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.gerente = User.objects.create(username='vivo_gerente')
+        PerfilUsuario.objects.create(user=self.gerente, rol='gerente')
+        self.vendedor = User.objects.create(username='vivo_vendedor')
+        PerfilUsuario.objects.create(user=self.vendedor, rol='vendedor')
+
+    def vaciar(self, suscriptor):
+        mensajes = []
+        while not suscriptor.cola.empty():
+            mensajes.append(suscriptor.cola.get_nowait())
+        return mensajes
+
+    def test_reparte_a_cada_conexion_lo_de_su_sucursal(self):
+        ventas = [{'id': 1, 'sucursal_id': 1}, {'id': 2, 'sucursal_id': 2}]
+        totales = {
+            1: {'total_dia': Decimal('10'), 'cantidad_dia': 1, 'historico': 4},
+            2: {'total_dia': Decimal('30'), 'cantidad_dia': 1, 'historico': 6},
+        }
+
+        async def escenario():
+            difusor = en_vivo.Difusor()
+            centro, norte, cajero, todas = (
+                difusor.suscribir(1, True), difusor.suscribir(2, True), difusor.suscribir(1, False), difusor.suscribir(None, True),
+            )
+            difusor.repartir(ventas, totales)
+            recibidos = [self.vaciar(s) for s in (centro, norte, cajero, todas)]
+            for suscriptor in (centro, norte, cajero, todas):
+                difusor.desuscribir(suscriptor)
+            await asyncio.wait_for(difusor._tarea, 5)
+            return recibidos
+
+        with mock.patch.object(en_vivo, 'leer_cambios', return_value=None):
+            centro, norte, cajero, todas = asyncio.run(escenario())
+        self.assertEqual(centro, [en_vivo.evento('venta', ventas[0]), en_vivo._mensaje_totales(totales, 1, True)])
+        self.assertEqual(norte, [en_vivo.evento('venta', ventas[1]), en_vivo._mensaje_totales(totales, 2, True)])
+        self.assertEqual(cajero, [en_vivo.evento('totales', {'total_ventas': 4})])
+        self.assertEqual(len(todas), 3)
+        self.assertIn('"total_ventas": 10', todas[-1])
+
+    def test_una_conexion_que_se_cierra_deja_de_recibir(self):
+        async def escenario():
+            difusor = en_vivo.Difusor()
+            with mock.patch.object(en_vivo, 'difusor', difusor):
+                flujo = en_vivo.flujo(None, True)
+                self.assertEqual(await flujo.__anext__(), f'retry: {en_vivo.REINTENTO_MS}\n\n')
+                self.assertEqual(len(difusor.suscriptores), 1)
+                await flujo.aclose()  # El navegador cerró la pestaña
+                self.assertEqual(difusor.suscriptores, set())
+                await asyncio.wait_for(difusor._tarea, 5)  # Sin conexiones, el sondeo termina
+
+                # Una conexión que no lee se desconecta al llenarse su cola
+                lenta = difusor.suscribir(None, True)
+                for _ in range(en_vivo.TAMANO_COLA + 1):
+                    difusor.repartir([], {})
+                self.assertNotIn(lenta, difusor.suscriptores)
+                self.assertIsNone(self.vaciar(lenta)[-1])
+                await asyncio.wait_for(difusor._tarea, 5)
+
+        with mock.patch.object(en_vivo, 'leer_cambios', return_value=None):
+            asyncio.run(escenario())
+
+    def test_bajo_wsgi_responde_un_solo_evento(self):
+        self.client.force_login(self.vendedor)
+        respuesta = self.client.get(reverse('tienda:ventas_eventos'))
+        contenido = respuesta.content.decode()
+        self.assertTrue(contenido.startswith(f'retry: {en_vivo.REINTENTO_WSGI_MS}\n\n'))
+        self.assertEqual(contenido.count('event: '), 1)
+        self.assertIn('event: totales\ndata: {"total_ventas": 0}', contenido)
+        self.assertEqual(respuesta['Cache-Control'], 'no-cache')
+
+    @override_settings(TIENDA_EN_VIVO_INTERVALO=0.05)
+    def test_el_flujo_envia_una_venta_nueva(self):
+        cliente = Cliente.objects.create(nombre='Eva', apellido='V', email='eva@ejemplo.com', telefono='0', direccion='-')
+        producto = Producto.objects.create(nombre='Pera', descripcion='-', precio_venta=Decimal('4.00'), stock=10)
+
+        def vender():
+            try:
+                return Venta.objects.create(
+                    cliente=cliente, vendedor=self.gerente, producto=producto, cantidad=3,
+                    precio_unitario=Decimal('4.00'), total=Decimal('12.00'),
+                )
+            finally:
+                connection.close()
+
+        async def siguiente(flujo, tipo):
+            while True:
+                mensaje = await asyncio.wait_for(flujo.__anext__(), 5)
+                if mensaje.startswith(f'event: {tipo}'):
+                    return json.loads(mensaje.split('data: ', 1)[1])
+
+        async def escenario():
+            flujo = en_vivo.flujo(None, True)
+            try:
+                inicial = await siguiente(flujo, 'totales')
+                venta = await sync_to_async(vender)()
+                enviada = await siguiente(flujo, 'venta')
+                despues = await siguiente(flujo, 'totales')
+            finally:
+                await flujo.aclose()
+            return inicial, venta, enviada, despues
+
+        inicial, venta, enviada, despues = asyncio.run(escenario())
+        self.assertEqual(inicial['total_ventas'], 0)
+        self.assertEqual((enviada['id'], enviada['producto'], enviada['cantidad']), (venta.pk, 'Pera', 3))
+        self.assertEqual((despues['total_ventas'], despues['cantidad_dia'], despues['total_dia']), (1, 1, '12.00'))
+        self.assertEqual(en_vivo.difusor.suscriptores, set())
+
+
+class ReferenciaTests(TestCase):
+    """Caché de datos de referencia (tienda/referencia.py): versiones por conjunto y LRU con TTL."""
+
+    def setUp(self):
+        referencia._local.clear()
+        self.addCleanup(referencia._local.clear)
+        self.addCleanup(referencia._subir_version, 'categorias', 'productos', 'codigos', 'producto')
+        self.categoria = Categoria.objects.create(nombre='Bebidas')
+        self.producto = Producto.objects.create(nombre='Agua', descripcion='-', precio_venta=Decimal('10.00'), stock=20)
+
+    def opciones(self, form, campo):
+        return [etiqueta for valor, etiqueta in form.fields[campo].choices if valor != '']
+
+    def test_guardar_sube_la_version_y_el_form_ve_la_nueva_opcion(self):
+        self.assertEqual(self.opciones(ProductoForm(), 'categoria'), ['Bebidas'])
+        version = referencia._version('categorias')
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Abarrotes')
+        self.assertEqual(referencia._version('categorias'), version + 1)
+        with self.assertNumQueries(1):  # Solo recarga las categorías (los proveedores siguen en caché)
+            self.assertEqual(self.opciones(ProductoForm(), 'categoria'), ['Abarrotes', 'Bebidas'])
+
+    def test_update_con_invalidar_tambien_refresca(self):
+        self.assertEqual(self.opciones(ReservaForm(), 'producto'), ['Agua'])
+        Producto.objects.filter(pk=self.producto.pk).update(nombre='Agua mineral')  # Sin señales
+        self.assertEqual(self.opciones(ReservaForm(), 'producto'), ['Agua'], 'update() solo no invalida')
+        with self.captureOnCommitCallbacks(execute=True):
+            referencia.invalidar('productos')
+        self.assertEqual(self.opciones(ReservaForm(), 'producto'), ['Agua mineral'])
+
+    def test_olvidar_producto(self):
+        self.assertEqual(referencia.producto(self.producto.pk)['stock'], 20)
+        Producto.objects.filter(pk=self.producto.pk).update(stock=F('stock') - 5)
+        self.assertEqual(referencia.producto(self.producto.pk)['stock'], 20, 'La foto sigue en caché')
+        with self.captureOnCommitCallbacks(execute=True):
+            referencia.olvidar_producto(self.producto.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(referencia.producto(self.producto.pk)['stock'], 15)
+
+    def test_el_campo_del_producto_ve_el_precio_tras_un_ajuste_masivo(self):
+        campo = ReservaForm().fields['producto']
+        self.assertEqual(campo.to_python(str(self.producto.pk)).precio_venta, Decimal('10.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            ajustar_productos(Producto.objects.filter(pk=self.producto.pk), tipo_precio='porcentaje', valor_precio=10)
+        with self.assertNumQueries(1):
+            self.assertEqual(campo.to_python(str(self.producto.pk)).precio_venta, Decimal('11.00'))
+
+    def test_otro_proceso_lo_ve_al_vencer_el_ttl(self):
+        with mock.patch.object(referencia, '_local', referencia.LRU(100, 0.05)):
+            self.assertEqual(referencia.categorias(), [(self.categoria.pk, 'Bebidas')])
+            # Otro proceso renombra la categoría y sube la versión en la caché compartida
+            Categoria.objects.filter(pk=self.categoria.pk).update(nombre='Refrescos')
+            cache.incr('referencia:version:categorias')
+            self.assertEqual(referencia.categorias(), [(self.categoria.pk, 'Bebidas')], 'Aún dentro del TTL')
+            time.sleep(0.06)
+            self.assertEqual(referencia.categorias(), [(self.categoria.pk, 'Refrescos')])
+
+    def test_lru_acotado(self):
+        lru = referencia.LRU(2, 30)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')  # 'b' queda como la menos usada
+        lru.set('c', 3)
+        self.assertIs(lru.get('b'), referencia._FALTA)
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+
+
+@override_settings(STORAGES=SIN_COLLECTSTATIC)
+class HistorialVentasTests(TestCase):
+    """Historial plano de ventas (tienda/historial.py): siempre igual a Venta."""
+
+    CAMPOS = ('id', 'sucursal_id', 'fecha_venta', 'producto_id', 'cliente_id', 'vendedor_id', 'cantidad', 'precio_unitario', 'total')
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.gerente = User.objects.create(username='hist_gerente')
+        PerfilUsuario.objects.create(user=self.gerente, rol='gerente')
+        self.cliente = Cliente.objects.create(nombre='Olga', apellido='P', email='olga@ejemplo.com', telefono='0', direccion='-')
+        self.producto = Producto.objects.create(nombre='Miel', descripcion='-', precio_venta=Decimal('8.00'), stock=100)
+
+    def venta(self, cantidad=1, vendedor=True):
+        return Venta(
+            cliente=self.cliente, vendedor=self.gerente if vendedor else None, producto=self.producto, cantidad=cantidad,
+            precio_unitario=Decimal('8.00'), total=Decimal('8.00') * cantidad,
+        )
+
+    def assertHistorialIgualAVentas(self):
+        self.assertEqual(
+            list(VentaHistorial.objects.order_by('pk').values_list(*self.CAMPOS)),
+            list(Venta.objects.order_by('pk').values_list(*self.CAMPOS)),
+        )
+
+    def test_crear_editar_y_borrar(self):
+        venta = self.venta(2)
+        venta.save()
+        sin_vendedor = self.venta(vendedor=False)
+        sin_vendedor.save()
+        self.assertHistorialIgualAVentas()
+        fila = VentaHistorial.objects.get(pk=venta.pk)
+        self.assertEqual((fila.producto_nombre, fila.cliente_nombre, fila.vendedor_username), ('Miel', 'Olga P', 'hist_gerente'))
+        self.assertEqual(VentaHistorial.objects.get(pk=sin_vendedor.pk).vendedor_username, '')
+
+        venta.cantidad, venta.total = 3, Decimal('24.00')
+        venta.save()
+        self.assertHistorialIgualAVentas()
+
+        venta.delete()
+        self.assertFalse(VentaHistorial.objects.filter(pk=venta.pk).exists())
+        self.assertHistorialIgualAVentas()
+
+    def test_los_nombres_quedan_como_al_vender(self):
+        venta = self.venta()
+        venta.save()
+        Producto.objects.filter(pk=self.producto.pk).update(nombre='Miel de abeja')
+        self.assertEqual(VentaHistorial.objects.get(pk=venta.pk).producto_nombre, 'Miel')
+
+    def test_reconstruir(self):
+        Venta.objects.bulk_create([self.venta(i) for i in range(1, 6)])  # Sin señales: sin historial
+        self.venta().save()
+        self.assertEqual(VentaHistorial.objects.count(), 1)
+
+        self.assertEqual(historial.reconstruir(lote=2), {'default': 6})
+        self.assertHistorialIgualAVentas()
+        self.assertEqual(set(VentaHistorial.objects.values_list('producto_nombre', 'cliente_nombre')), {('Miel', 'Olga P')})
+
+        # Por base, desde el comando
+        VentaHistorial.objects.filter(pk__in=Venta.objects.values('pk')[:3]).delete()
+        salida = io.StringIO()
+        call_command('reconstruir_historial', '--base', 'default', '--lote', '4', stdout=salida)
+        self.assertIn('default: 6 venta(s)', salida.getvalue())
+        self.assertHistorialIgualAVentas()
+
+    def test_los_reportes_leen_el_historial(self):
+        for cantidad in range(1, 13):
+            self.venta(cantidad).save()
+        self.client.force_login(self.gerente)
+        sucursales()  # Como en PresupuestoConsultasTests: sucursales y opciones ya en memoria
+        referencia.categorias(), referencia.proveedores(), referencia.productos()
+        referencia.codigos(), referencia.promociones()
+        for nombre in ('venta_lista', 'reporte_ventas'):
+            presupuesto = PRESUPUESTOS[nombre][ROLES.index('gerente')]
+            with self.subTest(vista=nombre):
+                with CaptureQueriesContext(connection) as ctx:
+                    respuesta = self.client.get(reverse(f'tienda:{nombre}'))
+                self.assertEqual(respuesta.status_code, 200)
+                if len(ctx) > presupuesto:
+                    self.fail(f'{nombre}: ' + explicar_exceso(ctx.captured_queries, presupuesto))
+                tablas = ' '.join(consulta['sql'] for consulta in ctx.captured_queries)
+                self.assertIn('"tienda_ventahistorial"', tablas)
+                self.assertNotIn('"tienda_venta"', tablas, 'El reporte no debe leer la tabla de ventas')
+        self.assertEqual(respuesta.context['cantidad_ventas'], 12)
+        self.assertEqual(respuesta.context['total_ventas_dia'], Decimal('8.00') * 78)
+
+
+class RankingTests(TestCase):
+    """Ranking de vendedores (tienda/ranking.py): cubetas en caché con actualización incremental."""
+
+    def setUp(self):
+        ranking.invalidar()  # Cubetas nuevas para esta prueba
+        self.addCleanup(ranking.invalidar)
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.cliente = Cliente.objects.create(nombre='Rita', apellido='S', email='rita@ejemplo.com', telefono='0', direccion='-')
+        self.producto = Producto.objects.create(nombre='Cafe', descripcion='-', precio_venta=Decimal('10.00'), stock=100)
+        self.ana, self.beto, self.caro = (User.objects.create(username=nombre) for nombre in ('ana', 'beto', 'caro'))
+
+    def vender(self, vendedor, total):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Venta.objects.create(
+                cliente=self.cliente, vendedor=vendedor, producto=self.producto, cantidad=1,
+                precio_unitario=Decimal(total), total=Decimal(total),
+            )
+
+    def resumen(self, periodo='dia'):
+        return [(fila['posicion'], fila['username'], fila['total'], fila['ventas']) for fila in ranking.top(periodo)]
+
+    def test_top_y_posicion_con_empates(self):
+        self.vender(self.ana, '30.00')
+        self.vender(self.beto, '50.00')
+        self.vender(self.caro, '20.00')
+        self.vender(self.caro, '10.00')
+        self.assertEqual(self.resumen(), [
+            (1, 'beto', Decimal('50'), 1), (2, 'ana', Decimal('30'), 1), (2, 'caro', Decimal('30'), 2),
+        ])
+        self.assertEqual(ranking.top('dia', n=1)[0]['username'], 'beto')
+        self.assertEqual(ranking.posicion(self.caro.pk, 'dia'), (2, 3))
+        sin_ventas = User.objects.create(username='dora')
+        self.assertEqual(ranking.posicion(sin_ventas.pk, 'dia'), (None, 3))
+
+    def test_las_ventas_actualizan_la_cubeta_sin_reconstruirla(self):
+        self.vender(self.ana, '30.00')
+        self.assertEqual(self.resumen('mes'), [(1, 'ana', Decimal('30'), 1)])
+        with mock.patch.object(ranking, 'reconstruir', side_effect=AssertionError('Se reconstruyó la cubeta')):
+            self.vender(self.beto, '40.00')
+            venta = self.vender(self.ana, '15.00')
+            self.assertEqual(self.resumen('mes'), [(1, 'ana', Decimal('45'), 2), (2, 'beto', Decimal('40'), 1)])
+            with self.captureOnCommitCallbacks(execute=True):
+                venta.delete()
+            self.assertEqual(self.resumen('mes'), [(1, 'beto', Decimal('40'), 1), (2, 'ana', Decimal('30'), 1)])
+            self.assertEqual(ranking.posicion(self.ana.pk, 'mes'), (2, 2))
+
+    def test_una_venta_que_confirma_tarde_no_se_pierde(self):
+        # La venta 'tardia' tomó su id antes que 'temprana' pero confirma después de reconstruir
+        with self.captureOnCommitCallbacks(execute=False):
+            tardia = Venta.objects.create(
+                cliente=self.cliente, vendedor=self.beto, producto=self.producto, cantidad=1,
+                precio_unitario=Decimal('25.00'), total=Decimal('25.00'),
+            )
+        Venta.objects.filter(pk=tardia.pk).update(fecha_venta=timezone.now() - timedelta(days=40))  # Invisible al reconstruir
+        self.vender(self.ana, '10.00')
+        self.assertEqual(self.resumen(), [(1, 'ana', Decimal('10'), 1)])
+
+        Venta.objects.filter(pk=tardia.pk).update(fecha_venta=tardia.fecha_venta)
+        ranking.registrar_venta(tardia)  # Su on_commit
+        self.assertEqual(self.resumen(), [(1, 'beto', Decimal('25'), 1), (2, 'ana', Decimal('10'), 1)])
+        ranking.invalidar()
+        self.assertEqual(self.resumen(), [(1, 'beto', Decimal('25'), 1), (2, 'ana', Decimal('10'), 1)], 'Reconstruida desde la base')
+
+    def test_cambio_de_periodo(self):
+        self.vender(self.ana, '30.00')
+        hoy = timezone.localdate()
+        self.assertEqual(len(ranking.top('dia')), 1)
+        with mock.patch.object(ranking.timezone, 'localdate', return_value=hoy + timedelta(days=1)):
+            self.assertEqual(ranking.top('dia'), [])  # Cubeta nueva a medianoche
+            self.assertEqual(ranking.posicion(self.ana.pk, 'dia'), (None, 0))
+        self.assertEqual(ranking.cubeta('dia', dia=hoy)['totales'], {self.ana.pk: [3000, 1]})
+        self.assertEqual(ranking.inicio_periodo('semana', hoy).weekday(), 0)
+        self.assertEqual(ranking.fin_periodo('mes', hoy.replace(day=1)).day, 1)
+
+    def test_la_cache_por_proceso_se_avisa(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(ranking.cache_compartida())
+            self.assertEqual([aviso.id for aviso in checks.cache_compartida(None)], ['tienda.W001'])
+            self.assertEqual(ranking._duracion(), ranking.DURACION_LOCAL)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(checks.cache_compartida(None), [])
+            self.assertEqual(ranking._duracion(), ranking.DURACION)
+
+
+class AjusteMasivoTests(TestCase):
+    """Ajuste masivo (tienda/ajustes.py): un INSERT ... SELECT a la bitácora y un UPDATE, sin importar cuántos productos."""
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.categoria = Categoria.objects.create(nombre='Limpieza')
+        self.productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Jabón {i}', descripcion='-', precio_venta=Decimal('10.00'), stock=i, categoria=self.categoria)
+            for i in range(60)
+        ])
+
+    def test_precio_y_stock_con_tope_en_cero(self):
+        afectados = ajustar_productos(filtrar_productos(categoria=self.categoria), 'porcentaje', Decimal('-15'), -3)
+        self.assertEqual(afectados, 60)
+        producto = Producto.objects.get(pk=self.productos[10].pk)
+        self.assertEqual((producto.stock, producto.precio_venta), (7, Decimal('8.50')))
+        self.assertEqual(Producto.objects.get(pk=self.productos[1].pk).stock, 0)
+
+        # Solo los productos cuyo stock cambió quedan en la bitácora, con la diferencia real
+        movimientos = dict(MovimientoStock.objects.filter(motivo='ajuste_masivo').values_list('producto_id', 'cantidad'))
+        self.assertEqual(len(movimientos), 59)
+        self.assertNotIn(self.productos[0].pk, movimientos)
+        self.assertEqual((movimientos[self.productos[2].pk], movimientos[self.productos[40].pk]), (-2, -3))
+
+    def test_consultas_no_crecen_con_los_productos(self):
+        tocar_version(Producto)  # La fila de versión ya existe, como en producción
+        numeros = []
+        for productos in (Producto.objects.filter(pk__in=[p.pk for p in self.productos[:5]]), Producto.objects.all()):
+            with CaptureQueriesContext(connection) as ctx:
+                ajustar_productos(productos, ajuste_stock=4)
+            numeros.append(len(ctx.captured_queries))
+        self.assertEqual(numeros[0], numeros[1])
+
+    def test_bloquea_antes_de_escribir_la_bitacora(self):
+        with CaptureQueriesContext(connection) as ctx:
+            ajustar_productos(Producto.objects.all(), ajuste_stock=1)
+        escrituras = [c['sql'].split()[0] for c in ctx.captured_queries if c['sql'].startswith(('UPDATE "tienda_producto"', 'INSERT INTO "tienda_movimientostock"'))]
+        # Bloqueo, INSERT ... SELECT a la bitácora y el UPDATE con el ajuste
+        self.assertEqual(escrituras, ['UPDATE', 'INSERT', 'UPDATE'])
+
+    def test_simulacion_no_cambia_nada(self):
+        self.assertEqual(ajustar_productos(Producto.objects.all(), 'absoluto', 5, 5, dry_run=True), 60)
+        self.assertFalse(MovimientoStock.objects.exists())
+        self.assertEqual(Producto.objects.get(pk=self.productos[3].pk).stock, 3)
+
+
+class EliminacionEnLotesTests(TestCase):
+    """Eliminación en dos pasos (tienda/eliminacion.py): borrado lógico inmediato y purga por lotes."""
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        self.addCleanup(referencia._subir_version, 'productos', 'codigos', 'categorias')
+        self.vendedor = User.objects.create(username='lotes_vendedor')
+        self.categoria = Categoria.objects.create(nombre='Temporada')
+        self.producto = Producto.objects.create(nombre='Pino', descripcion='-', precio_venta=Decimal('5.00'), stock=50, categoria=self.categoria)
+        self.otro = Producto.objects.create(nombre='Esfera', descripcion='-', precio_venta=Decimal('1.00'), stock=50, categoria=self.categoria)
+        self.cliente = Cliente.objects.create(nombre='Luis', apellido='R', email='luis@ejemplo.com', telefono='0', direccion='-')
+        for producto in (self.producto, self.producto, self.producto, self.otro):
+            for _ in range(2):
+                venta = Venta.objects.create(cliente=self.cliente, vendedor=self.vendedor, producto=producto, cantidad=1,
+                                             precio_unitario=producto.precio_venta, total=producto.precio_venta)
+                registrar_movimiento(producto, -1, 'venta', venta=venta)
+
+    def purgar(self, objeto, lote=2):
+        avances = []
+        tarea = eliminacion.eliminar(objeto)
+        resumen = eliminacion.purgar(objeto._meta.label_lower, objeto.pk, lote=lote, progreso=lambda *a: avances.append(a))
+        self.assertEqual(tarea.parametros, {'modelo': objeto._meta.label_lower, 'pk': objeto.pk, 'lote': 500})
+        return resumen, avances
+
+    def test_cliente_libera_el_email_al_instante(self):
+        tarea = eliminacion.eliminar(self.cliente)
+        self.assertFalse(Cliente.objects.filter(pk=self.cliente.pk).exists())
+        self.assertEqual(Cliente.todos.get(pk=self.cliente.pk).email, f'eliminado-{self.cliente.pk}@eliminado.invalid')
+        self.assertEqual(Venta.objects.filter(cliente_id=self.cliente.pk).count(), 8, 'Las ventas se purgan en el worker')
+        self.assertEqual(tarea.tipo, 'eliminar_en_lotes')
+
+    def test_purga_de_cliente_por_lotes(self):
+        resumen, avances = self.purgar(self.cliente, lote=3)
+        self.assertFalse(Cliente.todos.filter(pk=self.cliente.pk).exists())
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(VentaHistorial.objects.exists())
+        # Los movimientos sobreviven sin la venta (SET_NULL)
+        self.assertEqual(MovimientoStock.objects.filter(motivo='venta', venta=None).count(), 8)
+        self.assertEqual([hechos for hechos, _, _ in avances], [3, 6, 8])
+        self.assertEqual(resumen[f'{Cliente._meta.verbose_name} #{self.cliente.pk}'], 'borrado')
+
+    def test_purga_de_producto_conserva_la_bitacora(self):
+        self.purgar(self.producto)
+        self.assertFalse(Producto.todos.filter(pk=self.producto.pk).exists())
+        self.assertEqual(Venta.objects.filter(producto=self.otro).count(), 2)
+        self.assertEqual(Venta.objects.count(), 2)
+        # 6 ventas + la baja: sin producto, pero siguen en la bitácora
+        self.assertEqual(MovimientoStock.objects.filter(producto=None).count(), 7)
+        self.assertTrue(MovimientoStock.objects.filter(producto=None, motivo='baja', cantidad=-50).exists())
+
+    def test_purga_de_categoria_desvincula_sus_productos(self):
+        self.purgar(self.categoria, lote=1)
+        self.assertFalse(Categoria.todos.filter(pk=self.categoria.pk).exists())
+        self.assertEqual(Producto.objects.filter(categoria=None).count(), 2)
+        self.assertEqual(Venta.objects.count(), 8)
+
+    def test_purga_borra_las_promociones_y_desvincula_sus_ventas(self):
+        self.addCleanup(referencia._subir_version, 'promociones')
+        with self.captureOnCommitCallbacks(execute=True):
+            del_producto = Promocion.objects.create(nombre='2x1 pino', tipo='lleva_paga', lleva=2, paga=1, producto=self.producto)
+            de_categoria = Promocion.objects.create(nombre='10% temporada', tipo='porcentaje', valor=Decimal('10'), categoria=self.categoria)
+        Venta.objects.filter(producto=self.otro).update(promocion=del_producto)
+        Venta.objects.filter(producto=self.producto).update(promocion=de_categoria)
+        self.assertIn(self.producto.pk, referencia.promociones()['productos'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resumen, _ = self.purgar(self.producto)
+        # Por lotes en el worker, no en la cascada del delete() final
+        self.assertEqual(resumen[f'{Promocion._meta.verbose_name_plural} (borrados)'], 1)
+        self.assertFalse(Promocion.objects.filter(pk=del_producto.pk).exists())
+        self.assertEqual(Venta.objects.filter(producto=self.otro, promocion=None).count(), 2)
+        self.assertEqual(referencia.promociones()['productos'], {}, 'La caché de promociones no se invalidó')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resumen, _ = self.purgar(self.categoria, lote=1)
+        self.assertEqual(resumen[f'{Promocion._meta.verbose_name_plural} (borrados)'], 1)
+        self.assertFalse(Promocion.objects.exists())
+        self.assertEqual(referencia.promociones()['categorias'], {})
+        self.assertIsNone(Producto.objects.get(pk=self.otro.pk).categoria_id)
+
+
+class AuditoriaTests(TestCase):
+    """Auditoría en búfer (tienda/auditoria.py): escritura por lotes, contrapresión y solo cambios confirmados."""
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+
+    def entrada(self, objeto_id=1):
+        return Auditoria(fecha=timezone.now(), modelo='tienda.producto', objeto_id=objeto_id, accion='editar', cambios={})
+
+    def test_solo_se_audita_lo_confirmado(self):
+        auditoria.bufer.vaciar()
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Producto.objects.create(nombre='Vela', descripcion='-', precio_venta=Decimal('3.00'), stock=1)
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                revertido = Producto.objects.get(pk=producto.pk)
+                revertido.precio_venta = Decimal('4.00')
+                revertido.save()
+                1 / 0
+            editado = Producto.objects.get(pk=producto.pk)
+            editado.stock = 2
+            editado.save(update_fields=['stock'])
+        auditoria.bufer.vaciar()
+        entradas = list(Auditoria.objects.filter(objeto_id=producto.pk).order_by('pk').values_list('accion', 'cambios'))
+        self.assertEqual([accion for accion, _ in entradas], ['crear', 'editar'], 'La edición revertida no debe auditarse')
+        self.assertEqual(entradas[1][1], {'stock': [1, 2]})
+
+    def test_compara_contra_lo_leido_sin_copiar_al_cargar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Producto.objects.create(nombre='Jabón', descripcion='-', precio_venta=Decimal('2.00'), stock=5)
+        nombres, valores = Producto.objects.get(pk=producto.pk)._valores_cargados
+        self.assertEqual(dict(zip(nombres, valores))['stock'], 5)
+
+        # Campos diferidos: no se leen para auditar y la edición solo anota lo que cambió
+        parcial = Producto.objects.only('nombre').get(pk=producto.pk)
+        parcial.nombre = 'Jabón neutro'
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            parcial.save(update_fields=['nombre'])
+        parcial.nombre = 'Jabón de glicerina'  # El segundo save() compara contra lo ya guardado
+        with self.captureOnCommitCallbacks(execute=True):
+            parcial.save(update_fields=['nombre'])
+        auditoria.bufer.vaciar()
+        cambios = list(Auditoria.objects.filter(objeto_id=producto.pk, accion='editar').order_by('pk').values_list('cambios', flat=True))
+        self.assertEqual(cambios, [{'nombre': ['Jabón', 'Jabón neutro']}, {'nombre': ['Jabón neutro', 'Jabón de glicerina']}])
+
+    def test_escribe_por_lotes(self):
+        bufer = auditoria.Bufer(maximo=100, lote=3, intervalo=3600)
+        for i in range(7):
+            bufer._entradas.append(self.entrada(i))  # Sin arrancar el hilo
+        with self.assertNumQueries(3):  # Un INSERT por lote de 3
+            self.assertTrue(bufer.vaciar())
+        self.assertEqual((len(bufer), Auditoria.objects.count()), (0, 7))
+
+    def test_contrapresion_escribe_al_llenarse(self):
+        bufer = auditoria.Bufer(maximo=4, lote=100, intervalo=3600)
+        for i in range(3):
+            bufer.agregar(self.entrada(i))
+        self.assertEqual((len(bufer), Auditoria.objects.count()), (3, 0))
+        bufer.agregar(self.entrada(3))  # Llega al máximo: quien agrega escribe
+        self.assertEqual((len(bufer), Auditoria.objects.count()), (0, 4))
+
+    def test_base_caida_descarta_las_mas_viejas(self):
+        bufer = auditoria.Bufer(maximo=4, lote=2, intervalo=3600)
+        bufer._entradas.extend(self.entrada(i) for i in range(4))
+        with mock.patch.object(Auditoria.objects, 'bulk_create', side_effect=OperationalError('sin conexión')), \
+                self.assertLogs('tienda.auditoria', 'WARNING'):
+            bufer._entradas.extend(self.entrada(i) for i in range(4, 6))
+            self.assertFalse(bufer.vaciar())
+        self.assertEqual([entrada.objeto_id for entrada in bufer._entradas], [2, 3, 4, 5])
+        self.assertEqual(bufer.descartadas, 2)
+        self.assertTrue(bufer.vaciar())
+        self.assertEqual(Auditoria.objects.count(), 4)
+
+
+@skipIf(columnar.np is None, 'NumPy no está instalado')
+class ColumnarTests(TestCase):
+    """Exportación por columnas (tienda/columnar.py): completa, incremental y lectura con abrir()."""
+
+    def setUp(self):
+        self.addCleanup(auditoria.bufer.vaciar)
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.destino = os.path.join(carpeta.name, 'columnar')
+        self.cliente = Cliente.objects.create(nombre='Inés', apellido='R', email='ines@ejemplo.com', telefono='0', direccion='-')
+        self.vendedor = User.objects.create(username='col_vendedor')
+        self.producto = self.nuevo_producto('Café')
+
+    def nuevo_producto(self, nombre):
+        return Producto.objects.create(nombre=nombre, descripcion='-', precio_venta=Decimal('12.50'), stock=10)
+
+    def vender(self, cantidad, vendedor=None):
+        return Venta.objects.create(
+            cliente=self.cliente, vendedor=vendedor, producto=self.producto, cantidad=cantidad,
+            precio_unitario=Decimal('12.50'), total=Decimal('12.50') * cantidad,
+        )
+
+    def nombres(self):
+        productos = columnar.abrir('productos', self.destino)
+        return dict(zip(productos['id'].tolist(), columnar.valores('productos', 'nombre', self.destino)[productos['nombre']].tolist()))
+
+    def test_exportacion_completa(self):
+        primera = self.vender(2, self.vendedor)
+        segunda = self.vender(1)
+        resultado = columnar.exportar(self.destino, lote=1)
+        self.assertEqual(resultado, {'ventas': 2, 'productos': 1, 'clientes': 1})
+
+        ventas = columnar.abrir('ventas', self.destino)
+        self.assertEqual(ventas['id'].tolist(), [primera.pk, segunda.pk])
+        self.assertEqual(ventas['vendedor_id'].tolist(), [self.vendedor.pk, columnar.NULO])
+        self.assertEqual(ventas['total_centavos'].tolist(), [2500, 1250])
+        self.assertEqual(str(ventas['fecha_venta'].dtype), 'datetime64[us]')
+        self.assertEqual(self.nombres(), {self.producto.pk: 'Café'})
+        self.assertNotIn('email', columnar.abrir('clientes', self.destino))
+
+        # Otra completa reemplaza a la anterior (una sola parte por tabla)
+        self.vender(3)
+        columnar.exportar(self.destino)
+        manifiesto = columnar.leer_manifiesto(self.destino)
+        self.assertEqual([parte['nombre'] for parte in manifiesto['tablas']['ventas']['partes']], ['00001'])
+        self.assertEqual(len(columnar.abrir('ventas', self.destino)['id']), 3)
+
+    def test_incremental_agrega_solo_lo_nuevo(self):
+        viejas = [self.vender(1).pk, self.vender(2).pk]
+        columnar.exportar(self.destino)
+        nueva = self.vender(3)
+        Venta.objects.filter(pk=viejas[0]).update(cantidad=9)  # Las viejas no se reexportan
+
+        self.assertEqual(columnar.exportar(self.destino, incremental=True, tablas=['ventas']), {'ventas': 1})
+        self.assertEqual(columnar.exportar(self.destino, incremental=True, tablas=['ventas']), {'ventas': 0})
+        partes = columnar.leer_manifiesto(self.destino)['tablas']['ventas']['partes']
+        self.assertEqual([(parte['nombre'], parte['desde_id'], parte['hasta_id']) for parte in partes], [
+            ('00001', 1, viejas[1]), ('00002', viejas[1] + 1, nueva.pk),
+        ])
+        ventas = columnar.abrir('ventas', self.destino)  # Concatena las dos partes
+        self.assertEqual(ventas['id'].tolist(), viejas + [nueva.pk])
+        self.assertEqual(ventas['cantidad'].tolist(), [1, 2, 3])
+
+    def test_los_codigos_del_diccionario_no_cambian(self):
+        columnar.exportar(self.destino)
+        codigo_cafe = int(columnar.abrir('productos', self.destino)['nombre'][0])
+        repetido = self.nuevo_producto('Café')
+        te = self.nuevo_producto('Té')
+        columnar.exportar(self.destino, incremental=True, tablas=['productos'])
+
+        codigos = columnar.abrir('productos', self.destino)['nombre'].tolist()
+        self.assertEqual(codigos[:2], [codigo_cafe, codigo_cafe])
+        self.assertEqual(self.nombres(), {self.producto.pk: 'Café', repetido.pk: 'Café', te.pk: 'Té'})
+
+    def test_restos_de_una_exportacion_interrumpida(self):
+        self.vender(1)
+        columnar.exportar(self.destino)
+        # La anterior se cortó tras publicar la parte 00002 y antes del manifiesto,
+        # y otra dejó su temporal a medias
+        for resto in ('00002', '.tmp-00002'):
+            os.makedirs(os.path.join(self.destino, 'ventas', resto))
+            with open(os.path.join(self.destino, 'ventas', resto, 'id.npy'), 'wb') as archivo:
+                archivo.write(b'basura')
+        nueva = self.vender(2)
+
+        self.assertEqual(columnar.exportar(self.destino, incremental=True, tablas=['ventas']), {'ventas': 1})
+        self.assertEqual(columnar.abrir('ventas', self.destino)['id'].tolist()[-1], nueva.pk)
+        self.assertFalse(os.path.exists(os.path.join(self.destino, 'ventas', '.tmp-00002')))
@@ -16,8 +16,11 @@ urlpatterns = [
     # CRUD Productos
     path('productos/', views.producto_lista, name='producto_lista'),
     path('productos/crear/', views.producto_crear, name='producto_crear'),
+    # Lector de código de barras de la caja (JSON)
+    path('productos/escanear/', views.producto_escanear, name='producto_escanear'),
     path('productos/editar/<int:pk>/', views.producto_editar, name='producto_editar'),
     path('productos/eliminar/<int:pk>/', views.producto_eliminar, name='producto_eliminar'),
+    path('productos/ajuste-masivo/', views.producto_ajuste_masivo, name='producto_ajuste_masivo'),
 
     # CRUD Categorías
     path('categorias/', views.categoria_lista, name='categoria_lista'),
@@ -52,4 +55,34 @@ urlpatterns = [
     
     # Reporte de ventas del día
     path('ventas/reporte/', views.reporte_ventas, name='reporte_ventas'),
+
+    # Ranking de vendedores (hoy / semana / mes)
+    path('ventas/ranking/', views.ranking_vendedores, name='ranking_vendedores'),
+
+    # Ventas y totales en vivo (server-sent events) para el dashboard y el reporte
+    path('ventas/eventos/', views.ventas_eventos, name='ventas_eventos'),
+
+    # Carrito: reservas de stock con vencimiento que se cobran juntas
+    path('ventas/carrito/', views.carrito, name='carrito'),
+    path('ventas/carrito/agregar/', views.carrito_agregar, name='carrito_agregar'),
+    path('ventas/carrito/quitar/<int:pk>/', views.carrito_quitar, name='carrito_quitar'),
+    path('ventas/carrito/cobrar/', views.carrito_cobrar, name='carrito_cobrar'),
+
+    # Compras: órdenes a proveedores y recepción de mercancía (suma al stock con F())
+    path('compras/', views.orden_compra_lista, name='orden_compra_lista'),
+    path('compras/crear/', views.orden_compra_crear, name='orden_compra_crear'),
+    path('compras/<int:pk>/recibir/', views.orden_compra_recibir, name='orden_compra_recibir'),
+
+    # Tareas en segundo plano (reportes largos, exportaciones)
+    path('tareas/', views.tarea_lista, name='tarea_lista'),
+    path('tareas/encolar/<str:tipo>/', views.tarea_encolar, name='tarea_encolar'),
+    path('tareas/<int:pk>/estado/', views.tarea_estado, name='tarea_estado'),
+    path('tareas/<int:pk>/descargar/', views.tarea_descargar, name='tarea_descargar'),
+
+    # Sucursal actual (selector del menú)
+    path('sucursal/cambiar/', views.sucursal_cambiar, name='sucursal_cambiar'),
+
+    # Perfiles de rendimiento (solo superusuario)
+    path('perfiles/', views.perfil_lista, name='perfil_lista'),
+    path('perfiles/<str:nombre>.<str:formato>', views.perfil_descargar, name='perfil_descargar'),
 ]
\ No newline at end of file
@@ -0,0 +1,100 @@
+# tienda/versiones.py
+# Versiones por modelo y GET condicional (ETag / Last-Modified).
+#
+# Cada guardado o eliminación de un modelo registrado sube su contador en
+# 'VersionModelo' al confirmarse la transacción. Las vistas decoradas con
+# @condicional(...) comparan esas versiones con el ETag del navegador y, si
+# nada cambió, responden 304 sin ejecutar la consulta principal ni renderizar
+# el template.
+
+import hashlib
+
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import VersionModelo
+
+
+def _etiqueta(modelo):
+    return modelo._meta.label_lower
+
+
+# ============ ESCRITURA ============
+def tocar_version(*modelos):
+    """
+    Sube la versión de los modelos indicados (llamar también tras un queryset.update()).
+    Dentro de una transacción se sube al confirmarla: el UPDATE de la fila de versión
+    no debe quedar bloqueado hasta el COMMIT de una venta (todas las cajas de todas
+    las sucursales tocan las mismas dos filas).
+    """
+    transaction.on_commit(lambda: _subir(modelos), robust=True)
+
+
+def _subir(modelos):
+    ahora = timezone.now()
+    for modelo in modelos:
+        etiqueta = _etiqueta(modelo)
+        if VersionModelo.objects.filter(modelo=etiqueta).update(version=F('version') + 1, actualizado=ahora):
+            continue
+        try:
+            with transaction.atomic():
+                VersionModelo.objects.create(modelo=etiqueta, version=1, actualizado=ahora)
+        except IntegrityError:
+            # Otro proceso la creó al mismo tiempo
+            VersionModelo.objects.filter(modelo=etiqueta).update(version=F('version') + 1, actualizado=ahora)
+
+
+# ============ LECTURA ============
+def versiones(*modelos):
+    """Devuelve {etiqueta: (version, actualizado)} con una sola consulta."""
+    etiquetas = [_etiqueta(modelo) for modelo in modelos]
+    encontradas = {
+        modelo: (version, actualizado)
+        for modelo, version, actualizado in
+        VersionModelo.objects.filter(modelo__in=etiquetas).values_list('modelo', 'version', 'actualizado')
+    }
+    return {etiqueta: encontradas.get(etiqueta, (0, None)) for etiqueta in etiquetas}
+
+
+# ============ DECORADOR PARA VISTAS ============
+def condicional(*modelos, extra=None):
+    """
+    Decorador de vistas que emite ETag/Last-Modified a partir de las versiones de
+    'modelos' y responde 304 si el navegador ya tiene la página actual.
+
+    El ETag incluye al usuario, su rol, la sucursal actual y su token CSRF (la
+    página muestra el menú según el rol y puede tener formularios). 'extra(request)' permite agregar otro
+    valor, por ejemplo la fecha del reporte del día. Si hay mensajes flash
+    pendientes no se aplica (hay que mostrarlos).
+    """
+    def _estado(request, *args, **kwargs):
+        if hasattr(request, '_estado_condicional'):
+            return request._estado_condicional
+
+        estado = (None, None)
+        if not len(messages.get_messages(request)):
+            datos = versiones(*modelos)
+            perfil = getattr(request.user, 'perfil', None) if request.user.is_authenticated else None
+            partes = [
+                f"{etiqueta}:{version}" for etiqueta, (version, _) in sorted(datos.items())
+            ] + [
+                str(request.user.pk),
+                getattr(perfil, 'rol', ''),
+                str(getattr(request, 'sucursal_id', '')),
+                request.COOKIES.get('csrftoken', ''),
+                str(extra(request)) if extra else '',
+            ]
+            etag = hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+            fechas = [actualizado for _, actualizado in datos.values() if actualizado is not None]
+            estado = (etag, max(fechas) if fechas else None)
+
+        request._estado_condicional = estado
+        return estado
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: _estado(request)[0],
+        last_modified_func=lambda request, *args, **kwargs: _estado(request)[1],
+    )
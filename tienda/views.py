@@ -2,17 +2,39 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 # Importaciones de Autenticación
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 # Importaciones de Modelos
-from .models import PerfilUsuario, Producto, Categoria, Proveedor, Cliente, Venta
+from .models import PerfilUsuario, Producto, Categoria, Proveedor, Cliente, Venta, Tarea, MovimientoStock, OrdenCompra
+from django.contrib.auth.models import User
 # Importaciones de Formularios
-from .forms import ProductoForm, CategoriaForm, ProveedorForm, ClienteForm, VentaForm
-from django.urls import reverse_lazy
+from .forms import (
+    ProductoForm, CategoriaForm, ProveedorForm, ClienteForm, VentaForm, AjusteMasivoForm, RangoFechasForm,
+    ReservaForm, CobroForm, OrdenCompraForm, LineasCompraForm,
+)
+from .ajustes import filtrar_productos, ajustar_productos
+from .inventario import registrar_movimiento
+from .eliminacion import eliminar
+from . import auditoria, compras, en_vivo, historial, promociones, ranking, referencia, reservas
+from .sucursales import (
+    hay_sucursales, alias_de, ventas_de, existencias,
+    mover_existencias, descontar_existencias, ajustar_existencias, sucursales,
+)
+from .tareas import TIPOS_TAREA, encolar
+from .versiones import condicional, tocar_version
+from sistema_tienda import perfilador
+from django.urls import reverse, reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib import messages
+from django.http import HttpResponse, JsonResponse, Http404, FileResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import require_POST
 
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum
+from django.db import transaction
+from datetime import datetime, time, timedelta
+from django.db.models import Count, Sum, F
 
 
 # ============ DECORADOR PERSONALIZADO PARA PERMISOS POR ROL ============
@@ -45,6 +67,27 @@ def rol_requerido(*roles_permitidos):
     return decorator
 
 
+def superusuario_requerido(view_func):
+    """Como rol_requerido, pero solo deja pasar al superusuario."""
+    def _wrapped_view(request, *args, **kwargs):
+        if not request.user.is_superuser:
+            messages.error(request, '⚠️ Acceso denegado. Solo el superusuario puede ver esta página.')
+            return redirect('tienda:home')
+        return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def _falta_sucursal(request, cantidad):
+    """
+    Con sucursales, el stock se mueve en la sucursal actual: si hay que mover
+    'cantidad' unidades y no hay una elegida, avisa y devuelve True.
+    """
+    if cantidad and request.sucursal_id is None and hay_sucursales():
+        messages.error(request, 'Elige una sucursal en el menú para mover stock.')
+        return True
+    return False
+
+
 # ============ VISTA DE LOGIN ============
 def login_view(request):
     """Vista para el inicio de sesión de usuarios"""
@@ -53,16 +96,15 @@ def login_view(request):
     
     if request.method == 'POST':
         form = AuthenticationForm(request, data=request.POST)
+        # is_valid() ya llama a authenticate() (un solo hash de la contraseña);
+        # el usuario autenticado se toma del formulario en vez de autenticar otra vez.
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, f'Bienvenido {username}!')
-                return redirect('tienda:home')
-            else:
-                messages.error(request, 'Usuario o contraseña incorrectos')
+            user = form.get_user()
+            login(request, user)
+            messages.success(request, f'Bienvenido {user.get_username()}!')
+            return redirect('tienda:home')
+        else:
+            messages.error(request, 'Usuario o contraseña incorrectos')
     else:
         form = AuthenticationForm()
     
@@ -85,9 +127,9 @@ def home(request):
     total_categorias = Categoria.objects.count()
     total_proveedores = Proveedor.objects.count()
     total_clientes = Cliente.objects.count()
-    total_ventas = Venta.objects.count()
+    total_ventas = ventas_de(request.sucursal_id).count()
     
-    productos_recientes = Producto.objects.order_by('-fecha_creacion')[:5]
+    productos_recientes = Producto.objects.select_related('categoria').order_by('-fecha_creacion')[:5]
     
     context = {
         'total_productos': total_productos,
@@ -109,19 +151,57 @@ def home(request):
 # VISTAS CRUD PARA PRODUCTOS
 # ===================================================
 @login_required
+@condicional(Producto, Categoria, User)
 def producto_lista(request):
-    productos = Producto.objects.all().order_by('nombre')
-    return render(request, 'tienda/producto_lista.html', {'productos': productos})
+    productos = Producto.objects.select_related('categoria', 'creado_por').order_by('nombre')
+    por_sucursal = request.sucursal_id is not None
+    if por_sucursal:
+        # Una consulta para todas las existencias de la sucursal (no una por producto)
+        stock_sucursal = existencias(request.sucursal_id)
+        productos = list(productos)
+        for producto in productos:
+            producto.stock_sucursal = stock_sucursal.get(producto.pk, 0)
+    return render(request, 'tienda/producto_lista.html', {'productos': productos, 'por_sucursal': por_sucursal})
+
+@login_required
+@rol_requerido('vendedor', 'gerente', 'administrador')
+def producto_escanear(request):
+    """
+    Lector de código de barras de la caja: ?codigo=... -> {id, nombre, precio_venta, stock}.
+    El código se resuelve con el mapa en memoria (tienda/referencia.py) y la fila se
+    lee por llave primaria para tener precio y stock al día: una sola consulta.
+    """
+    codigo = request.GET.get('codigo', '').strip()
+    if not codigo:
+        return JsonResponse({'error': 'Falta el código.'}, status=400)
+
+    campos = ('id', 'nombre', 'precio_venta', 'stock', 'activo')
+    pk = referencia.codigos().get(codigo)
+    datos = None
+    if pk is not None:
+        # También por código: si el mapa está atrasado no se devuelve otro producto
+        datos = Producto.objects.filter(pk=pk, codigo=codigo).values(*campos).first()
+    if datos is None:
+        # Código que este proceso aún no conoce (a lo más TIENDA_REFERENCIA_TTL segundos): índice único
+        datos = Producto.objects.filter(codigo=codigo).values(*campos).first()
+    if datos is None:
+        return JsonResponse({'error': f'No hay ningún producto con el código {codigo}.'}, status=404)
+    return JsonResponse(datos)
+
 
 @login_required
 @rol_requerido('gerente', 'administrador')
 def producto_crear(request):
     if request.method == 'POST':
         form = ProductoForm(request.POST)
-        if form.is_valid():
+        if form.is_valid() and not _falta_sucursal(request, form.cleaned_data['stock']):
             producto = form.save(commit=False) 
             producto.creado_por = request.user 
-            producto.save() 
+            with transaction.atomic(), transaction.atomic(using=alias_de(request.sucursal_id)):
+                producto.save() 
+                registrar_movimiento(producto, producto.stock, 'alta', usuario=request.user)
+                if request.sucursal_id is not None:
+                    mover_existencias(request.sucursal_id, producto.pk, producto.stock)
             messages.success(request, 'Producto creado exitosamente')
             return redirect('tienda:producto_lista')
     else:
@@ -132,10 +212,15 @@ def producto_crear(request):
 @rol_requerido('gerente', 'administrador')
 def producto_editar(request, pk):
     producto = get_object_or_404(Producto, pk=pk)
+    stock_anterior = producto.stock
     if request.method == 'POST':
         form = ProductoForm(request.POST, instance=producto)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and not _falta_sucursal(request, form.cleaned_data['stock'] - stock_anterior):
+            with transaction.atomic(), transaction.atomic(using=alias_de(request.sucursal_id)):
+                form.save()
+                registrar_movimiento(producto, producto.stock - stock_anterior, 'edicion', usuario=request.user)
+                if request.sucursal_id is not None:
+                    mover_existencias(request.sucursal_id, producto.pk, producto.stock - stock_anterior)
             messages.success(request, 'Producto actualizado exitosamente')
             return redirect('tienda:producto_lista')
     else:
@@ -147,16 +232,52 @@ def producto_editar(request, pk):
 def producto_eliminar(request, pk):
     producto = get_object_or_404(Producto, pk=pk)
     if request.method == 'POST':
-        producto.delete()
-        messages.success(request, 'Producto eliminado exitosamente')
+        # Borrado lógico inmediato; sus ventas se borran por lotes en segundo plano
+        tarea = eliminar(producto, usuario=request.user)
+        messages.success(request, f'Producto eliminado exitosamente. Sus ventas se borran en segundo plano (tarea #{tarea.id}).')
         return redirect('tienda:producto_lista')
     return render(request, 'tienda/producto_eliminar.html', {'producto': producto})
 
+@login_required
+@rol_requerido('gerente', 'administrador')
+def producto_ajuste_masivo(request):
+    """
+    Vista para ajustar precio y/o stock de todos los productos que coinciden
+    con un filtro. El botón 'Vista previa' solo cuenta los productos afectados.
+    """
+    afectados = None
+    if request.method == 'POST':
+        form = AjusteMasivoForm(request.POST)
+        if form.is_valid() and not _falta_sucursal(request, form.cleaned_data['ajuste_stock']):
+            productos = filtrar_productos(**form.filtros())
+            dry_run = 'vista_previa' in request.POST
+            # Con sucursal, el stock se ajusta en sus existencias (y en el total)
+            ajuste_stock = form.cleaned_data['ajuste_stock']
+            en_sucursal = request.sucursal_id is not None and ajuste_stock
+            afectados = ajustar_productos(
+                productos,
+                tipo_precio=form.cleaned_data['tipo_precio'],
+                valor_precio=form.cleaned_data['valor_precio'],
+                ajuste_stock=0 if en_sucursal else ajuste_stock,
+                dry_run=dry_run,
+                usuario=request.user,
+            )
+            if en_sucursal and not dry_run:
+                ajustar_existencias(request.sucursal_id, productos, ajuste_stock, usuario=request.user)
+                tocar_version(Producto)
+            if not dry_run:
+                messages.success(request, f'Ajuste aplicado a {afectados} producto(s)')
+                return redirect('tienda:producto_lista')
+    else:
+        form = AjusteMasivoForm()
+    return render(request, 'tienda/producto_ajuste_masivo.html', {'form': form, 'afectados': afectados})
+
 # ===================================================
 # VISTAS CRUD PARA CATEGORÍAS
 # ===================================================
 @login_required
 @rol_requerido('gerente', 'administrador')
+@condicional(Categoria)
 def categoria_lista(request):
     categorias = Categoria.objects.all().order_by('nombre')
     return render(request, 'tienda/categoria_lista.html', {'categorias': categorias})
@@ -193,8 +314,8 @@ def categoria_editar(request, pk):
 def categoria_eliminar(request, pk):
     categoria = get_object_or_404(Categoria, pk=pk)
     if request.method == 'POST':
-        categoria.delete()
-        messages.success(request, 'Categoría eliminada exitosamente')
+        tarea = eliminar(categoria, usuario=request.user)
+        messages.success(request, f'Categoría eliminada exitosamente. Sus productos se desvinculan en segundo plano (tarea #{tarea.id}).')
         return redirect('tienda:categoria_lista')
     return render(request, 'tienda/categoria_eliminar.html', {'categoria': categoria})
 
@@ -203,6 +324,7 @@ def categoria_eliminar(request, pk):
 # ===================================================
 @login_required
 @rol_requerido('gerente', 'administrador')
+@condicional(Proveedor)
 def proveedor_lista(request):
     proveedores = Proveedor.objects.all().order_by('empresa')
     return render(request, 'tienda/proveedor_lista.html', {'proveedores': proveedores})
@@ -248,6 +370,7 @@ def proveedor_eliminar(request, pk):
 # VISTAS CRUD PARA CLIENTES
 # ===================================================
 @login_required
+@condicional(Cliente)
 def cliente_lista(request):
     clientes = Cliente.objects.all().order_by('apellido', 'nombre')
     return render(request, 'tienda/cliente_lista.html', {'clientes': clientes})
@@ -284,8 +407,8 @@ def cliente_editar(request, pk):
 def cliente_eliminar(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
     if request.method == 'POST':
-        cliente.delete()
-        messages.success(request, 'Cliente eliminado exitosamente')
+        tarea = eliminar(cliente, usuario=request.user)
+        messages.success(request, f'Cliente eliminado exitosamente. Sus ventas se borran en segundo plano (tarea #{tarea.id}).')
         return redirect('tienda:cliente_lista')
     return render(request, 'tienda/cliente_eliminar.html', {'cliente': cliente})
 
@@ -296,9 +419,12 @@ def cliente_eliminar(request, pk):
 
 @login_required
 @rol_requerido('gerente', 'administrador') 
+# Los nombres vienen copiados en el historial: solo dependen de las ventas
+@condicional(Venta)
 def venta_lista(request):
     """Vista que lista todas las ventas (historial)"""
-    ventas = Venta.objects.select_related('cliente', 'vendedor', 'producto').all()
+    # Tabla plana (tienda/historial.py): los nombres vienen en cada fila, sin JOIN
+    ventas = historial.historial_de(request.sucursal_id)
     return render(request, 'tienda/venta_lista.html', {'ventas': ventas})
 
 
@@ -310,7 +436,7 @@ def venta_crear(request):
     """
     if request.method == 'POST':
         form = VentaForm(request.POST)
-        if form.is_valid():
+        if form.is_valid() and not _falta_sucursal(request, form.cleaned_data['cantidad']):
             try:
                 producto_vendido = form.cleaned_data['producto']
                 cantidad_vendida = form.cleaned_data['cantidad']
@@ -322,12 +448,40 @@ def venta_crear(request):
                 venta = form.save(commit=False)
                 
                 venta.vendedor = request.user
-                venta.precio_unitario = producto_vendido.precio_venta
+                venta.sucursal_id = request.sucursal_id
                 
-                venta.save()
+                # El form validó con la foto en caché del producto (tienda/referencia.py);
+                # aquí se revalida contra la base con la fila bloqueada, descontando
+                # las unidades apartadas en carritos (tienda/reservas.py)
+                actual = None
+                # Dos bases si las ventas de la sucursal viven en otra (ver tienda/routers.py)
+                with transaction.atomic(), transaction.atomic(using=alias_de(venta.sucursal_id)):
+                    reservas.bloquear([producto_vendido.pk])
+                    actual = Producto.objects.filter(pk=producto_vendido.pk).values('precio_venta', 'stock', 'categoria_id').first()
+                    if actual is not None:
+                        actual['stock'] -= reservas.reservado(producto_vendido.pk)
+                    if actual is None or actual['stock'] < cantidad_vendida:
+                        venta = None
+                    elif venta.sucursal_id is not None and not descontar_existencias(venta.sucursal_id, producto_vendido.pk, cantidad_vendida):
+                        venta = None
+                    else:
+                        venta.precio_unitario = actual['precio_venta']
+                        promociones.aplicar([venta], {producto_vendido.pk: actual['categoria_id']})
+                        venta.save()
+                        
+                        Producto.objects.filter(pk=producto_vendido.pk).update(stock=F('stock') - cantidad_vendida)
+                        registrar_movimiento(producto_vendido, -cantidad_vendida, 'venta', usuario=request.user, venta=venta)
+                        # update() no dispara señales
+                        tocar_version(Producto)
+                        referencia.olvidar_producto(producto_vendido.pk)
                 
-                producto_vendido.stock -= cantidad_vendida
-                producto_vendido.save(update_fields=['stock'])
+                if venta is None:
+                    if actual is None or actual['stock'] < cantidad_vendida:
+                        messages.error(request, f"Stock insuficiente para {producto_vendido.nombre}. Stock disponible: {max(actual['stock'], 0) if actual else 0}")
+                    else:
+                        disponible = existencias(request.sucursal_id, [producto_vendido.pk]).get(producto_vendido.pk, 0)
+                        messages.error(request, f"Stock insuficiente en esta sucursal para {producto_vendido.nombre}. Stock en sucursal: {disponible}")
+                    return render(request, 'tienda/venta_form.html', {'form': form, 'accion': 'Crear'})
                 
                 messages.success(request, f'Venta #{venta.id} registrada exitosamente - Total: ${venta.total}')
                 
@@ -350,17 +504,35 @@ def venta_eliminar(request, pk):
     """
     Vista para eliminar una venta (revierte el stock).
     """
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(ventas_de(request.sucursal_id), pk=pk)
     
     if request.method == 'POST':
         try:
             producto = venta.producto
             cantidad = venta.cantidad
+            alias = venta._state.db
             
-            producto.stock += cantidad
-            producto.save(update_fields=['stock'])
-            
-            venta.delete()
+            with transaction.atomic(), transaction.atomic(using=alias):
+                # Suma en la base (F): una venta simultánea del producto no se pierde.
+                # 'todos': si el producto ya se eliminó, stock y bitácora siguen cuadrando
+                Producto.todos.filter(pk=producto.pk).update(stock=F('stock') + cantidad)
+                registrar_movimiento(producto, cantidad, 'devolucion', usuario=request.user, referencia=f'Venta #{pk}')
+                # update() no dispara señales
+                tocar_version(Producto)
+                referencia.olvidar_producto(producto.pk)
+                if venta.sucursal_id is not None:
+                    mover_existencias(venta.sucursal_id, producto.pk, cantidad)
+                
+                # La venta puede estar en la base de su sucursal (ver tienda/routers.py):
+                # se desvincula de la bitácora (SET_NULL) y se borra sin el Collector de Django
+                if alias == 'default':
+                    MovimientoStock.objects.filter(venta_id=pk).update(venta=None)
+                Venta.objects.using(alias).filter(pk=pk)._raw_delete(alias)
+                historial.quitar([pk], alias)
+                tocar_version(Venta)
+                # _raw_delete no dispara post_delete: el ranking y la auditoría se hacen a mano
+                transaction.on_commit(lambda: ranking.quitar_venta(venta), using=alias)
+                auditoria.registrar_eliminacion(venta, using=alias)
             
             messages.success(request, f'Venta #{pk} eliminada. Stock de {producto.nombre} revertido.')
             return redirect('tienda:venta_lista')
@@ -379,10 +551,15 @@ def venta_eliminar(request, pk):
 # ===================================================
 @login_required
 @rol_requerido('gerente', 'administrador')
+@condicional(Venta, extra=lambda request: timezone.now().date())
 def reporte_ventas(request):
     """Vista del reporte de ventas del día"""
     hoy = timezone.now().date()
-    ventas_hoy = Venta.objects.filter(fecha_venta__date=hoy).select_related('producto', 'cliente', 'vendedor')
+    # Rango de fechas (no fecha_venta__date) para usar el índice (sucursal, fecha_venta)
+    inicio = timezone.make_aware(datetime.combine(hoy, time.min))
+    ventas_hoy = historial.historial_de(request.sucursal_id).filter(
+        fecha_venta__gte=inicio, fecha_venta__lt=inicio + timedelta(days=1),
+    )
     
     # Usamos aggregate para obtener la suma
     resumen_dia = ventas_hoy.aggregate(
@@ -408,4 +585,322 @@ def reporte_ventas(request):
         'fecha': hoy,
     }
     
-    return render(request, 'tienda/reporte_ventas.html', context)
\ No newline at end of file
+    return render(request, 'tienda/reporte_ventas.html', context)
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+def ranking_vendedores(request):
+    """Mejores vendedores de hoy, la semana y el mes (ver tienda/ranking.py)."""
+    periodos = [
+        {
+            'clave': periodo,
+            'titulo': titulo,
+            'vendedores': ranking.top(periodo, request.sucursal_id),
+            'mi_posicion': ranking.posicion(request.user.pk, periodo, request.sucursal_id),
+        }
+        for periodo, titulo in ranking.PERIODOS.items()
+    ]
+    return render(request, 'tienda/ranking_vendedores.html', {'periodos': periodos})
+
+
+@login_required
+def ventas_eventos(request):
+    """
+    Server-sent events con las ventas nuevas y los totales (ver tienda/en_vivo.py).
+    El vendedor solo recibe el conteo del dashboard; gerente y administrador, todo.
+    """
+    perfil = getattr(request.user, 'perfil', None)
+    detalle = request.user.is_superuser or getattr(perfil, 'rol', None) in ('gerente', 'administrador')
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(en_vivo.flujo(request.sucursal_id, detalle), content_type='text/event-stream')
+    else:
+        response = HttpResponse(en_vivo.flujo_wsgi(request.sucursal_id, detalle), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no acumular los eventos
+    # Con Content-Encoding, GZipMiddleware no comprime (acumularía los eventos)
+    response['Content-Encoding'] = 'identity'
+    return response
+
+
+# ===================================================
+# CARRITO: RESERVAS DE STOCK CON VENCIMIENTO
+# (ver tienda/reservas.py)
+# ===================================================
+@login_required
+@rol_requerido('vendedor', 'gerente', 'administrador')
+def carrito(request):
+    """Reservas vigentes del empleado, con el formulario para agregar y el de cobro."""
+    apartadas = list(reservas.carrito(request.user))
+    # Vista previa de las promociones; al cobrar se recalculan con los precios de ese momento
+    lineas = [(r.producto_id, r.producto.categoria_id, r.producto.precio_venta, r.cantidad) for r in apartadas]
+    for reserva, (_, descuento) in zip(apartadas, promociones.evaluar(lineas)):
+        reserva.descuento = descuento
+    total = sum(reserva.subtotal - reserva.descuento for reserva in apartadas)
+    return render(request, 'tienda/carrito.html', {
+        'reservas': apartadas,
+        'total': total,
+        'minutos': int(reservas.duracion().total_seconds() // 60),
+        'form': ReservaForm(),
+        'form_cobro': CobroForm(),
+    })
+
+
+@login_required
+@rol_requerido('vendedor', 'gerente', 'administrador')
+@require_POST
+def carrito_agregar(request):
+    form = ReservaForm(request.POST)
+    if not form.is_valid():
+        errores = '; '.join(e for lista in form.errors.values() for e in lista)
+        messages.error(request, f'No se pudo agregar al carrito: {errores}')
+        return redirect('tienda:carrito')
+
+    producto = form.cleaned_data['producto']
+    try:
+        reservas.reservar(producto.pk, form.cleaned_data['cantidad'], request.user)
+    except reservas.StockInsuficiente as e:
+        messages.error(request, f'{producto.nombre}: {e}')
+    else:
+        messages.success(request, f"{form.cleaned_data['cantidad']} x {producto.nombre} apartado(s) por {int(reservas.duracion().total_seconds() // 60)} minutos.")
+    return redirect('tienda:carrito')
+
+
+@login_required
+@rol_requerido('vendedor', 'gerente', 'administrador')
+@require_POST
+def carrito_quitar(request, pk):
+    if reservas.liberar(request.user, pk):
+        messages.success(request, 'Producto quitado del carrito.')
+    return redirect('tienda:carrito')
+
+
+@login_required
+@rol_requerido('vendedor', 'gerente', 'administrador')
+@require_POST
+def carrito_cobrar(request):
+    """Convierte todo el carrito en ventas en una sola transacción."""
+    form = CobroForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, 'Elige el cliente al que se le cobra.')
+        return redirect('tienda:carrito')
+    if _falta_sucursal(request, 1):
+        return redirect('tienda:carrito')
+
+    try:
+        ventas = reservas.cobrar(request.user, form.cleaned_data['cliente'], request.sucursal_id)
+    except reservas.StockInsuficiente as e:
+        messages.error(request, f'No se cobró el carrito: {e}')
+        return redirect('tienda:carrito')
+
+    if not ventas:
+        messages.warning(request, 'El carrito está vacío (las reservas vencidas se liberan solas).')
+        return redirect('tienda:carrito')
+    total = sum(venta.total for venta in ventas)
+    messages.success(request, f'{len(ventas)} venta(s) registrada(s) - Total: ${total}')
+    return redirect('tienda:carrito')
+
+
+# ===================================================
+# VISTAS DE COMPRAS: ÓRDENES Y RECEPCIÓN DE MERCANCÍA
+# (la lógica está en tienda/compras.py)
+# ===================================================
+@login_required
+@rol_requerido('gerente', 'administrador')
+def orden_compra_lista(request):
+    """Órdenes de compra con sus totales (una sola consulta agregada)."""
+    ordenes = (
+        OrdenCompra.objects.select_related('proveedor', 'creada_por')
+        .annotate(num_lineas=Count('lineas'), unidades=Sum('lineas__cantidad'), recibidas=Sum('lineas__recibida'))
+    )
+    return render(request, 'tienda/orden_compra_lista.html', {'ordenes': ordenes})
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+def orden_compra_crear(request):
+    """
+    Paso 1: elegir el proveedor (GET ?proveedor=pk).
+    Paso 2: cantidad y costo de cada uno de sus productos; los que quedan en 0 no se piden.
+    """
+    datos = request.POST if request.method == 'POST' else None
+    form = OrdenCompraForm(datos or request.GET or None)
+    lineas = None
+    if form.is_valid():
+        proveedor = form.cleaned_data['proveedor']
+        productos = list(Producto.objects.filter(proveedor=proveedor).order_by('nombre').values_list('pk', 'nombre'))
+        lineas = LineasCompraForm(productos, datos)
+        if datos is not None and lineas.is_valid():
+            costos = lineas.costos()
+            orden = compras.crear_orden(
+                proveedor, {pk: (cantidad, costos[pk]) for pk, cantidad in lineas.cantidades().items()},
+                usuario=request.user, notas=form.cleaned_data['notas'],
+            )
+            messages.success(request, f'Orden de compra #{orden.pk} creada con {len(lineas.cantidades())} producto(s)')
+            return redirect('tienda:orden_compra_lista')
+    return render(request, 'tienda/orden_compra_form.html', {'form': form, 'lineas': lineas})
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+def orden_compra_recibir(request, pk):
+    """Registra lo que llegó de la orden: todas las líneas en una sola transacción."""
+    orden = get_object_or_404(OrdenCompra.objects.select_related('proveedor'), pk=pk)
+    if orden.estado not in OrdenCompra.ABIERTAS:
+        messages.error(request, f'La orden #{orden.pk} está {orden.get_estado_display().lower()}.')
+        return redirect('tienda:orden_compra_lista')
+
+    pendientes = list(orden.lineas.filter(producto__isnull=False).select_related('producto').only(
+        'producto_id', 'cantidad', 'recibida', 'producto__nombre',
+    ).order_by('producto__nombre'))
+    productos = [(linea.producto_id, linea.producto.nombre) for linea in pendientes if linea.pendiente]
+    maximos = {linea.producto_id: linea.pendiente for linea in pendientes}
+
+    if request.method == 'POST':
+        lineas = LineasCompraForm(productos, request.POST, con_costo=False, maximos=maximos)
+        if lineas.is_valid() and not _falta_sucursal(request, sum(lineas.cantidades().values())):
+            try:
+                recepcion = compras.recibir(orden.pk, lineas.cantidades(), usuario=request.user, sucursal_id=request.sucursal_id)
+            except compras.RecepcionInvalida as e:
+                messages.error(request, str(e))
+            else:
+                unidades = sum(lineas.cantidades().values())
+                messages.success(request, f'Recepción #{recepcion.pk}: {unidades} unidad(es) de {len(lineas.cantidades())} producto(s) sumadas al stock')
+                return redirect('tienda:orden_compra_lista')
+    else:
+        lineas = LineasCompraForm(
+            productos, con_costo=False, maximos=maximos,
+            initial={f'cantidad_{pk}': maximos[pk] for pk, _ in productos},
+        )
+    return render(request, 'tienda/orden_compra_recibir.html', {'orden': orden, 'lineas': lineas})
+
+
+# ===================================================
+# VISTAS DE TAREAS EN SEGUNDO PLANO
+# (las ejecuta 'python manage.py worker')
+# ===================================================
+def _tareas_visibles(request):
+    """Cada usuario ve sus propias tareas; el superusuario ve todas."""
+    tareas = Tarea.objects.defer('resultado')
+    if not request.user.is_superuser:
+        tareas = tareas.filter(creada_por=request.user)
+    return tareas
+
+
+def _estado_tarea(tarea):
+    return {
+        'id': tarea.id,
+        'tipo': tarea.tipo,
+        'estado': tarea.estado,
+        'estado_display': tarea.get_estado_display(),
+        'lista': tarea.lista,
+        'progreso': tarea.progreso,
+        'avance': tarea.avance,
+        'url_descarga': reverse('tienda:tarea_descargar', args=[tarea.id]) if tarea.estado == 'terminada' else None,
+    }
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+@require_POST
+def tarea_encolar(request, tipo):
+    """Encola una tarea y responde de inmediato con su id (no espera a que termine)."""
+    if tipo not in TIPOS_TAREA:
+        raise Http404("Tipo de tarea desconocido")
+
+    parametros = {}
+    if tipo == 'reporte_ventas':
+        form = RangoFechasForm(request.POST)
+        if not form.is_valid():
+            errores = '; '.join(e for lista in form.errors.values() for e in lista)
+            messages.error(request, f'No se pudo encolar el reporte: {errores}')
+            return redirect('tienda:reporte_ventas')
+        parametros = {
+            'desde': form.cleaned_data['desde'].isoformat(),
+            'hasta': form.cleaned_data['hasta'].isoformat(),
+            'sucursal_id': request.sucursal_id,
+        }
+
+    tarea = encolar(tipo, usuario=request.user, **parametros)
+
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(_estado_tarea(tarea), status=202)
+
+    messages.info(request, f'Tarea #{tarea.id} encolada. Puedes seguir trabajando; aquí verás cuando esté lista.')
+    return redirect('tienda:tarea_lista')
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+def tarea_lista(request):
+    tareas = _tareas_visibles(request).select_related('creada_por')[:50]
+    tipos = {tipo: descripcion for tipo, (_, descripcion) in TIPOS_TAREA.items()}
+    return render(request, 'tienda/tarea_lista.html', {'tareas': tareas, 'tipos': tipos})
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+def tarea_estado(request, pk):
+    """Endpoint de sondeo (polling): devuelve el estado de la tarea en JSON."""
+    tarea = get_object_or_404(_tareas_visibles(request), pk=pk)
+    return JsonResponse(_estado_tarea(tarea))
+
+
+@login_required
+@rol_requerido('gerente', 'administrador')
+def tarea_descargar(request, pk):
+    # defer(None): aquí sí se necesita el contenido del resultado
+    tarea = get_object_or_404(_tareas_visibles(request).defer(None), pk=pk)
+    if tarea.estado != 'terminada':
+        messages.error(request, f'La tarea #{pk} todavía no tiene un resultado para descargar.')
+        return redirect('tienda:tarea_lista')
+    response = HttpResponse(bytes(tarea.resultado), content_type=tarea.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{tarea.nombre_archivo}"'
+    return response
+
+
+# ===================================================
+# PERFILES DE RENDIMIENTO (?perfilar=1, ver sistema_tienda/perfilador.py)
+# ===================================================
+@login_required
+@superusuario_requerido
+def perfil_lista(request):
+    return render(request, 'tienda/perfil_lista.html', {
+        'perfiles': perfilador.listar(),
+        'maximo': settings.TIENDA_PERFILES_MAX,
+    })
+
+
+@login_required
+@superusuario_requerido
+def perfil_descargar(request, nombre, formato):
+    ruta = perfilador.ruta(nombre, '.' + formato)
+    if ruta is None:
+        raise Http404("Perfil no encontrado")
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=f'{nombre}.{formato}')
+
+
+# ===================================================
+# SELECTOR DE SUCURSAL (empleados sin sucursal fija)
+# ===================================================
+@login_required
+@require_POST
+def sucursal_cambiar(request):
+    perfil = getattr(request.user, 'perfil', None)
+    if perfil is not None and perfil.sucursal_id is not None:
+        messages.error(request, 'Tu usuario tiene una sucursal fija; pide al administrador que la cambie.')
+        return redirect('tienda:home')
+
+    elegida = request.POST.get('sucursal', '')
+    if elegida == '':
+        request.session.pop('sucursal_id', None)
+        messages.info(request, 'Mostrando todas las sucursales.')
+    elif elegida.isdigit() and int(elegida) in sucursales():
+        request.session['sucursal_id'] = int(elegida)
+        messages.info(request, f"Sucursal actual: {sucursales()[int(elegida)]['nombre']}")
+    else:
+        messages.error(request, 'Sucursal no válida.')
+    siguiente = request.POST.get('siguiente', '')
+    if not url_has_allowed_host_and_scheme(siguiente, allowed_hosts={request.get_host()}):
+        siguiente = reverse('tienda:home')
+    return redirect(siguiente)